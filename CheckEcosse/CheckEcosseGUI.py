@@ -17,19 +17,24 @@ import sys
 from subprocess import Popen, DEVNULL
 from glob import glob
 from copy import copy
+from pathlib import Path
+import webbrowser
 
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QPixmap, QFont
 from PyQt5.QtWidgets import QLabel, QWidget, QApplication, QHBoxLayout, QVBoxLayout, QGridLayout, QLineEdit, \
-                                QPushButton, QCheckBox, QFileDialog, QTextEdit
+                                QPushButton, QCheckBox, QFileDialog, QTextEdit, QProgressBar
 
 from analyse_site_spec_dir import Analysis, check_identical_files, check_input_file_compliance
+from compliance_batch_funcs import check_compliance
 import analyse_ecosse_output
 from analyse_ecosse_output import format_out_files
 from initialise_check_ecosse import read_config_file, write_config_file, initiation
 from generate_charts_funcs import generate_charts
 from common_funcs import run_site_specific
-from set_up_logging import OutLog
+from check_params import params_from_form
+from analysis_worker import start_worker
+from buffered_log import BufferedLog
 
 EXCEL_EXE1 = join('C:\\Program Files\\Microsoft Office\\root\\Office16', 'EXCEL.EXE')
 EXCEL_EXE2 = join('C:\\Program Files (x86)\\Microsoft Office\\root\\Office16', 'EXCEL.EXE')
@@ -39,6 +44,14 @@ WDGT_WDTH_95 = 95
 WDGT_WDTH_120 = 120
 sleepTime= 3
 
+def _compare_out_files(params):
+    analysis = analyse_ecosse_output.Analysis(params)   # initialises object
+    analysis.check_ecosse_files(params)  # creates a summary file
+
+def _scan_directory(params):
+    analysis = Analysis(params)           # initialises object
+    analysis.check_these_files(params)    # creates summary file
+
 class Form(QWidget):
 
     def __init__(self, parent=None):
@@ -179,7 +192,7 @@ class Form(QWidget):
         lbl16.setAlignment(Qt.AlignRight)
 
         w_water_dep = QLineEdit()
-        helpText = 'Depth for soil water chart [cm] e.g. 50, 100, 300 (max)'
+        helpText = 'Depth for soil water chart [cm] e.g. 50, 100, 300 (max) or several depths e.g. 30, 50, 100'
         w_water_dep.setToolTip(helpText)
         w_water_dep.setFixedWidth(WDGT_WDTH_60)
         grid.addWidget(w_water_dep, irow, 5)
@@ -298,6 +311,13 @@ class Form(QWidget):
         run_tests.clicked.connect(self.directoryScanClicked)
         grid.addWidget(run_tests, irow, 1)
 
+        w_progress = QProgressBar()
+        helpText = 'Progress of the current comparison, chart or scan - use Cancel to stop it'
+        w_progress.setToolTip(helpText)
+        w_progress.setValue(0)
+        grid.addWidget(w_progress, irow, 2, 1, 3)
+        self.w_progress = w_progress
+
         # LH vertical box consists of png image
         # =====================================
         lh_vbox = QVBoxLayout()
@@ -328,7 +348,12 @@ class Form(QWidget):
         '''
         bot_hbox.addWidget(w_report, 1)
         self.w_report = w_report
-        sys.stdout = OutLog(self.w_report, sys.stdout)
+
+        # output, which may be printed from the worker thread, is buffered and shown periodically
+        self.report_log = BufferedLog(self.w_report, sys.stdout)
+        sys.stdout = self.report_log
+        self.worker_thread = None
+        self.worker = None
         # sys.stderr = OutLog(self.w_report, sys.stderr, QColor(255, 0, 0))
 
         # add LH and RH vertical boxes to main horizontal box
@@ -364,14 +389,18 @@ class Form(QWidget):
             excel_exe = copy(EXCEL_EXE2)
 
         rslts_dir = self.w_lbl13.text()
-        xls_flist = glob(rslts_dir + '/*.xlsx')
+        xls_flist = glob(rslts_dir + '/*.xlsx') + glob(rslts_dir + '/*.html')
         if len(xls_flist) > 0:
             fname = xls_flist[0]
         else:
             fname = ''
 
-        xls_fname, dummy = QFileDialog.getOpenFileName(self, 'Open file', fname, 'Excel files (*.xlsx)')
-        if xls_fname != '':
+        xls_fname, dummy = QFileDialog.getOpenFileName(self, 'Open file', fname,
+                                                       'Excel files (*.xlsx);;Chart pages (*.html)')
+        if xls_fname.endswith('.html'):
+            # charts rendered as images are viewed in a browser
+            webbrowser.open(Path(xls_fname).resolve().as_uri())
+        elif xls_fname != '':
             try:
                 Popen(list([excel_exe, normpath(xls_fname)]), stdout=DEVNULL)
             except PermissionError as err:
@@ -392,33 +421,61 @@ class Form(QWidget):
 
     def checkInputFileComplianceClicked(self):
         # check compliance of input files: fnames.dat, management.txt, site.txt and soil.txt
-        check_input_file_compliance(self)
+        # every cell beneath the reference directory is checked in a worker thread if the scan is recursive
+        if self.settings['scan_recursive']:
+            self.startAnalysis(check_compliance, 'Check input files')
+        else:
+            check_input_file_compliance(params_from_form(self))
 
     def diffInputFilesClicked(self):
         # report whether .dat and .txt files for reference and target 1 directories are identical or different
-        check_identical_files(self)    
+        check_identical_files(params_from_form(self))
 
     def diffOutputFilesClicked(self):
-        # perform shallow comparison of reference and target 1 *.OUT files
-        check_identical_files(self, file_types = 'output')
+        # compare content hashes of reference and target 1 *.OUT files
+        check_identical_files(params_from_form(self), file_types = 'output')
 
     def chartOutFilesClicked(self):
         # generates charts of carbon and nitrogen metric sets
-        generate_charts(self)
+        self.startAnalysis(generate_charts, 'Chart OUT files')
 
     def compareOutFilesClicked(self):
         # generate Excel spreadsheet of differences between reference and target 1 *.OUT files
-        analysis = analyse_ecosse_output.Analysis(self)   # initialises object
-        analysis.check_ecosse_files(self)  # creates a summary file
+        self.startAnalysis(_compare_out_files, 'Compare OUT files')
 
     def directoryScanClicked(self):
         # summarises files in reference directory
-        analysis = Analysis(self)           # initialises object
-        analysis.check_these_files(self)    # creates summary file
+        self.startAnalysis(_scan_directory, 'Directory scan')
+
+    def startAnalysis(self, func, title):
+        # run analysis in a worker thread - only one at a time
+        if self.worker_thread is not None:
+            print(self.worker.title + ' is still running - wait for it to finish or cancel it')
+            return
+
+        params = params_from_form(self)
+        self.report_log.set_log_dir(params.rslts_dir)
+        self.report_log.reset_counts()
+        self.w_progress.setValue(0)
+        self.w_progress.setFormat(title + ' %p%')
+        self.worker_thread, self.worker = start_worker(self, func, params, title)
+
+    def showProgress(self, ndone, ntotal, label):
+        #
+        self.w_progress.setMaximum(max(1, ntotal))
+        self.w_progress.setValue(ndone)
+        self.w_progress.setFormat('{} %v of %m {}'.format(self.worker.title, label))
+
+    def workerFinished(self):
+        #
+        self.worker_thread.wait()
+        self.worker_thread = None
+        self.worker = None
+        self.report_log.report_counts()
 
     def runSiteSpecificClicked(self):
         # runs site specific mode only for 30 years with vigour
-        run_site_specific(self)
+        run_site_specific(params_from_form(self))
 
     def fetchRefDir(self):
         #
@@ -427,7 +484,7 @@ class Form(QWidget):
         if fname != '':
             fname = normpath(fname)
             self.w_lbl03.setText(fname)
-            self.w_lbl05.setText(format_out_files(self))
+            self.w_lbl05.setText(format_out_files(params_from_form(self)))
 
     def fetchTarg1Dir(self):
         #
@@ -436,7 +493,7 @@ class Form(QWidget):
         if fname != '':
             fname = normpath(fname)
             self.w_lbl04.setText(fname)
-            self.w_lbl05.setText(format_out_files(self))
+            self.w_lbl05.setText(format_out_files(params_from_form(self)))
 
     def fetchTarg2Dir(self):
         #
@@ -445,7 +502,7 @@ class Form(QWidget):
         if fname != '':
             fname = normpath(fname)
             self.w_lbl06.setText(fname)
-            self.w_lbl07.setText(format_out_files(self, target_flag = 'targ2'))
+            self.w_lbl07.setText(format_out_files(params_from_form(self), target_flag = 'targ2'))
 
     def fetchRsltsDir(self):
         #
@@ -459,6 +516,12 @@ class Form(QWidget):
 
         func_name = __prog__ + ' cancelClicked'
 
+        # stop a running analysis rather than the program
+        if self.worker is not None:
+            print('Cancelling ' + self.worker.title + ' - will stop after the current file')
+            self.worker.cancel()
+            return
+
         print('Terminating program without saving configuration file')
         QApplication.processEvents()
         sleep(sleepTime)
@@ -475,6 +538,15 @@ class Form(QWidget):
         write_config_file(self)
         self.close()
 
+    def closeEvent(self, event):
+        # a running analysis is cancelled before the window closes
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker_thread.wait()
+        sys.stdout = self.report_log.out
+        self.report_log.close()
+        event.accept()
+
 def main():
 
     app = QApplication(sys.argv)  # create QApplication object
@@ -8,33 +8,68 @@
 #!/usr/bin/env python
 
 __prog__ = 'analyse_ecosse_output.py'
-__version__ = '0.0.1'
+__version__ = '0.0.2'
 
 # Version history
 # ---------------
 # 0.0.1  Wrote.
+# 0.0.2  Per-atom comparison replaced by the batched engine in diff_engine_funcs
+#        Optional comparison of file pairs in a pool of worker processes
+#        Each file read and tokenised once using out_file_funcs
+#        Comparisons of unchanged pairs of files retrieved from a cache in the results directory
+#        Rows streamed to a write-only workbook which is saved once
+#        Files parsed once into columnar sidecars which are memory mapped by subsequent comparisons
+#        Progress reported and cancellation checked between files
+#        One-to-many comparison of a reference, parsed once, with many target directories
+#        Target lines identical to those of the reference are neither parsed nor compared atom by atom
+#        Large pairs of files compared in ranges of rows, located by a line index, by the worker processes
+#        Quick look modes which compare a window of time steps or years, or every k-th time step, only
 #
 from glob import glob
-from os.path import basename, join, split, isfile, splitext
-import filecmp
-from numpy import zeros, int64, float64
+from os.path import basename, getsize, join, split, isfile, splitext
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from hashlib import sha256
+from io import StringIO
+from numpy import array, array_split, arange, cumsum, sort, zeros, fmax, int64, float64
 import common_funcs
-from common_funcs import write_xlsx_row
+from common_funcs import XlsxSheetWriter
+from diff_engine_funcs import classify_tokens, diff_token_rows, merge_stats, new_stats
+from out_file_funcs import read_raw, TokenisedFile
+from out_index_funcs import build_line_index, open_line_index, read_lines
+from out_sidecar_funcs import build_columnar, open_columnar
+from result_cache import ResultCache
 
 wildCard = '/*.OUT'
 no_data = -999.0
 filter_files = list(['fort.6','fort.21','fort.57','INPUTS.OUT','ERROR.MSG','NOERROR.MSG','PARLIS.DAT'])
+two_line_files = list(['BIOC.OUT','BION.OUT','CROPN.OUT','CO2.OUT','DENITN.OUT','DPMC.OUT','DPMN.OUT',
+                            'EVAP_SUNDIAL.OUT',
+                'HUMC.OUT','HUMN.OUT','LEACHN.OUT',	'MINERN.OUT','NH4N.OUT','NITRIFN.OUT','NO3N.OUT','RPMC.OUT',
+                            'RPMN.OUT','SOILN.OUT','SUMMARY.OUT','TOTC.OUT','TOTN.OUT'])
+SHORT_TITLES = list(['File name', 'Same?', 'RefNumLines', 'RefNumWords', 'MaxRowLen', 'TargNumLines',
+                     'TargNumWords', 'IntTotal', 'IntSame', 'IntDiff', 'FltsCnvrtd', 'Equal', 'Not equal',
+                     'LargestDiff', 'LrgstDiffCoords', 'NaNs', 'Asterisks', 'Bad values'])
+QUICK_TITLES = list(['RowsCompared', 'DataRows', 'EstLargestDiff'])
+WINDOW_UNITS = list(['years', 'steps'])
+
+SPLIT_MB = 64       # pairs of larger files are compared in ranges of rows by the worker processes
+RANGES_PER_WORKER = 2
+BYTES_PER_MB = 1024*1024
+MAX_NUM_LINE_DIFFS = 10 # comparison is discontinued after this number of rows whose number of words differ
 
-def format_out_files(form, target_flag = 'targ1', label_string_flag = True):
+_reference = {}     # parsed reference files of a one-to-many comparison, keyed by file name
+
+def format_out_files(params, target_flag = 'targ1', label_string_flag = True):
     """
     invoked by GUI for user feedback
     """
-    ref_dir = form.w_lbl03.text()
+    ref_dir = params.ref_dir
     ref_flist = glob(ref_dir + wildCard)
     if target_flag == 'targ1':
-        targ_flist = glob(form.w_lbl04.text() + wildCard)
+        targ_flist = glob(params.targ1_dir + wildCard)
     else:
-        targ_flist = glob(form.w_lbl06.text() + wildCard)
+        targ_flist = glob(params.targ2_dir + wildCard)
 
     nref_files = len(ref_flist)
     ntarg_files = len(targ_flist)
@@ -44,12 +79,191 @@ def format_out_files(form, target_flag = 'targ1', label_string_flag = True):
     else:
         return min(nref_files, ntarg_files)
 
+def compare_file_pair(ref_file, targ_file, use_sidecars = False):
+    """
+    compare a reference .OUT file with the target file of the same name
+    """
+    fpath, fname_short = split(ref_file)
+    analysis = Analysis(None)
+    analysis.fname_short = fname_short
+
+    return analysis.compare_file_pair(ref_file, targ_file, use_sidecars)
+
+def _captured(compare_func, *args):
+    """
+    output which would have been printed by a comparison is returned with it, as its log, so that the output
+    is printed in order by the parent process and is replayed when the comparison is retrieved from the cache
+    """
+    log = StringIO()
+    with redirect_stdout(log):
+        comparison = compare_func(*args)
+    comparison['log'] = log.getvalue()
+
+    return comparison
+
+def _compare_in_worker(ref_file, targ_file, use_sidecars = False):
+    """
+    run in a worker process, or in the parent process when comparing serially
+    """
+    return _captured(compare_file_pair, ref_file, targ_file, use_sidecars)
+
+def sampled_rows(params):
+    """
+    data rows compared by a quick look: the first row, from zero, the row after the last, None for the last row
+    of each file, and the interval between the rows compared - returns None when every row is to be compared
+    time steps are counted from 1 and years, of params.steps_per_year steps, from the first year of the run
+    returns -1 if the window or interval is invalid
+    """
+    if params.sample_every < 1:
+        print('Error - interval between rows compared must be at least 1, not {}'.format(params.sample_every))
+        return -1
+
+    if params.time_window is None:
+        if params.sample_every == 1:
+            return None
+
+        return tuple([0, None, params.sample_every])
+
+    first, last = params.time_window
+    if first < 1 or last < first:
+        print('Error - time window {} to {} must start at 1 or later and not end before it starts'.format(first, last))
+        return -1
+
+    if params.window_units == 'years':
+        first_row, end_row = (first - 1)*params.steps_per_year, last*params.steps_per_year
+    else:
+        first_row, end_row = first - 1, last
+
+    return tuple([first_row, end_row, params.sample_every])
+
+def compare_sampled_pair(ref_file, targ_file, row_filter, use_sidecars = False):
+    """
+    compare the data rows of a reference .OUT file and its target selected by row_filter, as from sampled_rows
+    """
+    fpath, fname_short = split(ref_file)
+    analysis = Analysis(None)
+    analysis.fname_short = fname_short
+
+    return analysis.compare_sampled_pair(ref_file, targ_file, row_filter, use_sidecars)
+
+def _compare_sampled_in_worker(ref_file, targ_file, row_filter, use_sidecars = False):
+    """
+    run in a worker process, or in the parent process when comparing serially
+    """
+    return _captured(compare_sampled_pair, ref_file, targ_file, row_filter, use_sidecars)
+
+def compare_large_pair(ref_file, targ_file, executor, nranges):
+    """
+    compare a large reference .OUT file with its target in ranges of rows using the worker processes of executor
+    """
+    fpath, fname_short = split(ref_file)
+    analysis = Analysis(None)
+    analysis.fname_short = fname_short
+
+    return analysis.compare_indexed_pair(ref_file, targ_file, executor, nranges)
+
+def _diff_row_range(ref_file, targ_file, ref_span, targ_span, fname_short, row_ids, row_lens, file_lines,
+                                                                                                    max_len_row):
+    """
+    run in a worker process - output which would have been printed is returned to the parent process
+    """
+    log = StringIO()
+    with redirect_stdout(log):
+        stats, first_id, diff = diff_read_rows(ref_file, targ_file, ref_span, targ_span, fname_short, row_ids,
+                                                                                row_lens, file_lines, max_len_row)
+    return stats, first_id, diff, log.getvalue()
+
+def diff_read_rows(ref_file, targ_file, ref_span, targ_span, fname_short, row_ids, row_lens, file_lines,
+                                                                                    max_len_row, compact = False):
+    """
+    compare rows of two files, each file read from a span of bytes which starts at the first of file_lines
+    returns the counters, the first row id and the difference matrix of the rows from the first to the last row id
+    or, if compact is set, of the rows compared only
+    """
+    ref_lines = read_lines(ref_file, ref_span[0], ref_span[1])
+    targ_lines = read_lines(targ_file, targ_span[0], targ_span[1])
+    rows = [tuple([ref_lines[iline], targ_lines[iline]]) for iline in (file_lines - file_lines[0]).tolist()]
+    del ref_lines, targ_lines
+
+    # as for a whole file, rows with the same text in both files are credited in bulk
+    # ================================================================================
+    same_rows = array([ref_row == targ_row for ref_row, targ_row in rows], dtype=bool)
+    cols_ref = classify_tokens(array([atom for ref_row, targ_row in rows for atom in ref_row.split()],
+                                                                                                dtype=str))
+    cols_targ = classify_tokens(array([atom for (ref_row, targ_row), same in zip(rows, same_rows.tolist())
+                                                                if not same for atom in targ_row.split()], dtype=str))
+    first_id = int(row_ids[0])
+    if compact:
+        diff_cols = arange(len(row_ids))
+    else:
+        diff_cols = row_ids - first_id
+    diff = zeros((max_len_row, int(diff_cols[-1]) + 1), dtype=float64)
+    stats = diff_token_rows(fname_short, row_ids, row_lens, cols_ref, cols_targ, lambda irow: rows[irow], diff,
+                                                                                            same_rows, diff_cols)
+    return stats, first_id, diff
+
+def _set_reference(ref_files):
+    """
+    initialiser of each worker process of a one-to-many comparison - the parsed reference is received once
+    """
+    global _reference
+    _reference = ref_files
+
+def compare_target_dir(targ_dir, use_sidecars = False, ref_files = None):
+    """
+    compare each parsed reference file with the file of the same name in a target directory
+    returns a comparison for each reference file, in the order of ref_files, None where the target has no such file
+    difference matrices are discarded since only the Short Summary line of each comparison is reported
+    """
+    if ref_files is None:
+        ref_files = _reference
+
+    comparisons = []
+    for fname_short, tok_ref in ref_files.items():
+        targ_file = join(targ_dir, fname_short)
+        if not isfile(targ_file):
+            comparisons.append(None)
+            continue
+
+        analysis = Analysis(None)
+        analysis.fname_short = fname_short
+        comparison = analysis.compare_with_reference(tok_ref, targ_file, use_sidecars)
+        comparison['diff'] = None
+        comparisons.append(comparison)
+
+    return comparisons
+
+def _compare_target_in_worker(targ_dir, use_sidecars = False):
+    """
+    run in a worker process - output which would have been printed is returned to the parent process
+    """
+    log = StringIO()
+    with redirect_stdout(log):
+        comparisons = compare_target_dir(targ_dir, use_sidecars)
+
+    return comparisons, log.getvalue()
+
+def _target_block(comparison):
+    """
+    cells of the Short Summary line of a comparison, less the file name, padded to the width of a block
+    """
+    nblock = len(SHORT_TITLES) - 1
+    if comparison is None:
+        return list(['Missing']) + ['']*(nblock - 1)
+
+    if comparison['short_line'] is None:
+        return list(['Discontinued']) + ['']*(nblock - 1)
+
+    cells = comparison['short_line'].split(',')[1:]
+
+    return cells + ['']*(nblock - len(cells))
+
 class Analysis(object,):
     """
     methods:
-          check_ecosse_files(self,form): entry
+          check_ecosse_files(self, params): entry
     """
-    def __init__(self,form):
+    def __init__(self, params):
         """
         C
         """
@@ -68,25 +282,35 @@ class Analysis(object,):
 
     #  entry point from GUI when user requests check files
     #       invokes:
-    #        def compare_files
+    #        def compare_file_pair
     #        def write_sum_file
-    #        def get_num_words
     #
-    def check_ecosse_files(self,form):
-
+    def check_ecosse_files(self, params):
+        """
+        when params.max_workers exceeds 1 the file pairs are compared in a pool of worker processes and
+        the results written to the workbook in the same order as for a serial comparison; without sidecars, pairs
+        whose reference exceeds params.split_mb are compared in ranges of rows by the same worker processes
+        if params.time_window or params.sample_every is set only the data rows selected by sampled_rows are compared
+        """
         func_name =  __prog__ + ' check_ecosse_files'
 
-        ref_dir = form.w_lbl03.text()
-        targ_dir = form.w_lbl04.text()
-        rslts_dir = form.w_lbl13.text()
+        ref_dir = params.ref_dir
+        targ_dir = params.targ1_dir
+        rslts_dir = params.rslts_dir
+        max_workers = params.max_workers
+        use_sidecars = params.use_sidecars
+
+        row_filter = sampled_rows(params)
+        if row_filter == -1:
+            return
 
         summary_fname = basename(ref_dir) + '_vs_' + basename(targ_dir) + '.sum'
         sum_fname = join(rslts_dir,  summary_fname)
 
         outdir_sum = common_funcs.Common_funcs(rslts_dir)
-        summary_only_flag = form.w_smmry_only.isChecked()
+        summary_only_flag = params.summary_only
 
-        wrkbk = outdir_sum.open_xls_outf(sum_fname)
+        wrkbk = outdir_sum.open_xls_outf(sum_fname, write_only = True)
         out_fname = outdir_sum.outfname
 
         # write to Excel file
@@ -94,18 +318,17 @@ class Analysis(object,):
             print('Error - could not open file {} in directory {}'.format(out_fname, rslts_dir))
             return
 
-        # grab the active worksheet
-        wrksht_sum = wrkbk.active
-        wrksht_sum.title = "Long Summary"
-
-        wrksht_short = wrkbk.create_sheet()
-        wrksht_short.title = "Short Summary"
+        # rows are streamed to each worksheet and the workbook saved once at the end
+        wrksht_sum = XlsxSheetWriter(wrkbk, "Long Summary")
+        wrksht_short = XlsxSheetWriter(wrkbk, "Short Summary")
 
         # Header line
         title1 = 'File name,Same?,RefNumLines,RefNumWords,MaxRowLen,TargNumLines,TargNumWords,IntTotal,IntSame,IntDiff,'
         title2 = 'FltsCnvrtd,Equal,Not equal,LargestDiff,LrgstDiffCoords,NaNs,Asterisks,Bad values'
         header_line = title1 + title2
-        write_xlsx_row(1, 1, header_line.split(','), wrksht_short)
+        if row_filter is not None:
+            header_line += ',' + ','.join(QUICK_TITLES)
+        wrksht_short.write_row(1, header_line.split(','))
         row_short = 2
 
         # generate list of reference files
@@ -123,20 +346,14 @@ class Analysis(object,):
              print ('ERROR: ' + targ_dir + ' has no OUT files.')
              return
 
-        # step through files in reference list
-        nwords = zeros(2, dtype=int64)
-        nlines = zeros(2, dtype=int64)
-        max_len_row = zeros(2, dtype=int64)
-        num_comps = 0
-        row_sum = 1
+        # gather pairs of files to be compared
+        # ====================================
+        file_pairs = []
         for ref_file in ref_flist:
             fpath, fname_short = split(ref_file)
-            # print('Processing {0}'.format(fname_short))
             if fname_short in filter_files:
                 continue
 
-            self.fname_short = fname_short
-
             if summary_only_flag:
                 if fname_short != 'SUMMARY.OUT':
                     continue
@@ -150,155 +367,501 @@ class Analysis(object,):
                 print('Target file {} does not exist'.format(targ_file))
                 continue
 
-            # compare files and remove entries from target list
-            num_comps += 1
-            line_str = fname_short
-            if filecmp.cmp(ref_file, targ_file):
-                nlines[0], max_len_row[0], nwords[0] = self.get_num_words(ref_file)
-                result = 'Identical'
-                identical_line = line_str + ',' + result + ',{0},{1},{2}'.format(nlines[0],nwords[0], max_len_row[0])
-                write_xlsx_row(1, row_short, identical_line.split(','), wrksht_short)
+            file_pairs.append((ref_file, targ_file))
+
+        # pairs of unchanged files are retrieved from the cache
+        # ====================================================
+        num_comps = len(file_pairs)
+        cached_comps = [None]*num_comps
+        cache_keys = [None]*num_comps
+        if params.cache_max_mb > 0:
+            cache = ResultCache(rslts_dir, params.cache_max_mb)
+            for indx, (ref_file, targ_file) in enumerate(file_pairs):
+                settings = basename(ref_file)
+                if row_filter is not None:
+                    settings += ' rows {} to {} every {}'.format(*row_filter)
+                cache_keys[indx] = cache.pair_key(ref_file, targ_file, settings = settings)
+                cached_comps[indx] = cache.fetch(cache_keys[indx])
+        else:
+            cache = None
+
+        # step through pairs of files, possibly using a pool of worker processes
+        # ======================================================================
+        todo_pairs = [pair for pair, cached in zip(file_pairs, cached_comps) if cached is None]
+        if row_filter is None:
+            compare_func, compare_args = _compare_in_worker, tuple([use_sidecars])
+        else:
+            print('Quick look comparing data rows {} to {} every {} rows'.format(row_filter[0] + 1,
+                                                                    row_filter[1] or 'last', row_filter[2]))
+            compare_func, compare_args = _compare_sampled_in_worker, tuple([row_filter, use_sidecars])
+
+        if max_workers > 1 and not use_sidecars and params.split_mb > 0 and row_filter is None:
+            split_bytes = params.split_mb*BYTES_PER_MB
+            split_flags = [getsize(ref_file) > split_bytes for ref_file, targ_file in todo_pairs]
+        else:
+            split_flags = [False]*len(todo_pairs)
+        nsplit = sum(split_flags)
+
+        if max_workers > 1 and (len(todo_pairs) > 1 or nsplit > 0):
+            print('Comparing {} pairs of files using {} worker processes'.format(len(todo_pairs), max_workers))
+            if nsplit > 0:
+                print('{} pairs of large files will be compared in ranges of rows'.format(nsplit))
+                executor = ProcessPoolExecutor(max_workers = max_workers)
+            else:
+                executor = ProcessPoolExecutor(max_workers = min(max_workers, len(todo_pairs)))
+
+            # large pairs are compared by the parent process when their turn comes
+            # ======================================================================
+            whole_pairs = [pair for pair, split_flag in zip(todo_pairs, split_flags) if not split_flag]
+            whole_comps = executor.map(compare_func, [ref_file for ref_file, targ_file in whole_pairs],
+                                [targ_file for ref_file, targ_file in whole_pairs],
+                                *[[compare_arg]*len(whole_pairs) for compare_arg in compare_args])
+            nranges = max_workers*RANGES_PER_WORKER
+            comparisons = (_captured(compare_large_pair, ref_file, targ_file, executor, nranges) if split_flag
+                           else next(whole_comps) for (ref_file, targ_file), split_flag in zip(todo_pairs, split_flags))
+        else:
+            executor = None
+            comparisons = (compare_func(ref_file, targ_file, *compare_args) for ref_file, targ_file in todo_pairs)
+
+        row_sum = 1
+        ndone = 0
+        for cache_key, comparison in zip(cache_keys, cached_comps):
+            if params.cancel_requested():
+                break
+
+            if comparison is None:
+                comparison = next(comparisons)
+                if cache is not None:
+                    cache.store(cache_key, comparison)
+            else:
+                comparison['result'] += ' (cached)'
+
+            if 'log' in comparison:
+                print(comparison['log'], end = '')
+
+            # record results in the workbook in the original order
+            # ====================================================
+            self.fname_short = comparison['fname_short']
+            if comparison['short_line'] is not None:
+                wrksht_short.write_row(row_short, comparison['short_line'].split(','))
                 row_short += 1
+
+            if comparison['diff'] is not None:
+                # add lines to summary file and write Excel file of differences
+                self.diff = comparison['diff']
+                row_sum = self.write_sum_file(comparison['title_lines'], wrkbk, wrksht_sum, row_sum)
+
+            print('Processed {}\tresult: {}'.format(self.fname_short, comparison['result']))
+            ndone += 1
+            params.report_progress(ndone, num_comps, self.fname_short)
+
+        if executor is not None:
+            executor.shutdown(cancel_futures = True)
+
+        if cache is not None:
+            cache.save()
+            print('Comparison cache: {} pairs retrieved, {} pairs compared'.format(cache.nhits, cache.nmisses))
+
+        if ndone < num_comps:
+            print('Cancelled after {} of {} comparisons'.format(ndone, num_comps))
+        else:
+            print('Completed after {} comparisons'.format(num_comps))
+        wrkbk.save(out_fname)
+        print('Result written to file: {}\n'.format(out_fname))
+
+        return 'dummy'
+
+    def check_ecosse_targets(self, params):
+        """
+        one-to-many comparison: the reference .OUT files are parsed once then compared with those of each of
+        params.targ_dirs, in a pool of worker processes if params.max_workers exceeds 1
+        the Summary sheet has one row per file and one block of Short Summary columns per target
+        """
+        ref_dir = params.ref_dir
+        targ_dirs = params.targ_dirs
+        targ_ids = params.targ_ids
+        use_sidecars = params.use_sidecars
+        ntargs = len(targ_dirs)
+        if ntargs == 0:
+            print('ERROR: no target directories to compare with ' + ref_dir)
+            return
+
+        # parse each reference file once
+        # ==============================
+        ref_files = {}
+        for ref_file in sorted(glob(ref_dir + wildCard)):
+            fpath, fname_short = split(ref_file)
+            if fname_short in filter_files:
+                continue
+
+            if params.summary_only and fname_short != 'SUMMARY.OUT':
+                continue
+
+            if use_sidecars:
+                ref_files[fname_short] = open_columnar(ref_file)
             else:
-                # Differences detected
-                # ====================
-
-                # check number of words are same
-
-                for i, fname, label in zip(range(0,2), list([targ_file,ref_file]), list(['target', 'reference'])):
-                    nlines[i], max_len_row[i], nwords[i] = self.get_num_words(fname)
-
-                # compare each entity if there is a files equivalence
-                # if nwords[0] == nwords[1] and nlines[0] == nlines[1]: - too strict
-                if nlines[0] == nlines[1]:
-                    line_str = line_str + ',Different,{0},{1},{2},,,'.format(nlines[0], nwords[0], max_len_row[0])
-                    self.diff = zeros(max_len_row[0]*nlines[0], dtype=float64)
-                    self.diff.shape = (max_len_row[0], nlines[0])
-                    ret_list = self.compare_files(wrksht_short, row_short, targ_file, ref_file, line_str)
-                    row_short = ret_list[0]
-                    title_lines = ret_list[1:]
-                    # add lines to summary file and write Excel file of differences
-                    result = 'Different but same shape'
-                    row_sum = self.write_sum_file(title_lines, out_fname, wrkbk, wrksht_sum, row_sum)
-                else:
-                    different_line = line_str + ',Different,{0},{1},{2},{3},{4},{5}'\
-                        .format(nlines[0], nwords[0], max_len_row[0], nlines[1], nwords[1], max_len_row[1])
-                    write_xlsx_row(1, row_short, different_line.split(','), wrksht_short)
-                    result = 'Different with different shape'
-                    row_short += 1
-            print('Processed {}\tresult: {}'.format(fname_short,result))
-        print('Completed after {} comparisons'.format(num_comps))
+                ref_files[fname_short] = build_columnar(ref_file)
+
+        if len(ref_files) == 0:
+            print('ERROR: ' + ref_dir + ' has no OUT files.')
+            return
+
+        print('Parsed {} reference files, will compare with {} targets'.format(len(ref_files), ntargs))
+
+        outdir_sum = common_funcs.Common_funcs(params.rslts_dir)
+        sum_fname = join(params.rslts_dir, basename(ref_dir) + '_vs_{}_targets'.format(ntargs))
+        wrkbk = outdir_sum.open_xls_outf(sum_fname, write_only = True)
+        out_fname = outdir_sum.outfname
+        if wrkbk == -1:
+            print('Error - could not open file {} in directory {}'.format(out_fname, params.rslts_dir))
+            return
+
+        # the reference is sent once to each worker process rather than with every target
+        # ================================================================================
+        max_workers = min(params.max_workers, ntargs)
+        if max_workers > 1:
+            print('Comparing {} targets using {} worker processes'.format(ntargs, max_workers))
+            executor = ProcessPoolExecutor(max_workers = max_workers, initializer = _set_reference,
+                                                                                initargs = (ref_files,))
+            results = executor.map(_compare_target_in_worker, targ_dirs, [use_sidecars]*ntargs)
+        else:
+            executor = None
+            results = ((compare_target_dir(targ_dir, use_sidecars, ref_files), '') for targ_dir in targ_dirs)
+
+        target_blocks = []
+        for targ_id, (comparisons, log) in zip(targ_ids, results):
+            print(log, end = '')
+            target_blocks.append([_target_block(comparison) for comparison in comparisons])
+
+            nsame = len([comp for comp in comparisons if comp is not None and comp['result'] == 'Identical'])
+            nmissing = comparisons.count(None)
+            print('Target {}: {} identical, {} different, {} missing'
+                                            .format(targ_id, nsame, len(comparisons) - nsame - nmissing, nmissing))
+            params.report_progress(len(target_blocks), ntargs, targ_id)
+            if params.cancel_requested():
+                break
+
+        if executor is not None:
+            executor.shutdown(cancel_futures = True)
+
+        # one row per reference file and one block of columns per target
+        # ===============================================================
+        wrksht = XlsxSheetWriter(wrkbk, 'Summary')
+        nblock = len(SHORT_TITLES) - 1
+        id_row = list([''])
+        for targ_id in targ_ids[:len(target_blocks)]:
+            id_row += [targ_id] + ['']*(nblock - 1)
+        wrksht.write_row(1, id_row, convert = False)
+        wrksht.write_row(2, SHORT_TITLES[:1] + SHORT_TITLES[1:]*len(target_blocks), convert = False)
+
+        for irow, fname_short in enumerate(ref_files):
+            cells = list([fname_short])
+            for blocks in target_blocks:
+                cells += blocks[irow]
+            wrksht.write_row(irow + 3, cells)
+
+        if len(target_blocks) < ntargs:
+            print('Cancelled after {} of {} targets'.format(len(target_blocks), ntargs))
+        else:
+            print('Completed comparisons with {} targets'.format(ntargs))
         wrkbk.save(out_fname)
         print('Result written to file: {}\n'.format(out_fname))
 
         return 'dummy'
 
-    def write_sum_file(self, title_lines, out_fname, wrkbk, wrksht_sum, row_sum):
+    def compare_file_pair(self, ref_file, targ_file, use_sidecars = False):
+        """
+        compare one reference file with its target, returning the Short Summary line, if any, and
+        the header lines and matrix of differences for those files which differ but have the same shape
+        when use_sidecars is set the columnar sidecar of each file is used, and written if out of date
+        """
+        comparison = {'fname_short': self.fname_short, 'short_line': None, 'title_lines': [], 'diff': None}
+
+        # each file is read once - the shape is gathered while the rows are tokenised
+        # ==========================================================================
+        if use_sidecars:
+            tok_ref = open_columnar(ref_file)
+            tok_targ = open_columnar(targ_file)
+            identical = tok_ref.digest == tok_targ.digest
+        else:
+            ref_raw = read_raw(ref_file)
+            targ_raw = read_raw(targ_file)
+            identical = ref_raw == targ_raw
+            if identical:
+                tok_ref = TokenisedFile(ref_file, ref_raw, keep_rows = False)
+
+        if identical:
+            return self._identical_comparison(tok_ref, comparison)
+
+        # Differences detected
+        # ====================
+
+        # check number of words are same
+        if not use_sidecars:
+            tok_ref = build_columnar(ref_file, ref_raw)
+            tok_targ = build_columnar(targ_file, targ_raw, like = tok_ref)
+            del targ_raw, ref_raw
+
+        return self._compare_parsed(tok_ref, tok_targ, comparison)
+
+    def compare_indexed_pair(self, ref_file, targ_file, executor, nranges):
+        """
+        as compare_file_pair without sidecars, for a large pair of files: rows are located using the line index of
+        each file and compared in nranges ranges by the worker processes of executor, which read only their rows
+        as sidecars are not used the indexes are held in memory only and are not written beside the files
+        """
+        comparison = {'fname_short': self.fname_short, 'short_line': None, 'title_lines': [], 'diff': None}
+
+        ref_raw = read_raw(ref_file)
+        targ_raw = read_raw(targ_file)
+        identical = ref_raw == targ_raw
+        idx_ref = build_line_index(ref_file, ref_raw)
+        if identical:
+            idx_targ = idx_ref
+        else:
+            idx_targ = build_line_index(targ_file, targ_raw)
+        del ref_raw, targ_raw
+
+        # lines of the text which cannot be reconciled with the bytes of the file
+        # =======================================================================
+        if idx_ref is None or idx_targ is None:
+            return self.compare_file_pair(ref_file, targ_file)
+
+        if identical:
+            return self._identical_comparison(idx_ref, comparison)
+
+        return self._compare_parsed(idx_ref, idx_targ, comparison, executor, nranges)
+
+    def compare_sampled_pair(self, ref_file, targ_file, row_filter, use_sidecars = False):
+        """
+        quick look at a pair of files: only the data rows selected by row_filter, as from sampled_rows, are read,
+        using the line index of each file, and compared; other rows are neither read nor parsed
+        the largest difference observed is reported together with an estimate of the largest difference of all rows
+        as for sidecars, the line index of each file is only written, and reused, when use_sidecars is set
+        """
+        comparison = {'fname_short': self.fname_short, 'short_line': None, 'title_lines': [], 'diff': None}
+        fname_short = self.fname_short
+
+        index_func = open_line_index if use_sidecars else build_line_index
+        idx_ref = index_func(ref_file)
+        idx_targ = index_func(targ_file)
+        if idx_ref is None or idx_targ is None:
+            print('Could not index {} - will compare every row'.format(fname_short))
+            return self.compare_file_pair(ref_file, targ_file, use_sidecars)
+
+        nlines_targ, max_len_row, nwords_targ = idx_targ.shape()
+        nlines_ref, max_len_ref, nwords_ref = idx_ref.shape()
+        if nlines_targ != nlines_ref:
+            comparison['short_line'] = fname_short + ',Different,{0},{1},{2},{3},{4},{5}'\
+                .format(nlines_targ, nwords_targ, max_len_row, nlines_ref, nwords_ref, max_len_ref)
+            comparison['result'] = 'Different with different shape'
+            return comparison
+
+        nhead_lines = min(2 if fname_short in two_line_files else 1, nlines_ref)
+        comparison['title_lines'] = read_lines(ref_file, 0, idx_ref.offsets[nhead_lines])
+
+        # rows whose number of words differ are skipped as for a full comparison
+        # =======================================================================
+        first_row, end_row, every = row_filter
+        data_lines = idx_ref.data_lines()
+        file_lines = data_lines[first_row:end_row:every]
+        row_lens = idx_ref.row_lens[file_lines]
+        targ_lens = idx_targ.row_lens[file_lines]
+        row_ids = self._row_ids(idx_ref, idx_targ)[file_lines]
+        irows_skip = (row_lens != targ_lens).nonzero()[0]
+        for irow in irows_skip[:MAX_NUM_LINE_DIFFS].tolist():
+            print('Number of words {0} (ref) and {1} (targ) differ on line {2} of file {3} - will skip'
+                                        .format(row_lens[irow], targ_lens[irow], row_ids[irow], fname_short))
+        file_lines = file_lines[row_lens == targ_lens]
+        row_ids = row_ids[row_lens == targ_lens]
+        row_lens = row_lens[row_lens == targ_lens]
+
+        if len(file_lines) > 0:
+            ref_span, targ_span = [tuple([int(line_index.offsets[file_lines[0]]),
+                                int(line_index.offsets[file_lines[-1] + 1])]) for line_index in (idx_ref, idx_targ)]
+            stats, first_id, self.diff = diff_read_rows(ref_file, targ_file, ref_span, targ_span, fname_short,
+                                            row_ids, row_lens, file_lines, max_len_row, compact = True)
+        else:
+            stats = new_stats()
+            self.diff = zeros((max_len_row, 0), dtype=float64)
+        for key in stats:
+            setattr(self, key, stats[key])
+
+        # the largest difference of the rows not compared is estimated from the two largest of those compared
+        # ===================================================================================================
+        row_maxs = sort(fmax.reduce(self.diff, axis = 0, initial = 0.0))
+        if len(row_maxs) > 1:
+            est_diff = 2*row_maxs[-1] - row_maxs[-2]
+        else:
+            est_diff = self.lrgstFltDiff
+        nrows = len(file_lines)
+        print('{}: compared {} of {} data rows, largest difference {} observed and {} estimated'
+                                        .format(fname_short, nrows, len(data_lines), self.lrgstFltDiff, est_diff))
+
+        # a window beyond the end of the file, or of years of a file without daily rows, selects no rows
+        # ==============================================================================================
+        differ = self.nteqlFlts + self.diffInts > 0
+        if nrows == 0:
+            same_str, result = 'No rows compared', 'No rows compared'
+        elif differ:
+            same_str, result = 'Different', 'Different in rows compared'
+        else:
+            same_str, result = 'Same rows', 'Same in rows compared'
+        line_str = fname_short + ',{0},{1},{2},{3},,,'.format(same_str, nlines_targ, nwords_targ, max_len_row)
+        line_str = self._short_line(line_str, len(irows_skip))
+        if line_str is not None:
+            line_str += ',{0},{1},{2}'.format(nrows, len(data_lines), est_diff)
+        comparison['short_line'] = line_str
+        comparison['diff'] = self.diff
+        comparison['result'] = result
+
+        return comparison
+
+    def _row_ids(self, idx_ref, idx_targ):
+        """
+        id of each line as numbered by select_rows, so that rows are reported as by a full comparison: header lines
+        are counted but a row whose number of words differ does not advance the count
+        """
+        fname_short = self.fname_short
+        skipped = idx_ref.row_lens != idx_targ.row_lens
+        skipped[:2 if fname_short in two_line_files else 1] = False
+        if fname_short == 'TOTC.OUT':
+            skipped[[iline for iline in (2, 4) if iline < len(skipped)]] = False
+
+        return arange(len(skipped)) - (cumsum(skipped) - skipped)
+
+    def compare_with_reference(self, tok_ref, targ_file, use_sidecars = False):
+        """
+        as compare_file_pair but the reference file has already been parsed as an out_sidecar_funcs.ColumnarFile,
+        so that it is parsed once however many targets it is compared with
+        """
+        comparison = {'fname_short': self.fname_short, 'short_line': None, 'title_lines': [], 'diff': None}
+
+        # the content hash of the reference stands in for its bytes
+        # =========================================================
+        if use_sidecars:
+            tok_targ = open_columnar(targ_file)
+            targ_digest = tok_targ.digest
+        else:
+            targ_raw = read_raw(targ_file)
+            targ_digest = sha256(targ_raw).hexdigest()
+
+        if targ_digest == tok_ref.digest:
+            return self._identical_comparison(tok_ref, comparison)
+
+        if not use_sidecars:
+            tok_targ = build_columnar(targ_file, targ_raw, like = tok_ref)
+            del targ_raw
+
+        return self._compare_parsed(tok_ref, tok_targ, comparison)
+
+    def _identical_comparison(self, tok_ref, comparison):
+        """
+        C
+        """
+        nlines, max_len_row, nwords = tok_ref.shape()
+        comparison['result'] = 'Identical'
+        comparison['short_line'] = comparison['fname_short'] + ',' + comparison['result'] + ',{0},{1},{2}'\
+                                                                            .format(nlines, nwords, max_len_row)
+        return comparison
+
+    def _compare_parsed(self, tok_ref, tok_targ, comparison, executor = None, nranges = 1):
+        """
+        compare files which differ, both parsed as out_sidecar_funcs.ColumnarFile objects or, if executor
+        is supplied, both indexed as out_index_funcs.LineIndex objects
+        """
+        line_str = comparison['fname_short']
+        nwords = zeros(2, dtype=int64)
+        nlines = zeros(2, dtype=int64)
+        max_len_row = zeros(2, dtype=int64)
+
+        for i, tok_file in zip(range(0,2), list([tok_targ, tok_ref])):
+            nlines[i], max_len_row[i], nwords[i] = tok_file.shape()
+
+        # compare each entity if there is a files equivalence
+        # if nwords[0] == nwords[1] and nlines[0] == nlines[1]: - too strict
+        if nlines[0] == nlines[1]:
+            line_str = line_str + ',Different,{0},{1},{2},,,'.format(nlines[0], nwords[0], max_len_row[0])
+            self.diff = zeros(max_len_row[0]*nlines[0], dtype=float64)
+            self.diff.shape = (max_len_row[0], nlines[0])
+            comparison['short_line'], comparison['title_lines'] = self.compare_files(tok_targ, tok_ref, line_str,
+                                                                                                executor, nranges)
+            comparison['diff'] = self.diff
+            comparison['result'] = 'Different but same shape'
+        else:
+            comparison['short_line'] = line_str + ',Different,{0},{1},{2},{3},{4},{5}'\
+                .format(nlines[0], nwords[0], max_len_row[0], nlines[1], nwords[1], max_len_row[1])
+            comparison['result'] = 'Different with different shape'
+
+        return comparison
+
+    def write_sum_file(self, title_lines, wrkbk, wrksht_sum, row_sum):
         """
-        add lines to summary file and write Excel file of differences between .OUT files
+        add lines to summary sheet and write worksheet of differences between .OUT files
         """
 
         # create appropriately named worksheet
         fname = self.fname_short
         root_name, dummy = splitext(fname)
-        max_len_row, nlines = self.diff.shape
-        wrksht = wrkbk.create_sheet()
-        wrksht.title = root_name
-
-        # set up storage with sufficient number of elements
-        max_vals = zeros(max_len_row, dtype=float64)
+        wrksht = XlsxSheetWriter(wrkbk, root_name)
 
         # write header- expect up to two lines
         if len(title_lines) > 1:
-            wrksht['A1'] = title_lines[0]
+            wrksht.write_row(1, title_lines[:1], convert = False)
             nextrow = 2
         else:
             nextrow = 1
 
-        # writerow_out(title_lines[-1].split())
-        write_xlsx_row(1, nextrow, title_lines[-1].split(), wrksht)
+        wrksht.write_row(nextrow, title_lines[-1].split())
         nextrow += 1
 
         # write to summary sheet
-        write_xlsx_row(1, row_sum, ['']+ title_lines[-1].split(), wrksht_sum)
+        wrksht_sum.write_row(row_sum, ['']+ title_lines[-1].split())
         row_sum += 1
 
-        for iline in range(0,nlines):
-            # writerow_out(self.diff[:,iline])
-            write_xlsx_row(1, nextrow, self.diff[:,iline], wrksht)
-            nextrow += 1
-
-            # check each value to determine max_value for that column
-            for icol in range(0,max_len_row):
-                z = self.diff[icol,iline]
-                if z > max_vals[icol]:
-                    max_vals[icol] = z
+        # one row per line - NaNs are ignored when determining the max_value for each column
+        wrksht.write_matrix(nextrow, self.diff.T)
+        max_vals = fmax.reduce(self.diff, axis = 1, initial = 0.0)
 
         # write results to summary file - make sure blank row
-        write_xlsx_row(1, row_sum, list([fname]) + list(max_vals), wrksht_sum)
+        wrksht_sum.write_row(row_sum, list([fname]) + list(max_vals))
         row_sum += 2
 
-        # Save after each worksheet has been written
-        wrkbk.save(out_fname)
-
         return row_sum
 
-    # invokes def process_two_atoms
-    def compare_files(self, wrksht_short, row_short, targ_file, ref_file, line_str):
+    # invokes diff_engine_funcs.diff_token_rows
+    def select_rows(self, tok_targ, tok_ref):
         """
-        C
+        rows to be compared, skipping header lines and rows whose number of words differ
+        returns the header lines, id, number of words and line of each row and the number of rows skipped
         """
-
-        # assumption is that both files have the same number of lines and words
         fname_short = self.fname_short
-        twoLineList = list(['BIOC.OUT','BION.OUT','CROPN.OUT','CO2.OUT','DENITN.OUT','DPMC.OUT','DPMN.OUT',
-                            'EVAP_SUNDIAL.OUT',
-                'HUMC.OUT','HUMN.OUT','LEACHN.OUT',	'MINERN.OUT','NH4N.OUT','NITRIFN.OUT','NO3N.OUT','RPMC.OUT',
-                            'RPMN.OUT','SOILN.OUT','SUMMARY.OUT','TOTC.OUT','TOTN.OUT'])
-        # this is rather crude...
-        feed_targ = open(targ_file, 'r').read()
-        feed_targ_lines = feed_targ.splitlines()
-
-        feed_ref = open(ref_file, 'r').read()
-        feed_ref_lines = feed_ref.splitlines()
-
-        num_words = 0
-
         nline = 0
-        self.numInts = 0
-        self.sameInts = 0
-        self.diffInts = 0
-        self.numFlts = 0
-        self.eqlFlts = 0
-        self.nteqlFlts = 0
-        self.lrgstFltDiff = 0.0
-        self.lrgstFltCoord = list([0,0])
-        self.badVals = 0
-        self.NaNs = 0
-        self.asterisks = 0
 
         title_lines = []
         num_line_diffs = 0
-        max_num_line_diffs = 10
+
+        # rows to be compared are gathered then processed in a single batch
+        # =================================================================
+        row_ids = []
+        row_lens = []
+        file_lines = []
 
         # step through each line
-        for line_targ, line_ref in zip(feed_targ_lines,feed_ref_lines):
+        for iline, (nlen_targ, nlen_ref) in enumerate(zip(tok_targ.row_lens.tolist(), tok_ref.row_lens.tolist())):
 
             # always skip header - some have two lines
             if nline == 0:
-                title_lines.append(line_ref)
+                title_lines.append(tok_ref.line(iline))
                 nline += 1
                 continue
 
             # some filesw have two header lines
             if nline == 1:
-                try:
-                    twoLineList.index(fname_short)
-                    title_lines.append(line_ref)
+                if fname_short in two_line_files:
+                    title_lines.append(tok_ref.line(iline))
                     nline += 1
                     continue
-                except ValueError:
-                    pass
 
             # some TOTC.OUT has 3 lines of headers and a random line 5
             if fname_short == 'TOTC.OUT':
@@ -306,150 +869,112 @@ class Analysis(object,):
                     nline += 1
                     continue
 
-            line_atoms_ref = line_ref.split()
-            line_atoms_targ = line_targ.split()
-            nlen_ref = len(line_atoms_ref)
-            nlen_targ = len(line_atoms_targ)
             if nlen_ref != nlen_targ:
                 print('Number of words {0} (ref) and {1} (targ) differ on line {2} of file {3} - will skip'
                          .format(nlen_ref, nlen_targ, nline, fname_short))
                 num_line_diffs += 1
-                if num_line_diffs >= max_num_line_diffs:
+                if num_line_diffs >= MAX_NUM_LINE_DIFFS:
                     break
                 else:
                     continue
             else:
-                # work through each atom
-                for icol, atom_targ, atom_ref in zip(range(0,nlen_ref), line_atoms_targ, line_atoms_ref):
-                    retcode = self.process_two_atoms(nline, icol, atom_ref, atom_targ, line_targ, line_ref)
-                    # abandon processing of line if bad data
-                    if retcode == -1:
-                        break
-
-            num_words += len(line_ref.split())
+                row_ids.append(nline)
+                row_lens.append(nlen_ref)
+                file_lines.append(iline)
+
             nline += 1
 
-        if num_line_diffs >= max_num_line_diffs:
+        return title_lines, row_ids, row_lens, file_lines, num_line_diffs
+
+    def compare_files(self, tok_targ, tok_ref, line_str, executor = None, nranges = 1):
+        """
+        compares the target and reference files, previously parsed as out_sidecar_funcs.ColumnarFile objects or,
+        if executor is supplied, indexed as out_index_funcs.LineIndex objects whose rows are compared in ranges
+        returns the Short Summary line, or None if the comparison was discontinued, and the header lines
+        """
+
+        # assumption is that both files have the same number of lines and words
+        title_lines, row_ids, row_lens, file_lines, num_line_diffs = self.select_rows(tok_targ, tok_ref)
+        if executor is None:
+            stats = self._diff_rows(tok_ref, tok_targ, row_ids, row_lens, file_lines)
+        else:
+            stats = self._diff_row_ranges(tok_ref, tok_targ, row_ids, row_lens, file_lines, executor, nranges)
+        for key in stats:
+            setattr(self, key, stats[key])
+
+        return self._short_line(line_str, num_line_diffs), title_lines
+
+    def _diff_rows(self, tok_ref, tok_targ, row_ids, row_lens, file_lines):
+        """
+        compare the selected rows of two parsed files in a single batch
+        """
+        # work through all atoms at once - tokens must be of the same type to be compared
+        # rows with the same text in both files are credited in bulk and only the remainder taken from the target
+        # ========================================================================================================
+        cols_ref = tok_ref.select_rows(file_lines)
+        if tok_ref.line_hashes is None or tok_targ.line_hashes is None:
+            same_rows = None
+            cols_targ = tok_targ.select_rows(file_lines)
+        else:
+            file_lines = array(file_lines, dtype=int64)
+            same_rows = tok_ref.line_hashes[file_lines] == tok_targ.line_hashes[file_lines]
+            cols_targ = tok_targ.select_rows(file_lines[~same_rows])
+        if cols_ref['tokens'].dtype.kind != cols_targ['tokens'].dtype.kind:
+            for cols in (cols_ref, cols_targ):
+                cols['tokens'] = cols['tokens'].astype(str)
+
+        def line_pair(irow):
+            return tok_ref.line(file_lines[irow]), tok_targ.line(file_lines[irow])
+
+        return diff_token_rows(self.fname_short, row_ids, row_lens, cols_ref, cols_targ, line_pair, self.diff,
+                                                                                                        same_rows)
+
+    def _short_line(self, line_str, num_line_diffs):
+        """
+        Short Summary line from the counters of a comparison, or None if the comparison was discontinued
+        """
+        if num_line_diffs >= MAX_NUM_LINE_DIFFS:
             print(line_str + ' discontinued comparison due to too many line differences')
+            line_str = None
         else:
             coord = '{0} {1}'.format(self.lrgstFltCoord[0],self.lrgstFltCoord[1])
             line_str = line_str + '{0},{1},{2},{3},{4},{5},{6},{7},{8},{9},{10}'\
                 .format(self.numInts, self.sameInts, self.diffInts,\
                     self.numFlts, self.eqlFlts, self.nteqlFlts, self.lrgstFltDiff, coord,\
                         self.NaNs, self.asterisks, self.badVals)
-            write_xlsx_row(1, row_short, line_str.split(','), wrksht_short)
-            row_short += 1
 
-        return [row_short] + title_lines
+        return line_str
 
-    def process_two_atoms (self, nline, icol, atom_ref, atom_targ, line_targ, line_ref):
+    def _diff_row_ranges(self, idx_ref, idx_targ, row_ids, row_lens, file_lines, executor, nranges):
         """
-        C
+        compare ranges of rows in the worker processes of executor, each reading its rows using the line indexes
+        of the two files, then merge the counters and differences of the ranges in order
         """
-        func_name =  ' process_two_atoms'
-        # =========================================
-
-        # check that each are valid
-        if atom_targ == 'NaN' or atom_ref == 'NaN':
-            # self.diff[icol,nline] = float('nan')
-            self.diff[icol,nline] = no_data
-            self.NaNs += 1
-            return 0
-
-        if atom_targ.find('****') != -1 or atom_ref.find('****') != -1:
-            # self.diff[icol,nline] = float('nan')
-            self.diff[icol,nline] = no_data
-            self.asterisks += 1
-            return 0
-
-        # ignore integer values
-        intFlag = False
-        try:
-            valRef = int(atom_ref)
-            try:
-                valTarg = int(atom_targ)
-                intFlag = True  # both values are integer
-                self.numInts += 1
-                if valTarg == valRef:
-                    self.sameInts += 1
-                else:
-                    self.diffInts +=1
-
-            except ValueError:
-                pass
-        except ValueError:
-            pass
-
-        if intFlag:
-            return 0
-
-        # process float values
-        fltFlag = False
-        try:
-            valRef = float(atom_ref)
-            try:
-                valTarg = float(atom_targ)
-                fltFlag = True
-                self.numFlts += 1
-            except ValueError:
-                typeVal = 'reference'
-                pass
-
-        except ValueError:
-            typeVal = 'target'
-            pass
-
-        if fltFlag:
-            if atom_ref == atom_targ:
-                diffVal = 0.0
-                self.eqlFlts += 1
-            else:
-                denom = valRef + valTarg
-                if denom == 0.0:
-                    diffVal = 0.0
-                else:
-                    diffVal = abs((valRef - valTarg)/denom)
-                    if diffVal > self.lrgstFltDiff:
-                        self.lrgstFltDiff = diffVal
-                        self.lrgstFltCoord = list([nline + 1, icol + 1])
-                self.nteqlFlts += 1
-        else:
-
-            str1 = 'Warning in function: <{0}>\tfile name: {1}\tValueError on line {2} column {3} converting {4} value.'\
-                                    .format(func_name, self.fname_short, nline + 1, icol + 1, typeVal)
-            if line_ref == line_targ:
-                print(str1 + '\tReference and target lines are identical - will skip:\n\t{0}'.format(line_ref))
-            else:
-                print(str1 + '\tValues, reference/target: {0}/{1} - will skip'.format(atom_ref, atom_targ))
-            return -1
+        stats = new_stats()
+        row_ids = array(row_ids, dtype=int64)
+        row_lens = array(row_lens, dtype=int64)
+        file_lines = array(file_lines, dtype=int64)
+
+        futures = []
+        for irows in array_split(arange(len(file_lines)), nranges):
+            if len(irows) == 0:
+                continue
+            ilines = file_lines[irows]
+            ref_span, targ_span = [tuple([int(line_index.offsets[ilines[0]]), int(line_index.offsets[ilines[-1] + 1])])
+                                                                            for line_index in (idx_ref, idx_targ)]
+            futures.append(executor.submit(_diff_row_range, idx_ref.fname, idx_targ.fname, ref_span, targ_span,
+                                self.fname_short, row_ids[irows], row_lens[irows], ilines, self.diff.shape[0]))
 
-        try:
-            self.diff[icol,nline] = diffVal
-        except IndexError:
-            print('IndexError in {0}: icol: {1}, nline: {2}, shape: {3}'
-                  .format(func_name,icol,nline,self.diff.shape))
-        except ValueError:
-            print('ValueError in {0}: icol: {1}, nline: {2}, diffVal: {3}'
-                  .format(func_name,icol,nline,diffVal))
+        for future in futures:
+            range_stats, first_id, diff, log = future.result()
+            print(log, end = '')
+            self.diff[:, first_id:first_id + diff.shape[1]] = diff
+            merge_stats(stats, range_stats)
 
-        return 0
+        return stats
 
     def get_num_words(self, fname):
         """
         C
         """
-        max_len_row = 0
-
-        feed = open(fname, 'r').read()
-        feed_lines = feed.splitlines()
-
-        num_lines = len(feed_lines)
-        num_words = 0
-
-        for line in feed_lines:
-            len_row = len(line.split())
-            num_words += len_row
-            if len_row > max_len_row:
-                max_len_row = len_row
-
-        return list([num_lines, max_len_row, num_words])
+        return TokenisedFile(fname, keep_rows = False).shape()
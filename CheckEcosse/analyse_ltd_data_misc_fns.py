@@ -8,11 +8,14 @@
 #!/usr/bin/env python
 
 __prog__ = 'analyse_ltd_data_misc_fns.py'
-__version__ = '0.0.1'
+__version__ = '0.0.4'
 
 # Version history
 # ---------------
 # 0.0.1  Wrote.
+# 0.0.2  Outcome of a check optionally recorded in a report for the batch compliance check
+# 0.0.3  Met files looked up and validated through the shared weather registry
+# 0.0.4  Input files checked against the compiled layouts of input_layouts
 #
 from glob import glob
 from os.path import join, isfile
@@ -20,158 +23,222 @@ from numpy import arange, dtype, zeros, int64, float64
 import filecmp
 import common_funcs
 from common_funcs import write_xlsx_cell, write_xlsx_row
+from input_layouts import CONVERTERS, FIELD_WIDTH, LAYOUTS
+from weather_registry import check_met_files
 
 wildCard = '/*.*'
 no_data = -999.0
 filter_files = list(['fort.6','fort.21','fort.57','INPUTS.OUT','ERROR.MSG','NOERROR.MSG','PARLIS.DAT'])
 
-def check_weather(ref_dir, nl_strt, nyears, lines):
+def new_report():
+    """
+    outcome of the compliance check of one directory - the first failure is recorded by check_block
+    result is one of pass, fail or missing, the latter when a required file does not exist
+    """
+    return {'mode': '', 'result': 'pass', 'block': '', 'line': '', 'nerrors': 0, 'nmissing_met': 0, 'nbad_met': 0}
 
+def record_failure(report, result, block_name, nline = '', nerrors = 0):
+    """
+    only the first failure is recorded since checking stops at a failed block
+    """
+    if report is not None and report['result'] == 'pass':
+        report.update({'result': result, 'block': block_name, 'line': nline, 'nerrors': nerrors})
+
+def check_weather(ref_dir, nl_strt, nyears, lines, report = None):
+
+    # consecutive years with the same met file are reported once
+    # ==========================================================
     prev_fname = ''
+    met_files = []
     nl_end = nl_strt + nyears
     for rec in lines[nl_strt:nl_end]:
         fname = rec.split()[0]
         fname = fname.strip("'") # get rid of unnecessary quotes
-        met_file = join(ref_dir, fname)
-        if isfile(met_file):
-            mess = 'Met file ' + met_file + ' exists'
+        if fname != prev_fname:
+            met_files.append(join(ref_dir, fname))
+        prev_fname = fname
+
+    for met_file, problems in zip(met_files, check_met_files(met_files)):
+        if problems is None:
+            print('*** Warning *** met file ' + met_file + ' does not exist')
+            if report is not None:
+                report['nmissing_met'] += 1
+        elif len(problems) == 0:
+            print('Met file ' + met_file + ' exists')
         else:
-            mess ='*** Warning *** met file ' + met_file + ' does not exist'
+            print('*** Warning *** met file ' + met_file + ' exists but has ' + '; '.join(problems))
+            if report is not None:
+                report['nbad_met'] += 1
 
-        if prev_fname != fname:
-                print(mess)
+    return nl_end
 
-        prev_fname = fname
+def check_block(block_name, nl_strt, lines, val_types, report = None):
 
-    return nl_end
+    converters = [CONVERTERS[val_type] for val_type in val_types]
 
-def check_block(block_name, nl_strt, lines, val_types):
+    return _check_fields(block_name, nl_strt, lines, converters, report)
 
-    n_lines = len(val_types)
+def _check_fields(block_name, nl_strt, lines, converters, report):
+    '''
+    the value of each line of the block is converted in one step and, only if that fails, line by line to
+    report each error
+    '''
+    n_lines = len(converters)
     vals = []
     nbad_lines = 0
+    first_bad = 0
     nl_end = nl_strt + n_lines
     if nl_end > len(lines):
         print('No lines for block: {}\tat line {}\t# lines in file: {}'.format(block_name, nl_end, len(lines)))
+        record_failure(report, 'fail', block_name, nl_end)
         return -1, vals
 
     lines_block = lines[nl_strt:nl_end]
-
-    for indx, rec in enumerate(lines_block):
-        sval = rec[:10]
-        try:
-            if val_types[indx] == 'I':
-                val = int(sval)
-            else:
-                val = float(sval)
-            vals.append(val)
-        except ValueError as err:
-            print('Error at line {}: {}'.format(nl_strt + indx + 1, err))
-            nbad_lines += 1
+    try:
+        vals = [convert(rec[:FIELD_WIDTH]) for convert, rec in zip(converters, lines_block)]
+    except ValueError:
+        for indx, rec in enumerate(lines_block):
+            try:
+                vals.append(converters[indx](rec[:FIELD_WIDTH]))
+            except ValueError as err:
+                print('Error at line {}: {}'.format(nl_strt + indx + 1, err))
+                nbad_lines += 1
+                if nbad_lines == 1:
+                    first_bad = nl_strt + indx + 1
 
     if nbad_lines == 0:
-        if block_name.startswith('Number of '):
-            print(block_name + ': {}'.format(vals[0]))
-        else:
-            print('\tblock: ' + block_name + ' - OK')
+        _block_ok(block_name, vals)
         return nl_end, vals
     else:
         print('Block: ' + block_name + ' failed with {} errors'.format(nbad_lines))
+        record_failure(report, 'fail', block_name, first_bad, nbad_lines)
         return -1, vals
 
-def check_limited_data_compliance(form):
+def _block_ok(block_name, vals):
+    '''
+    C
+    '''
+    if block_name.startswith('Number of '):
+        print(block_name + ': {}'.format(vals[0]))
+    else:
+        print('\tblock: ' + block_name + ' - OK')
 
-    ref_dir = form.w_lbl03.text()
-    print('\nWill check files in ' + ref_dir)
+    return
 
-    # read fnames file and clean
-    # ==========================
-    inp_fname = join(ref_dir, 'input.txt')
-    if not isfile(inp_fname):
-        print('Limited data mode input file ' + inp_fname + ' does not exist')
-        return
-    with open(inp_fname, 'r') as fobj:
-        lines = fobj.readlines()
+def _check_repeated_blocks(item, nrepeats, lines, line_indx, values):
+    '''
+    convert the lines of every repeat of a blocks item in one step - returns the index of the next line or
+    -1 if any line is missing or fails, in which case nothing is reported
+    '''
+    dummy, var, count, sub_items, converters = item
+    converters = converters*nrepeats
+    nl_end = line_indx + len(converters)
+    if nl_end > len(lines):
+        return -1
 
-    # first 16 lines:
-    # ===============
-    val_types = ['F'] + ['I']
-    line_indx = 0
-    block_name = 'first 2 lines: mode of equilibrium run and number of soil layers (max 10)'
-    line_indx, vals = check_block(block_name, line_indx, lines, val_types)
-    if line_indx == -1:
-        return
+    try:
+        [convert(rec[:FIELD_WIDTH]) for convert, rec in zip(converters, lines[line_indx:nl_end])]
+    except ValueError:
+        return -1
 
-    # soil for each layer and landuse
-    # ===============================
-    mode_of_equilib, nlayers = vals
-    val_types = ['F']*nlayers
-    block_name = 'depths to bottom of SOM layers'.format(nlayers)
-    line_indx, vals = check_block(block_name, line_indx, lines, val_types)
-    if line_indx == -1:
-        return
+    for nrepeat in range(nrepeats):
+        values[var] = nrepeat + 1
+        for sub_item in sub_items:
+            _block_ok(sub_item[1].format(**values) if sub_item[2] else sub_item[1], None)
+
+    return nl_end
 
-    # read blocks of 6 metrics comprising carbon content, bulk density [g/cm3], pH, % clay,  % silt, % sand
-    # =====================================================================================================
-    nmetrics = 6
-    val_types = ['F']*nmetrics
-    n_land_uses = 6
-    for lu in range(n_land_uses):
-        for ilyr in range(nlayers):
-            block_name = 'soil definition for layer: {}\tlanduse: {}'.format(ilyr + 1,lu + 1)
-            line_indx, vals = check_block(block_name, line_indx, lines, val_types)
+def _layout_count(count, values):
+    '''
+    counts are numbers or the names of values already read
+    '''
+    if isinstance(count, int):
+        return count
+
+    return values[count]
+
+def _check_items(items, lines, line_indx, values, ref_dir, report):
+    '''
+    check the items of a compiled layout from line_indx - returns the index of the next line or -1 on failure
+    values holds the named values read so far together with the number of each repeat
+    '''
+    for item in items:
+        kind = item[0]
+        if kind == 'block':
+            dummy, block_name, need_format, converters, times, names = item
+            if need_format:
+                block_name = block_name.format(**values)
+            if times != 1:
+                converters = converters*_layout_count(times, values)
+            line_indx, vals = _check_fields(block_name, line_indx, lines, converters, report)
+            if line_indx == -1:
+                return -1
+
+            for indx, name in names:
+                values[name] = vals[indx]
+
+        elif kind == 'weather':
+            line_indx = check_weather(ref_dir, line_indx, _layout_count(item[1], values), lines, report)
+
+        elif kind == 'skip':
+            nskip = _layout_count(item[1], values)
+            print(item[2].format(nskip))
+            line_indx += nskip
+
+        elif kind in ('repeat', 'blocks'):
+            nrepeats = _layout_count(item[2], values)
+            if kind == 'blocks':
+                nl_end = _check_repeated_blocks(item, nrepeats, lines, line_indx, values)
+                if nl_end != -1:
+                    line_indx = nl_end
+                    continue
+
+            # check repeat by repeat, which also reports the line of each error
+            # ===================================================================
+            dummy, var, count, sub_items = item[:4]
+            for nrepeat in range(nrepeats):
+                values[var] = nrepeat + 1
+                line_indx = _check_items(sub_items, lines, line_indx, values, ref_dir, report)
+                if line_indx == -1:
+                    return -1
+
+        elif kind == 'version':
+            dummy, marker, nlines, marked_items, unmarked_items = item
+            marked = any(line.lower().find(marker) >= 0 for line in lines[line_indx:line_indx + nlines])
+            line_indx = _check_items(marked_items if marked else unmarked_items, lines, line_indx, values, ref_dir,
+                                                                                                            report)
             if line_indx == -1:
-                return
+                return -1
 
-    print('skipped {} obsolete lines'.format(n_land_uses))
-    line_indx += n_land_uses
+    return line_indx
 
-    val_types = ['F']*24
-    block_name = 'Long term average monthly precipitation [mm] and temperature [degC]'
-    line_indx, vals = check_block(block_name, line_indx, lines, val_types)
-    if line_indx == -1:
-        return
+def check_layout(layout_name, lines, ref_dir, report = None):
+    '''
+    check the lines of an input file against one of the compiled layouts of input_layouts, stopping at the first
+    failed block - returns True if every block is compliant
+    '''
+    line_indx = _check_items(LAYOUTS[layout_name], lines, 0, {}, ref_dir, report)
 
-    # ======= determine whether V6.3 or later =====================
-    mx_stnd_flag = False
-    for line in lines[line_indx:line_indx + 4]:
-        if line.lower().find('max standing') >= 0:
-            mx_stnd_flag = True
-            break
-
-    if mx_stnd_flag:
-        val_types = ['F']*3 + ['I']
-        block_name = 'Latitude, water table depth, max standing, Drainage class'
-        line_indx, vals = check_block(block_name, line_indx, lines, val_types)
-        if line_indx == -1:
-            return
-    else:
-        val_types = ['F'] * 2 + ['I']
-        block_name = 'Latitude, water table depth, Drainage class'
-        line_indx, vals = check_block(block_name, line_indx, lines, val_types)
-        if line_indx == -1:
-            return
-    # ===============================
-    nskip = 4
-    print('skipped {} obsolete lines'.format(nskip))
-    line_indx += nskip
-
-    val_types = ['I']
-    block_name = 'Number of growing seasons'
-    line_indx, vals = check_block(block_name, line_indx, lines, val_types)
-    if line_indx == -1:
-        return
+    return line_indx != -1
 
-    ngrow_seasons = vals[0]
-    print('skipped {} growing seasons'.format(ngrow_seasons))
-    line_indx += ngrow_seasons
+def check_limited_data_compliance(params, report = None):
 
-    # check weather files
-    #  ==================
-    line_indx = check_weather(ref_dir, line_indx, ngrow_seasons, lines)
-    if line_indx == -1:
+    ref_dir = params.ref_dir
+    print('\nWill check files in ' + ref_dir)
+    if report is not None:
+        report['mode'] = 'limited data'
+
+    # read fnames file and clean
+    # ==========================
+    inp_fname = join(ref_dir, 'input.txt')
+    if not isfile(inp_fname):
+        print('Limited data mode input file ' + inp_fname + ' does not exist')
+        record_failure(report, 'missing', 'input.txt')
         return
+    with open(inp_fname, 'r') as fobj:
+        lines = fobj.readlines()
 
-    print('Finished checking files in ' + ref_dir)
+    if check_layout('limited data', lines, ref_dir, report):
+        print('Finished checking files in ' + ref_dir)
 
     return
@@ -8,27 +8,38 @@
 #!/usr/bin/env python
 
 __prog__ = 'analyse_site_spec_dir.py'
-__version__ = '0.0.1'
+__version__ = '0.0.3'
 
 # Version history
 # ---------------
 # 0.0.1  Wrote.
+# 0.0.2  Files compared by the content hashes of directory manifests rather than by filecmp
+#        Reference directory may be compared with many targets
+#        Directory scan may be recursive
+#        Outcome of the compliance check optionally recorded in a report for the batch compliance check
+#        Management file checked against its layout in input_layouts
+# 0.0.3  Only the files of the type being checked are hashed when directories are compared
+#        Manifests kept in the results directory rather than in the directories compared
 #
 from glob import glob
 from os.path import join, split, isfile, splitext, basename
 from numpy import arange, dtype, zeros, int64, float64
-import filecmp
 import common_funcs
-from analyse_ltd_data_misc_fns import check_weather, check_block, check_limited_data_compliance
-from common_funcs import write_xlsx_cell, write_xlsx_row
+from analyse_ltd_data_misc_fns import check_layout, check_limited_data_compliance, record_failure
+from common_funcs import XlsxSheetWriter
+from out_file_funcs import TokenisedFile
+from out_sidecar_funcs import load_sidecar
+from dir_manifest_funcs import compare_dirs
+from tree_scan_funcs import scan_tree
 
 wildCard = '/*.*'
 no_data = -999.0
 filter_files = list(['fort.6','fort.21','fort.57','INPUTS.OUT','ERROR.MSG','NOERROR.MSG','PARLIS.DAT'])
 
-def _check_management_file(inp_fname):
+def _check_management_file(inp_fname, report = None):
     '''
     step through each line where the first line is zeroth index in line list
+    the layout of the file is declared by MANAGEMENT_LAYOUT of input_layouts
     '''
 
     fobj = open(inp_fname, 'r')
@@ -36,88 +47,13 @@ def _check_management_file(inp_fname):
     fobj.close()
 
     ref_dir, dummy = split(inp_fname)
-
-    '''
-    first 16 lines:
-    ===============
-            NSOILJ, IDRAINJ, IROCKJ, LCROP, PREYLD, ATM, IDATEFC, TIMESTEP, MODTYPE,
-     &                   NYEARS, ISTHARV, ISTYR, ILAST_TS, FIXEND,LAT,WTABLE
-30    FORMAT(4(I10/),2(F10.0/),8(I10/),(F10.0/),F10.0)
-    '''
-    val_types = ['I']*4 + ['F']*2 +['I']*8 +['F']*2
-    line_indx = 0
-    block_name = 'first 16 lines'
-    line_indx, vals = check_block(block_name, line_indx, lines, val_types)
-    if line_indx == -1:
-        return
-
-    # check weather files and read number of crops
-    # ===================
-    nyears = vals[9]
-    line_indx = check_weather(ref_dir, line_indx, nyears, lines)
-    if line_indx == -1:
-        return
-
-    block_name = 'Number of crops'
-    #             ===============
-    val_types = ['I']
-    line_indx, vals = check_block(block_name, line_indx, lines, val_types)
-    if line_indx == -1:
-        return
-
-    # for each crop, read 8 lines
-    # ===========================
-    ncrops = vals[0]
-    val_types = {}
-    val_types['crop'] = ['I']*2 + ['F'] + ['I'] + ['F'] + ['I']*3  # 8 lines
-    val_types['fertiliser'] = ['F'] + ['I'] + ['F']*3 + ['I']*2    # 7 lines
-    val_types['manure'] = ['F'] + ['I']*3  # 4 lines
-
-    for ncrop in range(1,ncrops + 1):
-        block_name = 'crop {}'.format(ncrop)
-        line_indx, crop_vals = check_block(block_name, line_indx, lines, val_types['crop'])
-        if line_indx == -1:
-            break
-
-        nfert_apps = crop_vals[6]
-        for nfert in range(nfert_apps):
-            block_name = 'crop {}\tfertiliser {}'.format(ncrop, nfert + 1)
-            line_indx, vals = check_block(block_name, line_indx, lines, val_types['fertiliser'])
-            if line_indx == -1:
-                break
-
-        norgm_apps = crop_vals[7]
-        for norgm in range(norgm_apps):
-            block_name = 'crop {}\tmanure {}'.format(ncrop, norgm + 1)
-            line_indx, vals = check_block(block_name, line_indx, lines, val_types['manure'])
-            if line_indx == -1:
-                break
-
-    # nested loop
-    # ===========
-    if line_indx == -1:
-        return
-
-    block_name = 'Number of cultivations'
-    #             ======================
-    val_types = ['I']
-    line_indx, vals = check_block(block_name, line_indx, lines, val_types)
-    if line_indx == -1:
-        return
-
-    ncults = vals[0]
-    val_types = ['I']*2 + ['F']     # 3 lines
-    for ncult in range(1, ncults + 1):
-        block_name = 'cultivation {}'.format(ncult)
-        line_indx, vals = check_block(block_name, line_indx, lines, val_types)
-        if line_indx == -1:
-            break
+    check_layout('management', lines, ref_dir, report)
 
     return
 
-def check_input_file_compliance(form):
+def check_input_file_compliance(params, report = None):
 
-    ref_dir = form.w_lbl03.text()
+    ref_dir = params.ref_dir
     print('\nWill check files in ' + ref_dir)
 
     # read fnames file and clean
@@ -125,8 +61,10 @@ def check_input_file_compliance(form):
     inp_fname = join(ref_dir, 'fnames.dat')
     if not isfile(inp_fname):
         print('File ' + inp_fname + ' does not exist - will check for limited data mode compliance')
-        check_limited_data_compliance(form)
+        check_limited_data_compliance(params, report)
         return
+    if report is not None:
+        report['mode'] = 'site specific'
     with open(inp_fname, 'r') as fobj:
         first_line = fobj.readline()
 
@@ -141,6 +79,7 @@ def check_input_file_compliance(form):
         file_list = frst_line.split()
         if len(file_list) < 3:
             print('Could not find 3 files from first line of file ' + inp_fname + ' line: ' + first_line)
+            record_failure(report, 'fail', 'fnames.dat', 1)
             return
 
     # check each file
@@ -153,53 +92,82 @@ def check_input_file_compliance(form):
             root_name, exten = splitext(short_fname)
             if root_name.lower() == 'management':
                 print('Checking ' + short_fname)
-                _check_management_file(inp_fname)
+                _check_management_file(inp_fname, report)
         else:
             print('File ' + inp_fname + ' does not exist')
+            record_failure(report, 'missing', short_fname)
 
     print('Finished checking files in ' + ref_dir)
 
     return
 
-def check_identical_files(form, file_types = 'input' ):
+def _is_checked(fname_short, file_types):
+    """
+    True if a file is of the type checked by check_identical_files
+    """
+    if fname_short in filter_files:
+        return False
+
+    root_name, extn = splitext(fname_short)
+    extn = extn.upper()
+    if (extn == '.OUT' or extn == '.XLSX') and file_types == 'input':
+        return False
 
-    # gather directories from the GUI
-    # ===============================
-    ref_dir = form.w_lbl03.text()
-    targ_dir = form.w_lbl04.text()
+    if (extn == '.TXT' or extn == '.DAT') and file_types == 'output':
+        return False
+
+    return True
+
+def check_identical_files(params, file_types = 'input' ):
+
+    # gather directories from the GUI, or the targets of a one-to-many comparison
+    # ==========================================================================
+    ref_dir = params.ref_dir
+    if len(params.targ_dirs) > 0:
+        targ_dirs = params.targ_dirs
+    else:
+        targ_dirs = list([params.targ1_dir])
     ref_flist = glob(ref_dir + wildCard)
     print()
 
-    # step through each file from the reference directory
-    # ===================================================
-    for ref_file in ref_flist:
-        root_name, extn = splitext(ref_file)
-        extn = extn.upper()
-        if (extn == '.OUT' or extn == '.XLSX') and file_types == 'input':
+    # files are compared by the content hashes held in the manifest of each directory, kept in the results directory
+    # only files of the type being checked are hashed, so an input check does not read the large output files
+    # ===============================================================================================================
+    diffs = compare_dirs(ref_dir, targ_dirs, lambda fname_short: _is_checked(fname_short, file_types),
+                                                                                                params.rslts_dir)
+    for targ_dir, diff in zip(targ_dirs, diffs):
+        if diff is None:
             continue
 
-        # check against equivalent in the target dir
-        # ==========================================
-        dummy, fname_short = split(ref_file)
-        if fname_short in filter_files:
-            continue
+        if len(targ_dirs) > 1:
+            print('Target ' + targ_dir)
 
-        if (extn == '.TXT' or extn == '.DAT') and file_types == 'output':
-            continue
+        status = {}
+        for key in ('identical', 'different', 'missing'):
+            for fname in diff[key]:
+                status[fname] = key
+
+        # step through each file from the reference directory
+        # ===================================================
+        for ref_file in ref_flist:
+
+            # check against equivalent in the target dir
+            # ==========================================
+            dummy, fname_short = split(ref_file)
+            if not _is_checked(fname_short, file_types) or fname_short not in status:
+                continue
 
-        targ_file = join(targ_dir, fname_short)
-        if isfile(targ_file):
-            if filecmp.cmp(ref_file, targ_file):
+            if status[fname_short] == 'identical':
                 print('Identical file: ' + fname_short)
-            else:
+            elif status[fname_short] == 'different':
                 print('*** Different file: ' + fname_short)
-        else:
-            print('Non-existent file: ' + targ_file)
+            else:
+                print('Non-existent file: ' + join(targ_dir, fname_short))
 
     return
 
 class Analysis(object,):
-    def __init__(self,form):
+    def __init__(self, params):
         self.numInts = 0
         self.numFlts = 0
         self.lrgstFltCoord = list([0,0])
@@ -214,19 +182,23 @@ class Analysis(object,):
     #        def write_sum_file
     #        def get_num_words
     #
-    def check_these_files(self, form):
+    def check_these_files(self, params):
 
         func_name =  __prog__ + ' check_ecosse_files'
 
-        ref_dir = form.w_lbl03.text()
-        rslts_dir = form.w_lbl13.text()
+        # spatial runs are scanned recursively
+        if params.scan_recursive:
+            return scan_tree(params)
+
+        ref_dir = params.ref_dir
+        rslts_dir = params.rslts_dir
 
         summary_fname = basename(ref_dir) + '.sum'
         sum_fname = join(rslts_dir,  summary_fname)
 
         outdir_sum = common_funcs.Common_funcs(rslts_dir)
 
-        wrkbk = outdir_sum.open_xls_outf(sum_fname)
+        wrkbk = outdir_sum.open_xls_outf(sum_fname, write_only = True)
         out_fname = outdir_sum.outfname
 
         # write to Excel file
@@ -234,14 +206,13 @@ class Analysis(object,):
             print('Error - could not open file {} in directory {}'.format(out_fname, rslts_dir))
             return
 
-        # grab the active worksheet
-        wrksht_short  = wrkbk.active
-        wrksht_short.title = "Summary"
+        # rows are streamed to the worksheet
+        wrksht_short = XlsxSheetWriter(wrkbk, "Summary")
 
         # Header line
         header_line = list(['File name', 'NumLines', 'NumWords', 'MaxRowLen', 'IntTotal', 'FltsCnvrtd', 'NaNs',
                                                                                         'Asterisks', 'Bad values'])
-        write_xlsx_row(1, 1, header_line, wrksht_short)
+        wrksht_short.write_row(1, header_line)
         row_short = 2
 
         # send abbreviated fields to screen
@@ -261,9 +232,15 @@ class Analysis(object,):
         nlines = zeros(2, dtype=int64)
         max_len_row = zeros(2, dtype=int64)
         num_exams = 0
+        nfiles = len(ref_flist)
 
-        for ref_file in ref_flist:
+        for ifile, ref_file in enumerate(ref_flist):
             fpath, fname_short = split(ref_file)
+            if params.cancel_requested():
+                print('Directory scan cancelled after {} of {} files'.format(ifile, nfiles))
+                break
+            params.report_progress(ifile, nfiles, fname_short)
+
             if fname_short in filter_files:
                 continue
             self.fname_short = fname_short
@@ -271,37 +248,33 @@ class Analysis(object,):
             # compare files and remove entries from target list
             num_exams += 1
             line_str = fname_short
-            nlines[0], max_len_row[0], nwords[0] = self.get_num_words(ref_file)
+            nlines[0], max_len_row[0], nwords[0] = self.get_num_words(ref_file, params.use_sidecars)
             if nlines[0] == -1:
                 continue
             result = line_str + '\t{}\t{}\t{}'.format(nlines[0], nwords[0], max_len_row[0])
-            write_xlsx_row(1, row_short, result.split('\t'), wrksht_short)
+            wrksht_short.write_row(row_short, result.split('\t'))
             row_short += 1
             print('\t' + result)
 
+        if not params.cancel_requested():
+            params.report_progress(nfiles, nfiles)
         print('Completed after {} file examined\nResults written to: {}\n'.format(num_exams, out_fname))
         wrkbk.save(out_fname)
 
         return 'dummy'
 
-    def get_num_words(self, fname):
+    def get_num_words(self, fname, use_sidecars = False):
 
-        max_len_row = 0
+        # shape is recorded in an up to date sidecar
+        if use_sidecars:
+            col_file = load_sidecar(fname)
+            if col_file is not None:
+                return col_file.shape()
 
         try:
-            feed = open(fname, 'r').read()
-            feed_lines = feed.splitlines()
+            tok_file = TokenisedFile(fname, keep_rows = False)
         except UnicodeDecodeError as err:
             print('File ' + fname + ' will be rejected due to UnicodeDecodeError')
             return list([-1, -1, -1])
 
-        num_lines = len(feed_lines)
-        num_words = 0
-
-        for line in feed_lines:
-            len_row = len(line.split())
-            num_words += len_row
-            if len_row > max_len_row:
-                max_len_row = len_row
-
-        return list([num_lines, max_len_row, num_words])
+        return tok_file.shape()
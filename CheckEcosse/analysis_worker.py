@@ -0,0 +1,74 @@
+#-------------------------------------------------------------------------------
+# Name:        analysis_worker.py
+# Purpose:     run long analyses in a worker thread so that the GUI remains responsive and can cancel them
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'analysis_worker.py'
+__version__ = '0.0.1'
+
+# Version history
+# ---------------
+# 0.0.1  Wrote.
+#
+from threading import Event
+
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+
+ERROR_STR = '*** Error *** '
+
+class AnalysisWorker(QObject):
+    """
+    runs func(params) when its thread starts - params is given progress and cancellation hooks
+    """
+    progress = pyqtSignal(int, int, str)
+    finished = pyqtSignal()
+
+    def __init__(self, func, params, title):
+        """
+        C
+        """
+        super(AnalysisWorker, self).__init__()
+        self.func = func
+        self.params = params
+        self.title = title
+        params.progress_func = self.progress.emit
+        params.cancel_event = Event()
+
+    def run(self):
+        """
+        C
+        """
+        try:
+            self.func(self.params)
+        except Exception as err:
+            print(ERROR_STR + '{} failed with {}: {}'.format(self.title, type(err).__name__, err))
+        finally:
+            self.finished.emit()
+
+    def cancel(self):
+        """
+        work stops at the next check, normally between files
+        """
+        self.params.cancel_event.set()
+
+def start_worker(form, func, params, title):
+    """
+    run the analysis in a new thread, connecting its signals to the form, and return the thread and worker
+    the form must provide showProgress(ndone, ntotal, label) and workerFinished() slots
+    """
+    thread = QThread()
+    worker = AnalysisWorker(func, params, title)
+    worker.moveToThread(thread)
+
+    thread.started.connect(worker.run)
+    worker.progress.connect(form.showProgress)
+    worker.finished.connect(thread.quit)
+    thread.finished.connect(form.workerFinished)
+
+    thread.start()
+
+    return thread, worker
@@ -0,0 +1,172 @@
+#-------------------------------------------------------------------------------
+# Name:        buffered_log.py
+# Purpose:     thread safe replacement for set_up_logging.OutLog which coalesces output for the report window
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'buffered_log.py'
+__version__ = '0.0.1'
+
+# Version history
+# ---------------
+# 0.0.1  Wrote.
+#
+# text may be written from any thread - it is appended to the report window by a timer in the GUI thread,
+# a few repeats of each category of warning are shown and all of them are counted and kept in the log file
+#
+from os.path import abspath, isdir, join
+from threading import Lock
+import logging
+from logging.handlers import RotatingFileHandler
+
+from PyQt5.QtCore import QObject, QTimer
+from PyQt5.QtGui import QTextCursor
+
+LOG_FNAME = 'check_ecosse.log'
+LOG_MAX_BYTES = 10*1024*1024
+LOG_BACKUP_COUNT = 3
+FLUSH_MS = 250          # interval between updates of the report window
+MAX_LINES = 5000        # lines kept in the report window, older lines are discarded
+MAX_REPEATS = 10        # lines of each category shown in the report window per analysis
+ERROR_STR = '*** Error *** '
+
+# categories of repeated messages are recognised by the start of the line
+# ========================================================================
+CATEGORIES = list([('conversion warnings', 'Warning in function:'),
+                   ('word count differences', 'Number of words'),
+                   ('bad values', 'Error could not convert'),
+                   ('errors', ERROR_STR)])
+
+class BufferedLog(QObject):
+    """
+    file-like object to which sys.stdout is set
+    """
+    def __init__(self, edit, out = None, max_lines = MAX_LINES, flush_ms = FLUSH_MS):
+        """
+        edit is the QTextEdit report window and out is an optional stream, typically the original stdout
+        """
+        super(BufferedLog, self).__init__()
+        self.edit = edit
+        self.out = out
+        self.edit.document().setMaximumBlockCount(max_lines)
+
+        self._lock = Lock()
+        self._partial = ''
+        self._screen_lines = []
+        self._file_lines = []
+        self.counts = {category: 0 for category, dummy in CATEGORIES}
+        self.handler = None
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.flush_to_widget)
+        self.timer.start(flush_ms)
+
+    def write(self, text):
+        """
+        may be called from any thread - complete lines are categorised and buffered
+        """
+        if self.out is not None:
+            self.out.write(text)
+
+        with self._lock:
+            lines = (self._partial + text).split('\n')
+            self._partial = lines.pop()
+            for line in lines:
+                self._file_lines.append(line)
+                category = _line_category(line)
+                if category is not None:
+                    self.counts[category] += 1
+                    if self.counts[category] > MAX_REPEATS:
+                        continue
+                self._screen_lines.append(line)
+
+    def flush(self):
+        """
+        the buffer is emptied by the timer
+        """
+        if self.out is not None:
+            self.out.flush()
+
+    def flush_to_widget(self, include_partial = False):
+        """
+        GUI thread only - append buffered lines to the report window and the log file
+        """
+        with self._lock:
+            if include_partial and self._partial != '':
+                self._screen_lines.append(self._partial)
+                self._file_lines.append(self._partial)
+                self._partial = ''
+            screen_lines, self._screen_lines = self._screen_lines, []
+            file_lines, self._file_lines = self._file_lines, []
+
+        if len(screen_lines) > 0:
+            cursor = self.edit.textCursor()
+            cursor.movePosition(QTextCursor.End)
+            cursor.insertText('\n'.join(screen_lines) + '\n')
+            self.edit.setTextCursor(cursor)
+            self.edit.ensureCursorVisible()
+
+        if self.handler is not None and len(file_lines) > 0:
+            self.handler.handle(logging.makeLogRecord({'msg': '\n'.join(file_lines) + '\n'}))
+
+    def set_log_dir(self, rslts_dir):
+        """
+        write the full log to a rotating file in the results directory
+        """
+        if not isdir(rslts_dir):
+            return
+
+        log_fname = abspath(join(rslts_dir, LOG_FNAME))
+        if self.handler is not None:
+            if self.handler.baseFilename == log_fname:
+                return
+            self.flush_to_widget()
+            self.handler.close()
+
+        self.handler = RotatingFileHandler(log_fname, maxBytes = LOG_MAX_BYTES, backupCount = LOG_BACKUP_COUNT)
+        self.handler.setFormatter(logging.Formatter('%(message)s'))
+        self.handler.terminator = ''
+
+    def reset_counts(self):
+        """
+        start of an analysis
+        """
+        with self._lock:
+            for category in self.counts:
+                self.counts[category] = 0
+
+    def report_counts(self):
+        """
+        end of an analysis - summarise those categories for which lines were not shown
+        """
+        for category, dummy in CATEGORIES:
+            nlines = self.counts[category]
+            if nlines > MAX_REPEATS:
+                mess = '{} {} in total, {} not shown'.format(nlines, category, nlines - MAX_REPEATS)
+                if self.handler is not None:
+                    mess += ' - see ' + self.handler.baseFilename
+                print(mess)
+
+        self.flush_to_widget(include_partial = True)
+
+    def close(self):
+        """
+        C
+        """
+        self.timer.stop()
+        self.flush_to_widget(include_partial = True)
+        if self.handler is not None:
+            self.handler.close()
+
+def _line_category(line):
+    """
+    C
+    """
+    for category, line_start in CATEGORIES:
+        if line.startswith(line_start):
+            return category
+
+    return None
@@ -0,0 +1,144 @@
+#-------------------------------------------------------------------------------
+# Name:        chart_image_funcs.py
+# Purpose:     render charts of .OUT file series to PNG or SVG images in parallel and index them in a static page
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'chart_image_funcs.py'
+__version__ = '0.0.2'
+
+# Version history
+# ---------------
+# 0.0.1  Wrote.
+# 0.0.2  matplotlib imported and its renderer selected when an image is first requested, not on import.
+#
+# an alternative to the openpyxl charts of generate_charts_funcs which needs neither Excel nor a display
+# matplotlib is optional - it is only required when images are requested
+#
+from concurrent.futures import ProcessPoolExecutor
+from html import escape
+from os import makedirs
+from os.path import basename, isdir, relpath, split
+
+IMAGE_FORMATS = list(['png', 'svg'])
+DEFAULT_COLOUR = '4472C4'   # colour of the first series of an Excel chart of style 13
+EMUS_PER_POINT = 12700
+FIG_SIZE = tuple([10.0, 5.0])   # inches, the proportions of the Excel charts
+DPI = 100
+LINE_STYLES = {'solid': '-', 'dash': '--', 'sysDot': ':', 'lgDash': tuple([0, tuple([8, 3])]), 'dashDot': '-.',
+               'sysDash': tuple([0, tuple([3, 1])])}
+ERROR_STR = '*** Error *** '
+
+def _pyplot():
+    """
+    pyplot using the non-interactive renderer, or None if matplotlib is not installed - the renderer is selected
+    here rather than on import so that importing this module does not change that of an application such as the GUI
+    """
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        from matplotlib import pyplot
+    except ImportError:
+        return None
+
+    return pyplot
+
+def image_backend_available():
+    """
+    C
+    """
+    if _pyplot() is None:
+        print(ERROR_STR + 'matplotlib is required to render charts as images - install it or use the xlsx backend')
+        return False
+
+    return True
+
+def render_chart(spec):
+    """
+    draw one chart and save it to spec['fname'], the format following the extension
+    spec holds fname, title, x_label, y_label, steps and series, a list of title, colour, dash style, line width
+    in EMUs and values - returns the file name or None if the image could not be written
+    """
+    pyplot = _pyplot()
+    fig, axes = pyplot.subplots(figsize = FIG_SIZE)
+    try:
+        for title, colour, dash_style, line_wdth, vals in spec['series']:
+            axes.plot(spec['steps'], vals, label = title, color = '#' + (colour or DEFAULT_COLOUR),
+                      linestyle = LINE_STYLES.get(dash_style, '-'), linewidth = line_wdth/EMUS_PER_POINT)
+
+        axes.set_title(spec['title'].replace('\t', '  '))
+        axes.set_xlabel(spec['x_label'])
+        axes.set_ylabel(spec['y_label'])
+        axes.grid(True, linewidth = 0.3)
+        axes.legend(loc = 'center left', bbox_to_anchor = (1.0, 0.5), frameon = False)
+        fig.tight_layout()
+        fig.savefig(spec['fname'], dpi = DPI)
+    except (OSError, ValueError) as err:
+        print(ERROR_STR + 'could not render {}: {}'.format(spec['fname'], err))
+        return None
+    finally:
+        pyplot.close(fig)
+
+    return spec['fname']
+
+def render_charts(specs, max_workers = 1):
+    """
+    render each chart, in a pool of worker processes if max_workers exceeds one
+    returns the names of the images written, None for each which failed, in the order of specs
+    """
+    if max_workers > 1 and len(specs) > 1:
+        with ProcessPoolExecutor(max_workers = min(max_workers, len(specs))) as executor:
+            fnames = list(executor.map(render_chart, specs))
+    else:
+        fnames = [render_chart(spec) for spec in specs]
+
+    return fnames
+
+def write_html_index(html_fname, title, sections):
+    """
+    static page of images - sections is a list of section headings each with a list of image file names
+    """
+    html_dir, dummy = split(html_fname)
+    lines = list(['<!DOCTYPE html>', '<html>', '<head>', '<meta charset="utf-8">',
+                  '<title>' + escape(title) + '</title>',
+                  '<style>body {font-family: sans-serif} img {max-width: 100%; display: block}</style>',
+                  '</head>', '<body>', '<h1>' + escape(title) + '</h1>'])
+    for heading, fnames in sections:
+        lines.append('<h2>' + escape(heading) + '</h2>')
+        for fname in fnames:
+            if fname is not None:
+                src = relpath(fname, html_dir).replace('\\', '/')
+                lines.append('<img src="{}" alt="{}">'.format(escape(src), escape(basename(fname))))
+
+    lines += ['</body>', '</html>']
+    try:
+        with open(html_fname, 'w', encoding = 'utf-8') as fobj:
+            fobj.write('\n'.join(lines) + '\n')
+    except OSError as err:
+        print(ERROR_STR + 'could not write {}: {}'.format(html_fname, err))
+        return None
+
+    return html_fname
+
+def write_cells_index(html_fname, cell_pages):
+    """
+    page linking the chart pages of many cells - cell_pages is a list of cell names each with the page of the cell
+    """
+    html_dir, dummy = split(html_fname)
+    if html_dir != '' and not isdir(html_dir):
+        makedirs(html_dir)
+
+    lines = list(['<!DOCTYPE html>', '<html>', '<head>', '<meta charset="utf-8">', '<title>Charts</title>',
+                  '</head>', '<body>', '<h1>Charts of {} cells</h1>'.format(len(cell_pages)), '<ul>'])
+    for cell_name, page_fname in cell_pages:
+        href = relpath(page_fname, html_dir).replace('\\', '/')
+        lines.append('<li><a href="{}">{}</a></li>'.format(escape(href), escape(cell_name)))
+
+    lines += ['</ul>', '</body>', '</html>']
+    with open(html_fname, 'w', encoding = 'utf-8') as fobj:
+        fobj.write('\n'.join(lines) + '\n')
+
+    return html_fname
@@ -0,0 +1,129 @@
+#-------------------------------------------------------------------------------
+# Name:        chart_reduce_funcs.py
+# Purpose:     reduce long series before they are charted, by temporal aggregation or by downsampling
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'chart_reduce_funcs.py'
+__version__ = '0.0.2'
+
+# Version history
+# ---------------
+# 0.0.1  Wrote.
+# 0.0.2  A final month or year with fewer time steps than a whole period is not aggregated.
+#
+# series are the columns of a (time step x series) array; time steps are assumed to run from the start of a year
+# of steps_per_year steps, normally 365 days, with months of the calendar of a year without leap days
+#
+from numpy import add, arange, argmax, array, concatenate, cumsum, diff, int64, isnan, linspace, unique, where
+
+REDUCE_MODES = list(['none', 'monthly_mean', 'monthly_sum', 'annual_mean', 'annual_sum', 'lttb'])
+DAYS_IN_MONTHS = list([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+STEPS_PER_YEAR = 365
+MAX_POINTS = 2000       # number of points to which each chart is downsampled
+
+def period_starts(nsteps, period, steps_per_year = STEPS_PER_YEAR):
+    """
+    zero based index of the first time step of each month or year
+    """
+    if period == 'annual':
+        return arange(0, nsteps, steps_per_year, dtype=int64)
+
+    # month boundaries within the year are in proportion to the days of each month
+    # ============================================================================
+    days = concatenate(([0], cumsum(DAYS_IN_MONTHS)[:-1]))
+    month_starts = unique((days*steps_per_year + 182)//365)
+    starts = (arange(0, nsteps, steps_per_year, dtype=int64)[:, None] + month_starts[None, :]).ravel()
+
+    return starts[starts < nsteps]
+
+def complete_periods(nsteps, period, steps_per_year = STEPS_PER_YEAR):
+    """
+    starts of the months or years which are wholly within nsteps time steps and the time step at which the last
+    of them ends - a period cut short by the end of the run would be understated by a sum
+    """
+    starts = period_starts(nsteps + steps_per_year, period, steps_per_year)
+    nwhole = int((starts[1:] <= nsteps).sum())
+
+    return starts[:nwhole], int(starts[nwhole])
+
+def aggregate(matrix, starts, how = 'mean'):
+    """
+    sum or mean of the rows of each period beginning at starts
+    """
+    sums = add.reduceat(matrix, starts, axis=0)
+    if how == 'sum':
+        return sums
+
+    counts = diff(concatenate((starts, [len(matrix)])))
+
+    return sums/counts[:, None]
+
+def lttb_indices(vals, nout):
+    """
+    indices of the points kept when a series is downsampled to nout points with the largest triangle
+    three buckets algorithm, which keeps the first and last points and preserves peaks and troughs
+    """
+    nvals = len(vals)
+    if nout >= nvals or nout < 3:
+        return arange(nvals, dtype=int64)
+
+    steps = arange(nvals, dtype=float)
+    edges = linspace(1, nvals - 1, nout - 1).astype(int64)
+    indices = [0]
+    iprev = 0
+    for ibucket in range(nout - 2):
+        start, end = edges[ibucket], edges[ibucket + 1]
+
+        # the third point of each triangle is the average of the next bucket
+        # ===================================================================
+        if ibucket + 2 < len(edges):
+            next_start, next_end = edges[ibucket + 1], edges[ibucket + 2]
+        else:
+            next_start, next_end = nvals - 1, nvals
+        avg_step = steps[next_start:next_end].mean()
+        avg_val = vals[next_start:next_end].mean()
+
+        areas = abs((steps[iprev] - avg_step)*(vals[start:end] - vals[iprev]) -
+                    (steps[iprev] - steps[start:end])*(avg_val - vals[iprev]))
+        areas = where(isnan(areas), -1.0, areas)
+        iprev = start + int(argmax(areas))
+        indices.append(iprev)
+
+    indices.append(nvals - 1)
+
+    return array(indices, dtype=int64)
+
+def downsample(matrix, max_points = MAX_POINTS):
+    """
+    time steps kept when all series are downsampled together - each series contributes an equal share of the points
+    """
+    nseries = matrix.shape[1]
+    nout = max(3, max_points//max(1, nseries))
+    kept = concatenate([lttb_indices(matrix[:, iseries], nout) for iseries in range(nseries)])
+
+    return unique(kept)
+
+def reduce_series(matrix, mode, steps_per_year = STEPS_PER_YEAR, max_points = MAX_POINTS):
+    """
+    reduce a (time step x series) array according to mode, one of REDUCE_MODES
+    returns the one based time step of the start of each row and the reduced array
+    time steps after the last whole month or year are dropped when aggregating
+    """
+    nsteps = len(matrix)
+    if nsteps == 0 or mode == 'none':
+        return arange(1, nsteps + 1), matrix
+
+    if mode == 'lttb':
+        kept = downsample(matrix, max_points)
+        return kept + 1, matrix[kept]
+
+    period, how = mode.split('_')
+    starts, end_step = complete_periods(nsteps, period, steps_per_year)
+    if len(starts) == 0:
+        return starts + 1, matrix[:0]
+
+    return starts + 1, aggregate(matrix[:end_step], starts, how)
@@ -0,0 +1,338 @@
+#-------------------------------------------------------------------------------
+# Name:        check_ecosse.py
+# Purpose:     command line entry point to run checks over many simulation cell directories without the GUI
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'check_ecosse.py'
+__version__ = '0.0.2'
+
+# Version history
+# ---------------
+# 0.0.1  Wrote.
+# 0.0.2  Added convert operation which writes columnar sidecars of .OUT files
+#        Added launch operation which runs ECOSSE in each cell, optionally comparing outputs as each run finishes
+#        Metrics charted may be restricted to groups read from a JSON file
+#        Charted series may be aggregated or downsampled
+#        Charts may be rendered as images with a page linking those of each cell
+#        Added compare-many operation which compares one reference with many targets
+#        Added diff-inputs and diff-outputs operations which compare directory manifests
+#        Scan and compliance check may be recursive
+#        Large files compared in ranges of rows by the worker processes
+#        Quick look comparison of a window of years or time steps, or of every k-th time step
+#        Sidecars used only with --sidecars, so that run directories are not written to by default
+#
+# typical usage:
+#   python check_ecosse.py compare --ref-root E:\ref_run --targ-root E:\new_run --cells "lat*\*" --rslts-dir E:\rslts
+#   python check_ecosse.py launch --ref-root E:\ref_run --targ-root E:\new_run --cells "lat*\*" --rslts-dir E:\rslts
+#                                                           --exe E:\ecosse\ecosse.exe --workers 8 --compare-runs
+#   python check_ecosse.py compare-many --ref-root E:\golden --targ-roots E:\build1 E:\build2 --rslts-dir E:\rslts
+#
+from argparse import ArgumentParser, ArgumentTypeError
+from concurrent.futures import ProcessPoolExecutor
+import csv
+from contextlib import redirect_stdout
+from glob import glob
+from io import StringIO
+import json
+from os import cpu_count, makedirs
+from os.path import basename, isdir, join, normpath, relpath
+import sys
+
+from analyse_ecosse_output import Analysis as AnalysisOutput, SPLIT_MB, WINDOW_UNITS
+from analyse_site_spec_dir import Analysis as AnalysisDir, check_identical_files
+from compliance_batch_funcs import check_compliance
+from check_params import CheckParams
+from common_funcs import ECOSSE_EXE, run_simulations
+from out_sidecar_funcs import convert_out_files
+from result_cache import clear_cache
+from generate_charts_funcs import generate_charts, CHART_BACKENDS
+from chart_image_funcs import write_cells_index
+from chart_reduce_funcs import REDUCE_MODES, MAX_POINTS, STEPS_PER_YEAR
+from tree_scan_funcs import SCAN_FORMATS, SCAN_MAX_MB
+
+ERROR_STR = '*** Error *** '
+OPERATIONS = list(['compare', 'compare-many', 'scan', 'comply', 'diff-inputs', 'diff-outputs', 'chart', 'convert',
+                   'launch'])
+CHUNK_SIZE = 16     # cells sent to each worker process at a time
+LAUNCH_FNAME = 'launch_summary.csv'
+CELLS_INDEX_FNAME = 'charts_index.html'
+RUN_FIELDS = list(['sim_dir', 'status', 'retcode', 'wall_time', 'pid'])
+
+def _compare(params):
+    analysis = AnalysisOutput(params)
+    analysis.check_ecosse_files(params)
+
+def _compare_many(params):
+    analysis = AnalysisOutput(params)
+    analysis.check_ecosse_targets(params)
+
+def _scan(params):
+    analysis = AnalysisDir(params)
+    analysis.check_these_files(params)
+
+def _diff_outputs(params):
+    check_identical_files(params, file_types = 'output')
+
+def _convert(params):
+    dir_names = [dir_name for dir_name in (params.ref_dir, params.targ1_dir, params.targ2_dir) if dir_name != '']
+    convert_out_files(dir_names)
+
+OPERATION_FUNCS = {'compare': _compare, 'compare-many': _compare_many, 'scan': _scan, 'comply': check_compliance,
+                   'diff-inputs': check_identical_files, 'diff-outputs': _diff_outputs,
+                   'chart': generate_charts, 'convert': _convert}
+
+def find_cells(ref_root, cells_glob = None):
+    """
+    cell directories beneath the reference root, or the root itself if no pattern is given
+    """
+    if cells_glob is None:
+        return list([normpath(ref_root)])
+
+    cell_dirs = [normpath(cell_dir) for cell_dir in glob(join(ref_root, cells_glob)) if isdir(cell_dir)]
+
+    return sorted(cell_dirs)
+
+def cell_params(args, cell_dir, max_workers = 1):
+    """
+    parameters for one cell - target and results directories mirror the layout beneath the reference root
+    """
+    rel_path = relpath(cell_dir, args.ref_root)
+    rslts_dir = normpath(join(args.rslts_dir, rel_path))
+    if not isdir(rslts_dir):
+        makedirs(rslts_dir)
+
+    params = CheckParams(ref_dir = cell_dir, rslts_dir = rslts_dir, ref_id = args.ref_id,
+                         targ1_id = args.targ1_id, targ2_id = args.targ2_id,
+                         summary_only = args.summary_only, water_dep = args.water_dep, max_workers = max_workers,
+                         cache_max_mb = args.cache_max_mb, use_sidecars = args.sidecars,
+                         metrics_groups = args.metrics_groups, chart_reduce = args.chart_reduce,
+                         chart_points = args.chart_points, steps_per_year = args.steps_per_year,
+                         chart_data_sheet = args.chart_data_sheet, chart_backend = args.chart_backend,
+                         scan_recursive = args.recursive, scan_format = args.scan_format,
+                         scan_max_mb = args.scan_max_mb, split_mb = args.split_mb, time_window = args.time_window,
+                         window_units = args.window_units, sample_every = args.sample_every)
+    if args.clear_cache:
+        clear_cache(rslts_dir)
+
+    if args.targ_root is not None:
+        params.targ1_dir = normpath(join(args.targ_root, rel_path))
+
+    if args.targ2_root is not None:
+        params.targ2_dir = normpath(join(args.targ2_root, rel_path))
+        params.use_targ2 = True
+
+    if args.targ_roots is not None:
+        params.targ_dirs = [normpath(join(targ_root, rel_path)) for targ_root in args.targ_roots]
+        if args.targ_ids is None:
+            params.targ_ids = [basename(normpath(targ_root)) for targ_root in args.targ_roots]
+        else:
+            params.targ_ids = list(args.targ_ids)
+
+    return params
+
+def _read_metrics_groups(fname):
+    """
+    groups of metrics to chart, as for the metrics_groups setting of the setup file
+    """
+    try:
+        with open(fname, 'r') as fobj:
+            metrics_groups = json.load(fobj)
+    except (OSError, ValueError) as err:
+        raise ArgumentTypeError('could not read metrics groups from {}: {}'.format(fname, err))
+
+    return metrics_groups
+
+def run_cell(operation, params):
+    """
+    run in a worker process - output which would have been printed is returned to the parent process
+    """
+    log = StringIO()
+    with redirect_stdout(log):
+        try:
+            OPERATION_FUNCS[operation](params)
+        except Exception as err:
+            print(ERROR_STR + '{} failed for {} with {}: {}'.format(operation, params.ref_dir,
+                                                                    type(err).__name__, err))
+    return log.getvalue()
+
+def launch_cells(args, cell_dirs, max_workers):
+    """
+    run ECOSSE in the target directory of each cell, or in the reference directory if there is no target root,
+    with at most max_workers simulations at a time
+    """
+    params_list = [cell_params(args, cell_dir) for cell_dir in cell_dirs]
+    if args.targ_root is None:
+        sim_dirs = [params.ref_dir for params in params_list]
+    else:
+        sim_dirs = [params.targ1_dir for params in params_list]
+    params_by_dir = dict(zip(sim_dirs, params_list))
+
+    # outputs of each completed run are compared with the reference while the other runs continue
+    # ==========================================================================================
+    def compare_run(run):
+        if run['status'] == 'completed':
+            print(run_cell('compare', params_by_dir[run['sim_dir']]), end = '')
+
+    on_complete = compare_run if args.compare_runs else None
+
+    print('Will run {} simulations using up to {} processes'.format(len(sim_dirs), max_workers))
+    runs = run_simulations(sim_dirs, args.exe, max_workers, args.timeout, on_complete)
+
+    summary_fname = join(args.rslts_dir, LAUNCH_FNAME)
+    with open(summary_fname, 'w', newline = '') as fobj:
+        writer = csv.DictWriter(fobj, fieldnames = RUN_FIELDS, extrasaction = 'ignore')
+        writer.writeheader()
+        writer.writerows(runs)
+
+    nfailed = len([run for run in runs if run['status'] != 'completed'])
+    print('Finished {} runs of which {} did not complete - summary written to {}'
+                                                                    .format(len(runs), nfailed, summary_fname))
+    return 0 if nfailed == 0 else 1
+
+def _write_cells_index(args, cell_dirs, params_list):
+    """
+    page in the results directory linking the chart page of each cell
+    """
+    cell_pages = []
+    for cell_dir, params in zip(cell_dirs, params_list):
+        for page_fname in sorted(glob(join(params.rslts_dir, '*.html'))):
+            cell_pages.append(tuple([relpath(cell_dir, args.ref_root), page_fname]))
+
+    index_fname = write_cells_index(join(args.rslts_dir, CELLS_INDEX_FNAME), cell_pages)
+    print('Created: ' + index_fname)
+
+def run_cells(args):
+    """
+    apply the requested operation to each cell, in parallel when there is more than one cell
+    """
+    cell_dirs = find_cells(args.ref_root, args.cells)
+    ncells = len(cell_dirs)
+    if ncells == 0:
+        print(ERROR_STR + 'no cell directories match ' + join(args.ref_root, str(args.cells)))
+        return 1
+
+    max_workers = args.workers
+    if max_workers is None:
+        max_workers = cpu_count()
+
+    if args.operation == 'launch':
+        return launch_cells(args, cell_dirs, max_workers)
+
+    if ncells == 1:
+        # the only cell may use the workers itself
+        # ========================================
+        params = cell_params(args, cell_dirs[0], max_workers = max_workers)
+        OPERATION_FUNCS[args.operation](params)
+        return 0
+
+    print('Will {} {} cells using {} worker processes'.format(args.operation, ncells, max_workers))
+    params_list = [cell_params(args, cell_dir) for cell_dir in cell_dirs]
+    operations = [args.operation]*ncells
+
+    with ProcessPoolExecutor(max_workers = max_workers) as executor:
+        for icell, log in enumerate(executor.map(run_cell, operations, params_list, chunksize = CHUNK_SIZE)):
+            print('Cell {} of {}: {}'.format(icell + 1, ncells, cell_dirs[icell]))
+            print(log, end = '')
+
+    if args.operation == 'chart' and args.chart_backend != 'xlsx':
+        _write_cells_index(args, cell_dirs, params_list)
+
+    print('Finished {} of {} cells'.format(args.operation, ncells))
+
+    return 0
+
+def main():
+
+    parser = ArgumentParser(prog = 'check_ecosse', description = 'Check Ecosse inputs and compare Ecosse outputs '
+                                                 'for one or many simulation directories without the GUI')
+    parser.add_argument('operation', choices = OPERATIONS,
+                        help = 'compare: differences between reference and target .OUT files, '
+                               'compare-many: summary of differences between reference and many targets, '
+                               'scan: summarise files, comply: check input files, '
+                               'diff-inputs, diff-outputs: list input or .OUT files which differ from the reference, '
+                               'chart: chart .OUT files, '
+                               'convert: write columnar sidecars of .OUT files for use by later operations, '
+                               'launch: run ECOSSE in each target cell directory')
+    parser.add_argument('--ref-root', required = True, help = 'directory with verified Ecosse output')
+    parser.add_argument('--targ-root', help = 'directory with Ecosse output to be compared with the reference')
+    parser.add_argument('--targ2-root', help = 'second target directory, used for charts only')
+    parser.add_argument('--targ-roots', nargs = '+', help = 'target directories for compare-many, diff-inputs and '
+                                                             'diff-outputs')
+    parser.add_argument('--targ-ids', nargs = '+',
+                        help = 'identifiers of the targets of compare-many, default the directory names')
+    parser.add_argument('--cells', help = 'glob pattern, relative to the reference root, of the cell directories')
+    parser.add_argument('--rslts-dir', required = True, help = 'directory to which results will be written')
+    parser.add_argument('--workers', type = int, help = 'number of worker processes, defaults to number of CPUs')
+    parser.add_argument('--cache-max-mb', type = float, default = 0,
+                        help = 'size limit of the cache of comparisons kept in the results directory, 0 disables it')
+    parser.add_argument('--clear-cache', action = 'store_true', help = 'remove any cached comparisons first')
+    parser.add_argument('--sidecars', action = 'store_true',
+                        help = 'use, and write when out of date, columnar sidecars of .OUT files beside each file')
+    parser.add_argument('--exe', default = ECOSSE_EXE, help = 'ECOSSE executable used by launch')
+    parser.add_argument('--timeout', type = float, help = 'wall time limit in seconds for each ECOSSE run')
+    parser.add_argument('--compare-runs', action = 'store_true',
+                        help = 'compare the outputs of each launched run with the reference as it finishes')
+    parser.add_argument('--recursive', action = 'store_true',
+                        help = 'scan every file beneath each directory, giving totals for each sub-directory, '
+                               'or check the input files of every cell beneath each directory')
+    parser.add_argument('--scan-format', choices = SCAN_FORMATS, default = 'xlsx',
+                        help = 'output of the recursive scan or compliance check, csv for very large trees')
+    parser.add_argument('--scan-max-mb', type = float, default = SCAN_MAX_MB,
+                        help = 'files larger than this are sampled by the recursive scan')
+    parser.add_argument('--split-mb', type = float, default = SPLIT_MB,
+                        help = 'pairs of larger files are compared in ranges of rows by the worker processes, 0 disables')
+    parser.add_argument('--time-window', type = int, nargs = 2, metavar = ('FIRST', 'LAST'),
+                        help = 'compare only these years, or time steps, counted from 1')
+    parser.add_argument('--window-units', choices = WINDOW_UNITS, default = 'years',
+                        help = 'units of --time-window, years of --steps-per-year time steps or time steps')
+    parser.add_argument('--sample-every', type = int, default = 1,
+                        help = 'compare every k-th time step only, reporting observed and estimated largest differences')
+    parser.add_argument('--summary-only', action = 'store_true', help = 'compare SUMMARY.OUT only')
+    parser.add_argument('--metrics-groups', type = _read_metrics_groups,
+                        help = 'JSON file of group names each with a list of metrics to chart, replaces the defaults')
+    parser.add_argument('--chart-backend', choices = CHART_BACKENDS, default = 'xlsx',
+                        help = 'xlsx for a workbook of Excel charts, png or svg for images and an HTML page, '
+                               'which require matplotlib')
+    parser.add_argument('--chart-reduce', choices = REDUCE_MODES, default = 'none',
+                        help = 'aggregate each charted series to monthly or annual means or sums, or downsample it')
+    parser.add_argument('--chart-points', type = int, default = MAX_POINTS,
+                        help = 'number of points to which each chart is downsampled by lttb')
+    parser.add_argument('--steps-per-year', type = int, default = STEPS_PER_YEAR,
+                        help = 'time steps in each year of the .OUT files, used for aggregation')
+    parser.add_argument('--chart-data-sheet', action = 'store_true',
+                        help = 'also write the values of all charted series at full resolution to a single sheet')
+    parser.add_argument('--water-dep', default = '50.0', help = 'depth, or comma separated depths, for soil water chart [cm]')
+    parser.add_argument('--ref-id', default = 'ref', help = 'identifier used for reference outputs on charts')
+    parser.add_argument('--targ1-id', default = 'targ1', help = 'identifier used for target 1 outputs on charts')
+    parser.add_argument('--targ2-id', default = 'targ2', help = 'identifier used for target 2 outputs on charts')
+    args = parser.parse_args()
+
+    if args.operation in ('compare', 'chart') and args.targ_root is None:
+        parser.error('--targ-root is required for ' + args.operation)
+
+    if args.operation == 'compare-many' and args.targ_roots is None:
+        parser.error('--targ-roots is required for compare-many')
+
+    if args.operation in ('diff-inputs', 'diff-outputs') and args.targ_root is None and args.targ_roots is None:
+        parser.error('--targ-root or --targ-roots is required for ' + args.operation)
+
+    if args.targ_ids is not None and (args.targ_roots is None or len(args.targ_ids) != len(args.targ_roots)):
+        parser.error('--targ-ids must give one identifier for each of --targ-roots')
+
+    if args.compare_runs and args.targ_root is None:
+        parser.error('--targ-root is required for --compare-runs')
+
+    if args.time_window is not None and (args.time_window[0] < 1 or args.time_window[1] < args.time_window[0]):
+        parser.error('--time-window FIRST must be at least 1 and LAST no less than FIRST')
+
+    if args.sample_every < 1:
+        parser.error('--sample-every must be at least 1')
+
+    return run_cells(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
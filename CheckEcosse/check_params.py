@@ -0,0 +1,116 @@
+#-------------------------------------------------------------------------------
+# Name:        check_params.py
+# Purpose:     plain parameter object used by the analysis functions in place of the GUI form
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'check_params.py'
+__version__ = '0.0.3'
+
+# Version history
+# ---------------
+# 0.0.1  Wrote.
+# 0.0.2  Progress and cancellation hooks for analyses run in a worker thread
+# 0.0.3  Added metrics_groups and settings to reduce the series which are charted
+#        Added chart_backend
+#        Added targ_dirs and targ_ids for one-to-many comparisons
+#        Added settings of the recursive directory scan
+#        Added split_mb, the size above which a pair of files is compared in ranges of rows
+#        Added time_window, window_units and sample_every for quick look comparisons
+#        Sidecars are used only when requested
+#
+
+class CheckParams(object,):
+    """
+    attribute names follow those of the Directories group of the configuration file
+    """
+    def __init__(self, ref_dir = '', targ1_dir = '', targ2_dir = '', rslts_dir = '', ref_id = 'ref',
+                 targ1_id = 'targ1', targ2_id = 'targ2', use_targ2 = False, summary_only = False,
+                 water_dep = '50.0', max_workers = 1, cache_max_mb = 0, use_sidecars = False,
+                 metrics_groups = None, chart_reduce = 'none', chart_points = 2000, steps_per_year = 365,
+                 chart_data_sheet = False, chart_backend = 'xlsx', targ_dirs = None, targ_ids = None,
+                 scan_recursive = False, scan_format = 'xlsx', scan_max_mb = 256,
+                 split_mb = 64, time_window = None, window_units = 'years', sample_every = 1):
+        """
+        C
+        """
+        self.ref_dir = ref_dir
+        self.targ1_dir = targ1_dir
+        self.targ2_dir = targ2_dir
+        self.rslts_dir = rslts_dir
+        self.ref_id = ref_id
+        self.targ1_id = targ1_id
+        self.targ2_id = targ2_id
+        self.use_targ2 = use_targ2
+        self.summary_only = summary_only
+        self.water_dep = water_dep
+        self.max_workers = max_workers
+        self.cache_max_mb = cache_max_mb    # size limit of the comparison cache, zero disables the cache
+        self.use_sidecars = use_sidecars    # use and maintain columnar sidecars of .OUT files
+        self.metrics_groups = metrics_groups    # groups of metrics to chart, None for the default groups
+        self.chart_reduce = chart_reduce        # one of chart_reduce_funcs.REDUCE_MODES
+        self.chart_points = chart_points        # number of points to which charts are downsampled
+        self.steps_per_year = steps_per_year    # time steps in each year of the .OUT files
+        self.chart_data_sheet = chart_data_sheet    # also write all values charted to a single sheet
+        self.chart_backend = chart_backend      # xlsx for Excel charts, png or svg for images and an HTML page
+        self.targ_dirs = targ_dirs if targ_dirs is not None else []     # targets of a one-to-many comparison
+        self.targ_ids = targ_ids if targ_ids is not None else []        # identifier of each of targ_dirs
+        self.scan_recursive = scan_recursive    # scan all files beneath the reference directory
+        self.scan_format = scan_format          # xlsx or csv
+        self.scan_max_mb = scan_max_mb          # files larger than this are sampled by the recursive scan
+        self.split_mb = split_mb    # larger files are compared in ranges of rows by the worker processes, zero disables
+        self.time_window = time_window      # first and last year or time step compared, None for every row
+        self.window_units = window_units    # years or steps
+        self.sample_every = sample_every    # interval between the time steps compared, 1 for every time step
+
+        # set by the GUI when the analysis is run in a worker thread
+        self.progress_func = None           # called with number of items done, number of items and item name
+        self.cancel_event = None            # threading.Event set when the user cancels
+
+    def report_progress(self, ndone, ntotal, label = ''):
+        """
+        C
+        """
+        if self.progress_func is not None:
+            self.progress_func(ndone, ntotal, label)
+
+    def cancel_requested(self):
+        """
+        analyses check this between files
+        """
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+def params_from_form(form):
+    """
+    gather the current selections from the GUI
+    """
+    params = CheckParams(ref_dir = form.w_lbl03.text(),
+                         targ1_dir = form.w_lbl04.text(),
+                         targ2_dir = form.w_lbl06.text(),
+                         rslts_dir = form.w_lbl13.text(),
+                         ref_id = form.w_ref_id.text(),
+                         targ1_id = form.w_targ1_id.text(),
+                         targ2_id = form.w_targ2_id.text(),
+                         use_targ2 = form.w_targ2_also.isChecked(),
+                         summary_only = form.w_smmry_only.isChecked(),
+                         water_dep = form.w_water_dep.text(),
+                         max_workers = form.settings['max_workers'],
+                         cache_max_mb = form.settings['cache_max_mb'],
+                         use_sidecars = form.settings['use_sidecars'],
+                         metrics_groups = form.settings['metrics_groups'],
+                         chart_reduce = form.settings['chart_reduce'],
+                         chart_points = form.settings['chart_points'],
+                         steps_per_year = form.settings['steps_per_year'],
+                         chart_data_sheet = form.settings['chart_data_sheet'],
+                         chart_backend = form.settings['chart_backend'],
+                         scan_recursive = form.settings['scan_recursive'],
+                         scan_format = form.settings['scan_format'],
+                         scan_max_mb = form.settings['scan_max_mb'],
+                         split_mb = form.settings['split_mb'],
+                         time_window = form.settings['time_window'],
+                         window_units = form.settings['window_units'],
+                         sample_every = form.settings['sample_every'])
+    return params
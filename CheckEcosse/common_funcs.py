@@ -14,34 +14,40 @@ __version__ = '0.0.0'
 # ---------------
 # 
 from os.path import join, splitext, isdir, exists
-from os import chdir, getcwd, remove
+from os import remove
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from time import monotonic
 from openpyxl import Workbook
 import subprocess
-
-val702 = 26*27
-val26  = 26
-
-def run_site_specific(form):
-
-    # runs site specific mode only for 30 years with vigour
-    # =====================================================
-    func_name = 'run_site_specifc'
-
-    retcode = 1
-    exe_path = 'C:\\Freeware\\UnxUtils\\usr\\local\\wbin\\EcosseAgile.exe'
-    exe_path = 'C:\\Freeware\\UnxUtils\\usr\\local\\wbin\\ecosse_mohamed_old.exe'
-
-    sim_dir = form.w_lbl03.text()
-    if not isdir(sim_dir):
-        print('Path ' + sim_dir + ' does not exist')
+import sys
+import threading
+
+MAX_XLSX_COLS = 16384   # maximum number of columns in an Excel worksheet
+ECOSSE_EXE = 'C:\\Freeware\\UnxUtils\\usr\\local\\wbin\\ecosse_mohamed_old.exe'
+NUM_VIGOURS = 30        # site specific mode is run for 30 years with vigour
+POLL_SECS = 1.0         # interval at which running simulations are checked for cancellation
+
+def process_events():
+    """
+    keep the GUI responsive during long operations - PyQt5 is never imported when run from the command line
+    events are only processed from the GUI thread, operations run in a worker thread do not need this
+    """
+    if threading.current_thread() is not threading.main_thread():
         return
 
-    # Set the working directory for the ECOSSE exe
-    old_dir = getcwd()
-    chdir(sim_dir)
-    cmd = '1\n\n\n'
+    qt_widgets = sys.modules.get('PyQt5.QtWidgets')
+    if qt_widgets is not None and qt_widgets.QApplication.instance() is not None:
+        qt_widgets.QApplication.processEvents()
 
-    nvigs = 30
+    return
+
+def launch_ecosse(sim_dir, exe_path = ECOSSE_EXE, nvigs = NUM_VIGOURS):
+    """
+    start ECOSSE in site specific mode in the simulation directory without changing the working directory
+    of this process - returns the process or None if it could not be launched
+    a process which cannot be given its input, e.g. because it has already exited, is still returned so that
+    it is waited on by the caller
+    """
     cmd = '1\n\n'
     for ivig in range(nvigs):
         cmd += '0.1\n'
@@ -49,29 +55,139 @@ def run_site_specific(form):
 
     try:
         stdout_path = join(sim_dir, 'stdout.txt')
-        new_inst = subprocess.Popen(
-            exe_path,
-            shell=False,
-            stdin=subprocess.PIPE,
-            stdout=open(stdout_path, 'w'),
-            stderr=subprocess.STDOUT,  # stdout=subprocess.PIPE
-        )
-
-        # Provide the user input to ECOSSE
-        if new_inst.stdin is not None:
+        with open(stdout_path, 'w') as fstdout:
+            new_inst = subprocess.Popen(
+                exe_path,
+                shell=False,
+                cwd=sim_dir,
+                stdin=subprocess.PIPE,
+                stdout=fstdout,
+                stderr=subprocess.STDOUT,  # stdout=subprocess.PIPE
+            )
+    except OSError as err:
+        print(exe_path + ' could not be launched due to error: ' + str(err))
+        return None
+
+    # Provide the user input to ECOSSE
+    if new_inst.stdin is not None:
+        try:
             new_inst.stdin.write(bytes(cmd,"ascii"))
             new_inst.stdin.close()
-        else:
-            print('Instance is None')
-    except OSError as err:
-        print(exe_path + ' could not be launched due to error: ' + err)
+        except OSError as err:
+            print('Could not send input to {} in {}: {}'.format(exe_path, sim_dir, err))
+            try:
+                new_inst.stdin.close()
+            except OSError:
+                pass
+    else:
+        print('Instance is None')
+
+    return new_inst
+
+def run_site_specific(params):
+
+    # runs site specific mode only for 30 years with vigour
+    # =====================================================
+    func_name = 'run_site_specifc'
+
+    retcode = 1
+    sim_dir = params.ref_dir
+    if not isdir(sim_dir):
+        print('Path ' + sim_dir + ' does not exist')
+        return
+
+    new_inst = launch_ecosse(sim_dir)
+    if new_inst is None:
         retcode = 0  # non-fatal error
     else:
         print('started process with PID {}'.format(new_inst.pid))
 
-    chdir(old_dir)
     return retcode
 
+def _run_to_completion(sim_dir, exe_path, timeout, cancel_event):
+    """
+    run ECOSSE in one simulation directory and wait for it to finish, be cancelled or time out
+    """
+    run = {'sim_dir': sim_dir, 'pid': None, 'status': 'not started', 'retcode': None, 'wall_time': 0.0}
+    if cancel_event is not None and cancel_event.is_set():
+        run['status'] = 'cancelled'
+        return run
+
+    if not isdir(sim_dir):
+        print('Path ' + sim_dir + ' does not exist')
+        return run
+
+    start_time = monotonic()
+    new_inst = launch_ecosse(sim_dir, exe_path)
+    if new_inst is None:
+        run['status'] = 'failed to start'
+        return run
+
+    run['pid'] = new_inst.pid
+    while True:
+        wait_secs = POLL_SECS
+        if timeout is not None:
+            wait_secs = min(wait_secs, max(0.0, start_time + timeout - monotonic()))
+        try:
+            run['retcode'] = new_inst.wait(timeout = wait_secs)
+            run['status'] = 'completed' if run['retcode'] == 0 else 'failed'
+            break
+        except subprocess.TimeoutExpired:
+            pass
+
+        if timeout is not None and monotonic() - start_time >= timeout:
+            run['status'] = 'timed out'
+        elif cancel_event is not None and cancel_event.is_set():
+            run['status'] = 'cancelled'
+        else:
+            continue
+
+        new_inst.kill()
+        run['retcode'] = new_inst.wait()
+        break
+
+    run['wall_time'] = monotonic() - start_time
+
+    return run
+
+def run_simulations(sim_dirs, exe_path = ECOSSE_EXE, max_procs = 1, timeout = None, on_complete = None,
+                                                                                        cancel_event = None):
+    """
+    run ECOSSE in each simulation directory with at most max_procs processes at a time
+    timeout is the wall time limit in seconds for each process, after which it is killed
+    on_complete, if supplied, is called in this thread with the record of each run as the run finishes,
+    for example to compare its outputs while other runs continue
+    returns records of sim_dir, pid, status, retcode and wall_time in the order of sim_dirs
+    """
+    nsims = len(sim_dirs)
+    runs = [None]*nsims
+    with ThreadPoolExecutor(max_workers = max(1, max_procs)) as executor:
+        futures = {executor.submit(_run_to_completion, sim_dir, exe_path, timeout, cancel_event): indx
+                                                                        for indx, sim_dir in enumerate(sim_dirs)}
+        for ndone, future in enumerate(as_completed(futures)):
+            run = future.result()
+            runs[futures[future]] = run
+            print('Run {} of {}: {}\tstatus: {}\texit code: {}\twall time: {:.1f}s'
+                        .format(ndone + 1, nsims, run['sim_dir'], run['status'], run['retcode'], run['wall_time']))
+            if on_complete is not None:
+                on_complete(run)
+
+    return runs
+
+
+def xlsx_value(sval):
+    """
+    numbers are written as floats, anything else as is
+    """
+    try:
+        val = float(sval)
+    except ValueError:
+        if sval.isdigit():
+            val = int(sval)
+        else:
+            val = sval
+
+    return val
 
 def write_xlsx_row(icol_start, irow, val_list, work_sheet):
 
@@ -87,44 +203,66 @@ def write_xlsx_cell(icol, irow, sval, work_sheet):
 
     func_name = ' _write_cell'
 
-    # convert integer column to Excel format using byte strings
-    # =========================================================
-    #                NB icol_limit = 26*26*26; val702 = 26*27; val26 = 26
-    if icol > val702:
-        print('column index {0} exceeds maximum {1} in function {2}'.format(icol,val702,func_name))
+    if icol > MAX_XLSX_COLS:
+        print('column index {0} exceeds maximum {1} in function {2}'.format(icol,MAX_XLSX_COLS,func_name))
         return
     elif icol <= 0:
         print('column index {0} must exceed 0 in function {1}'.format(icol,func_name))
         return
 
-    # column with up to two letters permitted
-    # =======================================
-    remain = icol % val26
-    res = int(icol/val26)
+    work_sheet.cell(row = irow, column = icol).value = xlsx_value(sval)
 
-    if remain == 0:
-        remain = 26
-        res -= 1
+    return
 
-    if res == 0:
-        col2val = ''
-    else:
-        col2val = bytes([res + 64]).decode()
+class XlsxSheetWriter(object,):
+    """
+    streams rows to a worksheet of a write-only workbook - rows must be written in ascending order
+    but gaps are permitted, as with write_xlsx_row
+    """
+    def __init__(self, wrkbk, title):
+        """
+        C
+        """
+        self.work_sheet = wrkbk.create_sheet(title)
+        self.next_row = 1
+
+    def write_row(self, irow, val_list, icol_start = 1, convert = True):
+        """
+        values are converted as for write_xlsx_cell unless convert is False
+        """
+        if irow < self.next_row:
+            print('row {} has already been written to sheet {}'.format(irow, self.work_sheet.title))
+            return
+
+        self._skip_to(irow)
+        val_list = list(val_list[:MAX_XLSX_COLS + 1 - icol_start])
+        if convert:
+            val_list = [xlsx_value(val) for val in val_list]
+        self.work_sheet.append([None]*(icol_start - 1) + val_list)
+        self.next_row += 1
 
-    col3val = bytes([remain + 64]).decode()
-    location = col2val + col3val + str(irow)    # typical location = 'A1'
+        return
 
-    try:
-        val = float(sval)
-    except ValueError:
-        if sval.isdigit():
-            val = int(sval)
-        else:
-            val = sval
+    def write_matrix(self, irow, matrix):
+        """
+        write each row of a two dimensional numeric array without conversion
+        """
+        self._skip_to(irow)
+        for row in matrix[:, :MAX_XLSX_COLS].tolist():
+            self.work_sheet.append(row)
+        self.next_row += len(matrix)
 
-    work_sheet[location].value = val
+        return
 
-    return
+    def _skip_to(self, irow):
+        """
+        C
+        """
+        while self.next_row < irow:
+            self.work_sheet.append([])
+            self.next_row += 1
+
+        return
 
 class Common_funcs(object,):
 
@@ -146,9 +284,10 @@ class Common_funcs(object,):
         fout = open(outfile,'w')
         return fout
 
-    def open_xls_outf(self, fname):
+    def open_xls_outf(self, fname, write_only = False):
 
-        # function returns a file object or -1 for failure
+        # function returns a workbook object or -1 for failure
+        # a write-only workbook has no active sheet and is written using XlsxSheetWriter
         # make sure we have xlsx extension
         root_name, extn = splitext(fname)
         outfname = root_name + '.xlsx'
@@ -162,6 +301,6 @@ class Common_funcs(object,):
                 print('Failed to delete output file. {}'.format(err))
                 return -1
 
-        wrkbk = Workbook()
+        wrkbk = Workbook(write_only = write_only)
         return wrkbk
 
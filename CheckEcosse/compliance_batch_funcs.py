@@ -0,0 +1,162 @@
+#-------------------------------------------------------------------------------
+# Name:        compliance_batch_funcs.py
+# Purpose:     check the input files of every cell directory of a spatial run and report the outcome of each
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'compliance_batch_funcs.py'
+__version__ = '0.0.1'
+
+# Version history
+# ---------------
+# 0.0.1  Wrote.
+#
+# a cell directory is one holding fnames.dat, for site specific mode, or input.txt, for limited data mode; the
+# messages of each cell which does not pass, or which has missing or invalid met files, are kept in a log beside
+# the report; met files are listed and validated once in each worker process by weather_registry
+#
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from io import StringIO
+from os import scandir
+from os.path import basename, join, relpath, splitext
+import re
+
+from analyse_ltd_data_misc_fns import new_report, record_failure
+from analyse_site_spec_dir import check_input_file_compliance
+from check_params import CheckParams
+from tree_scan_funcs import write_tables
+
+CELL_FNAMES = list(['fnames.dat', 'input.txt'])
+CHUNK_SIZE = 16         # cells sent to each worker process at a time
+CELL_TITLES = list(['Cell', 'Mode', 'Result', 'Block', 'Line', 'Errors', 'Missing met files', 'Invalid met files'])
+BLOCK_TITLES = list(['Result', 'Block type', 'Cells', 'Error lines'])
+
+def find_cell_dirs(root_dir):
+    """
+    directories beneath, and including, root_dir with input files, in sorted order - hidden directories are not entered
+    """
+    try:
+        with scandir(root_dir) as entries:
+            entries = sorted(entries, key = lambda entry: entry.name)
+    except OSError as err:
+        print('Could not scan {}: {}'.format(root_dir, err))
+        return
+
+    if any(entry.name in CELL_FNAMES and entry.is_file() for entry in entries):
+        yield root_dir
+
+    for entry in entries:
+        if not entry.name.startswith('.') and entry.is_dir(follow_symlinks = False):
+            yield from find_cell_dirs(entry.path)
+
+def check_cell(cell_dir):
+    """
+    check the input files of one cell, returning its report together with the messages of the check
+    """
+    report = new_report()
+    log = StringIO()
+    with redirect_stdout(log):
+        try:
+            check_input_file_compliance(CheckParams(ref_dir = cell_dir), report)
+        except Exception as err:
+            print('Check failed with {}: {}'.format(type(err).__name__, err))
+            record_failure(report, 'error', type(err).__name__)
+
+    report['cell_dir'] = cell_dir
+    report['log'] = log.getvalue()
+
+    return report
+
+def block_type(block_name):
+    """
+    block names with numbers generalised, so that for example failures of every crop are counted together
+    """
+    return re.sub(r'\d+', 'n', block_name).replace('\t', ' ')
+
+def count_block_errors(reports):
+    """
+    number of cells and of erroneous lines for each result other than pass and each type of block
+    """
+    counts = {}
+    for report in reports:
+        if report['result'] == 'pass':
+            continue
+
+        key = tuple([report['result'], block_type(report['block'])])
+        if key not in counts:
+            counts[key] = list([0, 0])
+        counts[key][0] += 1
+        counts[key][1] += report['nerrors']
+
+    return counts
+
+def check_compliance_tree(params):
+    """
+    check every cell beneath params.ref_dir, in a pool of worker processes if params.max_workers exceeds 1,
+    and write a report with a row for each cell and the number of failures for each type of block
+    """
+    root_dir = params.ref_dir
+    cell_dirs = list(find_cell_dirs(root_dir))
+    ncells = len(cell_dirs)
+    if ncells == 0:
+        print('No directories with ' + ' or '.join(CELL_FNAMES) + ' found beneath ' + root_dir)
+        return
+
+    if params.max_workers > 1 and ncells > 1:
+        print('Checking {} cells using {} worker processes'.format(ncells, params.max_workers))
+        executor = ProcessPoolExecutor(max_workers = params.max_workers)
+        checks = executor.map(check_cell, cell_dirs, chunksize = CHUNK_SIZE)
+    else:
+        print('Checking {} cells'.format(ncells))
+        executor = None
+        checks = (check_cell(cell_dir) for cell_dir in cell_dirs)
+
+    reports = []
+    for report in checks:
+        if params.cancel_requested():
+            print('Compliance check cancelled after {} of {} cells'.format(len(reports), ncells))
+            break
+        reports.append(report)
+        params.report_progress(len(reports), ncells, basename(report['cell_dir']))
+
+    if executor is not None:
+        executor.shutdown(cancel_futures = True)
+
+    # messages of those cells which did not pass or have met file warnings
+    # ====================================================================
+    out_fname = join(params.rslts_dir, basename(root_dir) + '_compliance.' + params.scan_format)
+    root_name, dummy = splitext(out_fname)
+    with open(root_name + '.log', 'w') as fobj:
+        for report in reports:
+            if report['result'] != 'pass' or report['nmissing_met'] > 0 or report['nbad_met'] > 0:
+                fobj.write('{}\n{}\n'.format(report['cell_dir'], report['log']))
+
+    cell_rows = [list([relpath(report['cell_dir'], root_dir), report['mode'], report['result'],
+                       report['block'].replace('\t', ' '), report['line'], report['nerrors'], report['nmissing_met'],
+                       report['nbad_met']]) for report in reports]
+    counts = count_block_errors(reports)
+    block_rows = [list(key) + counts[key] for key in sorted(counts, key = lambda key: -counts[key][0])]
+    out_fname = write_tables(out_fname, list([tuple(['Cells', CELL_TITLES, cell_rows]),
+                                              tuple(['Block errors', BLOCK_TITLES, block_rows])]))
+
+    nresults = {}
+    for report in reports:
+        nresults[report['result']] = nresults.get(report['result'], 0) + 1
+    print('Checked {} cells: '.format(len(reports)) + ', '.join('{} {}'.format(nresults[result], result)
+                                                                        for result in sorted(nresults)))
+    print('Results written to: {}\nMessages of cells with failures or met file warnings written to: {}\n'
+                                                                            .format(out_fname, root_name + '.log'))
+    return 'dummy'
+
+def check_compliance(params):
+    """
+    entry point - a single directory as before or, if params.scan_recursive is set, every cell beneath it
+    """
+    if params.scan_recursive:
+        return check_compliance_tree(params)
+
+    return check_input_file_compliance(params)
@@ -0,0 +1,299 @@
+#-------------------------------------------------------------------------------
+# Name:        diff_engine_funcs.py
+# Purpose:     vectorised comparison of the tokens from a reference and a target Ecosse output file
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'diff_engine_funcs.py'
+__version__ = '0.0.2'
+
+# Version history
+# ---------------
+# 0.0.1  Wrote - replaces the per-atom process_two_atoms method of analyse_ecosse_output.Analysis
+#        Tokens classified once per file by classify_tokens so that classifications can be kept in sidecars
+#        Rows identical in both files are credited with the classification of the reference in bulk
+#        Ranges of rows may be compared separately and their counters merged
+#
+from numpy import array, arange, repeat, cumsum, zeros, ones, full, fromiter, isnan, isin, errstate, where, \
+                                                                        minimum, result_type, int64, float64
+from numpy import char as npchar
+
+no_data = -999.0
+FLOAT_WORDS = list(['nan', 'inf', 'infinity'])
+FLOAT_LEADS = list(['+', '-', '.'])
+STATS_KEYS = list(['numInts', 'sameInts', 'diffInts', 'numFlts', 'eqlFlts', 'nteqlFlts', 'lrgstFltDiff',
+                   'lrgstFltCoord', 'badVals', 'NaNs', 'asterisks'])
+
+def new_stats():
+    """
+    counters reported on the Short Summary sheet, initialised as per the original Analysis attributes
+    """
+    stats = {key: 0 for key in STATS_KEYS}
+    stats['lrgstFltDiff'] = 0.0
+    stats['lrgstFltCoord'] = list([0, 0])
+
+    return stats
+
+def merge_stats(stats, range_stats):
+    """
+    add the counters of a later range of rows to those of the earlier ranges - the largest difference is replaced
+    only when exceeded, so that it remains the first occurrence of the maximum
+    """
+    for key in STATS_KEYS:
+        if key == 'lrgstFltDiff':
+            if range_stats[key] > stats[key]:
+                stats[key] = range_stats[key]
+                stats['lrgstFltCoord'] = range_stats['lrgstFltCoord']
+        elif key != 'lrgstFltCoord':
+            stats[key] += range_stats[key]
+
+    return stats
+
+def _atof(sval):
+    """
+    float conversion which returns NaN rather than raising ValueError
+    """
+    try:
+        return float(sval)
+    except ValueError:
+        return float('nan')
+
+def parse_float_tokens(tokens):
+    """
+    convert an array of tokens to float64 with the same rules as the builtin float
+    returns the values and a mask which is False where the conversion failed
+    """
+    ntokens = len(tokens)
+    vals = zeros(ntokens, dtype=float64)
+    valid = ones(ntokens, dtype=bool)
+
+    # words such as those in embedded headers are rejected without attempting a conversion
+    # ====================================================================================
+    first_chars = tokens.astype('U1')
+    word_indx = (~(npchar.isdecimal(first_chars) | isin(first_chars, FLOAT_LEADS))).nonzero()[0]
+    if len(word_indx) > 0:
+        valid[word_indx] = isin(npchar.lower(tokens[word_indx]), FLOAT_WORDS)
+
+    cnvrt_indx = valid.nonzero()[0]
+    cnvrt_tokens = tokens[cnvrt_indx].tolist()
+    try:
+        vals[cnvrt_indx] = fromiter(map(float, cnvrt_tokens), dtype=float64, count=len(cnvrt_indx))
+        return vals, valid
+    except ValueError:
+        pass
+
+    # at least one bad token - failures are those NaNs which were not spelt as NaN
+    # ============================================================================
+    cnvrt_vals = fromiter(map(_atof, cnvrt_tokens), dtype=float64, count=len(cnvrt_indx))
+    vals[cnvrt_indx] = cnvrt_vals
+    nan_indx = cnvrt_indx[isnan(cnvrt_vals)]
+    if len(nan_indx) > 0:
+        body = npchar.lstrip(tokens[nan_indx], '+-')
+        nsigns = npchar.str_len(tokens[nan_indx]) - npchar.str_len(body)
+        valid[nan_indx] = (nsigns <= 1) & isin(npchar.lower(body), FLOAT_WORDS[:1])
+
+    return vals, valid
+
+def _is_int(sval):
+    """
+    C
+    """
+    try:
+        int(sval)
+        return True
+    except ValueError:
+        return False
+
+def int_token_mask(tokens):
+    """
+    vectorised test of whether each token would be accepted by the builtin int
+    """
+    body = npchar.lstrip(tokens, '+-')
+    nsigns = npchar.str_len(tokens) - npchar.str_len(body)
+    flags = (nsigns <= 1) & npchar.isdecimal(body)
+
+    # underscores are rare enough to be checked one at a time
+    # =======================================================
+    under = (npchar.find(tokens, '_') >= 0).nonzero()[0]
+    if len(under) > 0:
+        flags[under] = [_is_int(sval) for sval in tokens[under]]
+
+    return flags
+
+def classify_tokens(tokens):
+    """
+    properties of each token of a file which do not depend on the file it is compared with
+    tokens must be an array of str
+    """
+    values, valid = parse_float_tokens(tokens)
+    columns = {'tokens': tokens, 'values': values, 'valid': valid,
+               'nans': tokens == 'NaN',
+               'asterisks': npchar.find(tokens, '****') >= 0,
+               'ints': int_token_mask(tokens)}
+
+    return columns
+
+def _token_str(token):
+    """
+    tokens held as bytes are decoded for reporting
+    """
+    if isinstance(token, bytes):
+        token = token.decode()
+
+    return token
+
+def _expand_same_rows(cols_ref, cols_targ, same_atom):
+    """
+    target columns of all atoms, those of identical rows taken from the reference, and whether each pair of
+    tokens is the same - only the tokens of rows which differ are compared
+    """
+    diff_indx = (~same_atom).nonzero()[0]
+    cols_all = {}
+    for key in cols_ref:
+        column = cols_ref[key].astype(result_type(cols_ref[key], cols_targ[key]))
+        column[diff_indx] = cols_targ[key]
+        cols_all[key] = column
+
+    same_str = same_atom.copy()
+    same_str[diff_indx] = cols_ref['tokens'][diff_indx] == cols_targ['tokens']
+
+    return cols_all, same_str
+
+def diff_token_rows(fname_short, row_ids, row_lens, cols_ref, cols_targ, line_pair, diff, same_rows = None,
+                                                                                                diff_cols = None):
+    """
+    compare the flattened tokens of all rows from the reference and target files in one batch
+         row_ids:   zero based line index, used for the diff matrix, of each row
+         row_lens:  number of atoms on each row, which must be the same for reference and target
+         cols_ref, cols_targ: classified atoms of the rows as returned by classify_tokens
+         line_pair: function returning the reference and target lines of a row, used for reporting only
+         same_rows: if supplied, True for each row whose text is identical in both files - cols_targ then
+                    holds the atoms of the remaining rows only
+         diff_cols: if supplied, column of the diff matrix for each row, otherwise its row id
+    differences are written to the diff matrix, shape (max_len_row, nlines), and counters are returned
+    """
+    func_name = ' process_two_atoms'
+
+    stats = new_stats()
+    natoms = len(cols_ref['tokens'])
+    if natoms == 0:
+        return stats
+
+    # locate each atom
+    # ================
+    nrows = len(row_lens)
+    row_lens = array(row_lens, dtype=int64)
+    row_ids = array(row_ids, dtype=int64)
+    row_starts = cumsum(row_lens) - row_lens
+    atom_row = repeat(arange(nrows), row_lens)
+    atom_col = arange(natoms) - repeat(row_starts, row_lens)
+
+    # identical rows have the same tokens, so the same classification, and need not be compared
+    # =========================================================================================
+    if same_rows is None:
+        same_str = cols_ref['tokens'] == cols_targ['tokens']
+    else:
+        cols_targ, same_str = _expand_same_rows(cols_ref, cols_targ, repeat(same_rows, row_lens))
+
+    ref = cols_ref['tokens']
+    targ = cols_targ['tokens']
+
+    # classify each pair of atoms in order of precedence
+    # ==================================================
+    nan_mask = cols_ref['nans'] | cols_targ['nans']
+    ast_mask = ~nan_mask & (cols_ref['asterisks'] | cols_targ['asterisks'])
+    int_mask = ~(nan_mask | ast_mask) & cols_ref['ints'] & cols_targ['ints']
+    flt_mask = ~(nan_mask | ast_mask | int_mask)
+
+    val_ref = cols_ref['values']
+    val_targ = cols_targ['values']
+    ok_ref = cols_ref['valid']
+    ok_targ = cols_targ['valid']
+
+    bad_mask = flt_mask & ~(ok_ref & ok_targ)
+    flt_mask &= ~bad_mask
+
+    # abandon the remainder of a line once bad data is encountered
+    # ============================================================
+    active = ones(natoms, dtype=bool)
+    bad_indx = bad_mask.nonzero()[0]
+    if len(bad_indx) > 0:
+        first_bad = full(nrows, natoms, dtype=int64)
+        minimum.at(first_bad, atom_row[bad_indx], atom_col[bad_indx])
+        active = atom_col < first_bad[atom_row]
+
+        for irow in (first_bad < natoms).nonzero()[0]:
+            icol = first_bad[irow]
+            nline = row_ids[irow]
+            iatom = row_starts[irow] + icol
+            if ok_ref[iatom]:
+                type_val = 'reference'
+            else:
+                type_val = 'target'
+            line_ref, line_targ = line_pair(irow)
+            str1 = 'Warning in function: <{0}>\tfile name: {1}\tValueError on line {2} column {3} converting {4} value.'\
+                                    .format(func_name, fname_short, nline + 1, icol + 1, type_val)
+            if line_ref == line_targ:
+                print(str1 + '\tReference and target lines are identical - will skip:\n\t{0}'.format(line_ref))
+            else:
+                print(str1 + '\tValues, reference/target: {0}/{1} - will skip'
+                                                .format(_token_str(ref[iatom]), _token_str(targ[iatom])))
+
+    nan_mask &= active
+    ast_mask &= active
+    int_mask &= active
+    flt_mask &= active
+
+    # integer values are counted but otherwise ignored
+    # ================================================
+    stats['numInts'] = int(int_mask.sum())
+    nsame_ints = int((int_mask & same_str).sum())
+    for indx in (int_mask & ~same_str).nonzero()[0]:
+        if int(ref[indx]) == int(targ[indx]):
+            nsame_ints += 1
+    stats['sameInts'] = nsame_ints
+    stats['diffInts'] = stats['numInts'] - nsame_ints
+
+    # relative differences of float values
+    # ====================================
+    eql_mask = flt_mask & same_str
+    nteql_indx = (flt_mask & ~same_str).nonzero()[0]
+    stats['numFlts'] = int(flt_mask.sum())
+    stats['eqlFlts'] = int(eql_mask.sum())
+    stats['nteqlFlts'] = len(nteql_indx)
+
+    vref = val_ref[nteql_indx]
+    vtarg = val_targ[nteql_indx]
+    denom = vref + vtarg
+    with errstate(all='ignore'):
+        diff_vals = where(denom == 0.0, 0.0, abs((vref - vtarg)/denom))
+
+    # largest difference is the first occurrence of the maximum, as for a sequential scan
+    # ===================================================================================
+    if len(diff_vals) > 0:
+        candidates = where(isnan(diff_vals), -1.0, diff_vals)
+        imax = int(candidates.argmax())
+        if candidates[imax] > 0.0:
+            indx = nteql_indx[imax]
+            stats['lrgstFltDiff'] = float(diff_vals[imax])
+            stats['lrgstFltCoord'] = list([int(row_ids[atom_row[indx]]) + 1, int(atom_col[indx]) + 1])
+
+    stats['NaNs'] = int(nan_mask.sum())
+    stats['asterisks'] = int(ast_mask.sum())
+
+    # populate difference matrix
+    # ==========================
+    if diff_cols is None:
+        atom_line = row_ids[atom_row]
+    else:
+        atom_line = array(diff_cols, dtype=int64)[atom_row]
+    for mask in (nan_mask, ast_mask):
+        diff[atom_col[mask], atom_line[mask]] = no_data
+
+    diff[atom_col[eql_mask], atom_line[eql_mask]] = 0.0
+    diff[atom_col[nteql_indx], atom_line[nteql_indx]] = diff_vals
+
+    return stats
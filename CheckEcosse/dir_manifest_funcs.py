@@ -0,0 +1,180 @@
+#-------------------------------------------------------------------------------
+# Name:        dir_manifest_funcs.py
+# Purpose:     content hash manifests of simulation directories so that directories are compared without reading files
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'dir_manifest_funcs.py'
+__version__ = '0.0.3'
+
+# Version history
+# ---------------
+# 0.0.1  Wrote.
+# 0.0.2  Manifests optionally restricted to the files accepted by a filter, records of other files are retained
+# 0.0.3  Manifests held in the results directory rather than in the run directories, which may be read only,
+#        and kept in memory for the life of the process
+#
+# the manifest of a directory such as E:\run\cell_1 records the size, modification time and content hash of each
+# file of the directory; a file is only read again when its size or modification time has changed
+# manifests are held in the .check_ecosse_manifests directory of the results directory, one file per directory
+# named by the hash of its normalised path, so that run directories are not written to; if they cannot be written
+# they are kept in memory only
+#
+from os import getpid, makedirs, replace, scandir
+from os.path import abspath, isdir, join, normcase
+from hashlib import sha256
+import json
+
+from result_cache import file_digest
+
+MANIFEST_DIR = '.check_ecosse_manifests'
+OLD_MANIFEST_FNAME = '.check_ecosse_manifest.json'  # written into run directories by earlier versions, not compared
+MANIFEST_VERSION = 2    # increment whenever the content of a manifest changes
+ERROR_STR = '*** Error *** '
+
+_manifests = {}     # normalised directory path: files recorded by its manifest, for the life of the process
+_unwritable = set() # manifest directories which could not be written, so are not tried again
+
+def manifest_fname(manifest_dir, dir_key):
+    """
+    C
+    """
+    return join(manifest_dir, sha256(dir_key.encode()).hexdigest() + '.json')
+
+def _read_manifest(manifest_fname, dir_key):
+    """
+    files recorded by an existing manifest, or an empty dictionary if there is none or it is unreadable
+    """
+    try:
+        with open(manifest_fname, 'r') as fobj:
+            manifest = json.load(fobj)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION or \
+                                                                                    manifest.get('dir') != dir_key:
+        return {}
+
+    return manifest['files']
+
+def _write_manifest(manifest_dir, dir_key, files):
+    """
+    the manifest is replaced in one step - returns False if it could not be written e.g. the results directory is
+    read only, in which case a notice is printed once and manifests are no longer written to that directory
+    """
+    if manifest_dir in _unwritable:
+        return False
+
+    fname = manifest_fname(manifest_dir, dir_key)
+    tmp_fname = fname + '.{}.tmp'.format(getpid())
+    try:
+        if not isdir(manifest_dir):
+            makedirs(manifest_dir, exist_ok = True)
+
+        with open(tmp_fname, 'w') as fobj:
+            json.dump({'version': MANIFEST_VERSION, 'dir': dir_key, 'files': files}, fobj)
+        replace(tmp_fname, fname)
+    except OSError as err:
+        print('Could not write manifests to {} - will keep them in memory only: {}'.format(manifest_dir, err))
+        _unwritable.add(manifest_dir)
+        return False
+
+    return True
+
+def build_manifest(dir_name, file_filter = None, rslts_dir = ''):
+    """
+    size, modification time and content hash of each file of a directory, keyed by file name
+    only new and changed files are hashed, after which the manifest held in the results directory, if given,
+    is updated
+    if file_filter is supplied only those files whose names it accepts are included, and so hashed; the manifest
+    retains the records of other files
+    returns None if the directory does not exist
+    """
+    if not isdir(dir_name):
+        print('Path ' + dir_name + ' does not exist')
+        return None
+
+    dir_key = normcase(abspath(dir_name))
+    manifest_dir = join(rslts_dir, MANIFEST_DIR) if rslts_dir != '' else None
+    old_files = _manifests.get(dir_key)
+    if old_files is None:
+        if manifest_dir is None:
+            old_files = {}
+        else:
+            old_files = _read_manifest(manifest_fname(manifest_dir, dir_key), dir_key)
+
+    files = {}
+    other_files = {}
+    nhashed = 0
+    with scandir(dir_name) as entries:
+        for entry in entries:
+            if entry.name == OLD_MANIFEST_FNAME or entry.name.endswith('.tmp') or not entry.is_file():
+                continue
+
+            if file_filter is not None and not file_filter(entry.name):
+                if entry.name in old_files:
+                    other_files[entry.name] = old_files[entry.name]
+                continue
+
+            fstat = entry.stat()
+            signature = list([fstat.st_size, fstat.st_mtime_ns])
+            file_rec = old_files.get(entry.name)
+            if file_rec is None or file_rec[:2] != signature:
+                try:
+                    file_rec = signature + list([file_digest(entry.path)])
+                except OSError as err:
+                    print(ERROR_STR + 'could not read {}: {}'.format(entry.path, err))
+                    continue
+                nhashed += 1
+
+            files[entry.name] = file_rec
+
+    _manifests[dir_key] = dict(other_files, **files)
+    if manifest_dir is not None and (nhashed > 0 or len(files) + len(other_files) != len(old_files)):
+        _write_manifest(manifest_dir, dir_key, _manifests[dir_key])
+
+    return files
+
+def diff_manifests(ref_files, targ_files):
+    """
+    names of the files of the reference manifest which are identical, different or missing in the target
+    together with those files only in the target
+    """
+    identical = []
+    different = []
+    missing = []
+    for fname, ref_rec in ref_files.items():
+        targ_rec = targ_files.get(fname)
+        if targ_rec is None:
+            missing.append(fname)
+        elif targ_rec[0] == ref_rec[0] and targ_rec[2] == ref_rec[2]:
+            identical.append(fname)
+        else:
+            different.append(fname)
+
+    extra = [fname for fname in targ_files if fname not in ref_files]
+
+    return {'identical': identical, 'different': different, 'missing': missing, 'extra': extra}
+
+def compare_dirs(ref_dir, targ_dirs, file_filter = None, rslts_dir = ''):
+    """
+    one-to-many comparison of directories, restricted to the files accepted by file_filter if supplied, with the
+    manifests held in rslts_dir - the reference manifest is built once
+    returns the manifest diff for each target, None for those targets which do not exist
+    """
+    ref_files = build_manifest(ref_dir, file_filter, rslts_dir)
+    if ref_files is None:
+        return list([None]*len(targ_dirs))
+
+    diffs = []
+    for targ_dir in targ_dirs:
+        targ_files = build_manifest(targ_dir, file_filter, rslts_dir)
+        if targ_files is None:
+            diffs.append(None)
+        else:
+            diffs.append(diff_manifests(ref_files, targ_files))
+
+    return diffs
@@ -12,17 +12,36 @@ __version__ = '0.0.1'
 # Version history
 # ---------------
 # 0.0.1  Wrote.
+#        Last columns and soil water read from columnar sidecars when these are enabled
+#        Progress reported after each group and cancellation checked before each run is read
+#        Each output file parsed at most once per invocation using a run cache
+#        SUMMARY.OUT and BALANCE_N.OUT read as arrays of floats, replacing the csv reader
+#        Only the columns required are split from each line, metrics groups may be set in the setup file
+#        Soil water charted for several depths from a single read of SOILW.OUT
+#        Series optionally aggregated or downsampled before charting, with full resolution values in one sheet
+#        Charts optionally rendered in parallel to PNG or SVG images with an HTML page instead of a workbook
+#        Data lines of sidecars classified by the rules shared with the line index of out_index_funcs
+#        Downsampled series charted against their time steps on a scatter chart, as these are unevenly spaced
 #
 
 from os.path import join, isdir, split, isfile, exists
-from os import remove
-import csv
+from os import makedirs, remove
 
-from PyQt5.QtWidgets import QApplication
+from itertools import chain
 
+from numpy import array, ndarray, column_stack, zeros, ones, arange, where, repeat, cumsum, fromiter, isin, \
+                                                                                    bincount, nan, float64, int64
 from openpyxl import Workbook
-from openpyxl.chart import LineChart, Reference
+from openpyxl.chart import LineChart, Reference, ScatterChart, Series
 from analyse_ecosse_output import format_out_files
+from common_funcs import process_events
+from diff_engine_funcs import parse_float_tokens
+from out_file_funcs import iter_projected_rows, last_column, layer_range, named_columns
+from out_index_funcs import line_kinds, LINE_DATA
+from out_sidecar_funcs import open_columnar
+from loaded_run import RunCache
+from chart_reduce_funcs import REDUCE_MODES, reduce_series
+from chart_image_funcs import IMAGE_FORMATS, image_backend_available, render_charts, write_html_index
 
 METRICS_GROUPS = {'carbon': list(['BIOC', 'CO2', 'DPMC', 'HUMC', 'RPMC', 'TOTC']),
                   'nitrogen': list(['BION', 'DPMN', 'HUMN', 'RPMN', 'TOTN', 'SOILW']),
@@ -31,6 +50,11 @@ METRICS_GROUPS = {'carbon': list(['BIOC', 'CO2', 'DPMC', 'HUMC', 'RPMC', 'TOTC']
                   'npp': list(['NPP', 'CH4'])}
 
 PRFRD_LINE_WDTH = 25000  # 100020 taken from chart_example.py     preferred line width in EMUs
+SERIES_COLOURS = list([None, 'FF0000', '00AAAA'])   # reference, target 1 and target 2, None for the default
+DASH_STYLES = list(['solid', 'dash', 'sysDot', 'lgDash', 'dashDot', 'sysDash'])
+DATA_SHEET = 'data'      # sheet of full resolution values when charts are reduced
+CHART_BACKENDS = list(['xlsx']) + IMAGE_FORMATS
+IMAGES_DIR_SUFFIX = '_charts'
 FNAME_LINK_STR = '_vs_'
 ERROR_STR = '*** Error *** '
 
@@ -52,39 +76,79 @@ METRIC_MPPNGS_V6_3 = {'BIOC': 'BIO_C', 'CO2': 'CO2_C', 'DPMC': 'DPM_C', 'HUMC':
                       'LEACHN': 'Leached_N',
                       'NH4N': 'NH4_N', 'NPP': 'NPP_ADJ', 'CH4': 'CH4_C'}
 SKIP_NPP = True
+FIRST_LAYER_COL = 3       # available water of the first layer is in the fourth column of SOILW.OUT
+MAX_LAYERS = 60
+LAYER_DEPTH = 5.0         # layers are 5 cm deep so the maximum depth is 300cms
+
+def metrics_groups_from_setting(setting):
+    """
+    groups of metrics to be charted from the metrics_groups setting, a dictionary of group names each with a list
+    of metrics - only the files of these metrics are read; the default groups are used if there is no setting
+    """
+    if setting is None:
+        return METRICS_GROUPS
+
+    valid_flag = isinstance(setting, dict) and len(setting) > 0
+    if valid_flag:
+        for metrics in setting.values():
+            if not isinstance(metrics, list) or not all(isinstance(metric, str) for metric in metrics):
+                valid_flag = False
+                break
+
+    if not valid_flag:
+        print(ERROR_STR + 'metrics_groups setting must map group names to lists of metrics - will use defaults')
+        return METRICS_GROUPS
+
+    return setting
+
+def _summary_column_names(metrics_groups):
+    """
+    names in SUMMARY.OUT, from ECOSSE version 6.2 or 6.3, of the metrics to be charted
+    """
+    names = set()
+    for group in metrics_groups:
+        if group == 'balance_n':
+            continue
+        for metric in metrics_groups[group]:
+            names.add(METRIC_MPPNGS_V6_2.get(metric, metric))
+            names.add(METRIC_MPPNGS_V6_3.get(metric, metric))
+
+    return tuple(sorted(names))
 
 def _search_for_metric_and_map(group, summary_metrics, metric):
     """
-    locate metric is summary.out metrics
+    locate metric is summary.out metrics - metrics without a mapping are looked for under their own name
     """
-    mtrc_mppd = METRIC_MPPNGS_V6_2[metric]
+    mtrc_mppd = METRIC_MPPNGS_V6_2.get(metric, metric)
     if mtrc_mppd not in summary_metrics:
-        mtrc_mppd = METRIC_MPPNGS_V6_3[metric]
+        mtrc_mppd = METRIC_MPPNGS_V6_3.get(metric, metric)
         if mtrc_mppd not in summary_metrics:
             mtrc_mppd = None
             mess = ' in SUMMARY.OUT from ECOSSE version 6.2 or 6.3'
             print(ERROR_STR + 'group: ' + group + ' no mapping for metric: ' + metric + mess)
-            QApplication.processEvents()
+            process_events()
 
     return mtrc_mppd
 
-def generate_charts(form):
+def generate_charts(params, run_cache = None):
     """
-    C
+    run_cache is a loaded_run.RunCache which may be shared with other analyses, if None one is created
     """
+    if run_cache is None:
+        run_cache = RunCache()
 
     # gather directories from the GUI
     # ===============================
-    ref_dir = form.w_lbl03.text()
-    ref_id = form.w_ref_id.text()
+    ref_dir = params.ref_dir
+    ref_id = params.ref_id
     if ref_id == '':
         print('Reference identifier cannot be blank')
         return
 
     compare_fname = ref_id
 
-    targ1_dir = form.w_lbl04.text()
-    targ1_id = form.w_targ1_id.text()
+    targ1_dir = params.targ1_dir
+    targ1_id = params.targ1_id
     if targ1_id == '':
         print('Target 1 identifier cannot be blank')
         return
@@ -92,26 +156,38 @@ def generate_charts(form):
     idents = [ref_id, targ1_id]
     compare_fname += '_' + targ1_id
 
-    if form.w_targ2_also.isChecked():
+    if params.use_targ2:
         targ2_also_flag = True
-        targ2_dir = form.w_lbl06.text()
-        targ2_id = form.w_targ2_id.text()
+        targ2_dir = params.targ2_dir
+        targ2_id = params.targ2_id
         if targ2_id == '':
             print('Target 2 identifier cannot be blank')
             return
 
         idents.append(targ2_id)
         compare_fname += '_' + targ2_id
-
-        max_col_val = 3
     else:
-        max_col_val = 2
         targ2_also_flag = False
         targ2_dir = None
 
-    rslts_dir = form.w_lbl13.text()
-    water_dep_str = form.w_water_dep.text()
-    water_dep = float(water_dep_str)
+    rslts_dir = params.rslts_dir
+    water_dep_str = params.water_dep
+    water_deps = _water_depths(water_dep_str)
+    if water_deps is None:
+        return
+    nlayers = max([_num_layers(water_dep) for water_dep in water_deps])
+
+    if params.chart_reduce not in REDUCE_MODES:
+        print(ERROR_STR + 'chart reduction must be one of ' + ', '.join(REDUCE_MODES) + ', got: ' + params.chart_reduce)
+        return
+
+    chart_backend = params.chart_backend
+    if chart_backend not in CHART_BACKENDS:
+        print(ERROR_STR + 'chart backend must be one of ' + ', '.join(CHART_BACKENDS) + ', got: ' + chart_backend)
+        return
+
+    if chart_backend != 'xlsx' and not image_backend_available():
+        return
 
     # trap possible error
     # ===================
@@ -128,64 +204,87 @@ def generate_charts(form):
 
     # Excel file name of comparisons
     # ==============================
+    images_dir = join(rslts_dir, compare_fname + IMAGES_DIR_SUFFIX)
+    html_fname = join(rslts_dir, compare_fname + '.html')
     compare_fname += '.xlsx'
     charts_fname = join(rslts_dir, compare_fname)
-    if exists(charts_fname):
+    if chart_backend == 'xlsx' and exists(charts_fname):
         try:
             remove(charts_fname)
         except (OSError, IOError) as err:
             print('Failed to delete output file {}'.format(err))
             return -1
 
-    wrkbk = Workbook()
-    header_rec = list(idents)
-
-    # create and record sheets for charts
-    # ===================================
+    metrics_groups = metrics_groups_from_setting(params.metrics_groups)
     save_sheets_flag = True
-    wrkshts_group = {}
-    for group in METRICS_GROUPS:
-
-        # set up worksheet for each group
-        # ===============================
-        if group == 'carbon':
-            wrksht = wrkbk.active
-        else:
-            wrksht = wrkbk.create_sheet()
-        wrksht.title = group
-        wrkshts_group[group] = wrksht
+    if chart_backend == 'xlsx':
+        wrkbk = Workbook()
+
+        # create and record sheets for charts
+        # ===================================
+        wrkshts_group = {}
+        for igroup, group in enumerate(metrics_groups):
+
+            # set up worksheet for each group
+            # ===============================
+            if igroup == 0:
+                wrksht = wrkbk.active
+            else:
+                wrksht = wrkbk.create_sheet()
+            wrksht.title = group
+            wrkshts_group[group] = wrksht
+    else:
+        # charts are rendered as images once all have been gathered
+        # ==========================================================
+        save_sheets_flag = False
+        if not isdir(images_dir):
+            makedirs(images_dir)
+        image_specs = []
+        image_groups = []
 
     # retrieve data from .OUT files and write to sheets
     # =================================================
     balance_set = None
-    for group in METRICS_GROUPS:
-        metric_group = METRICS_GROUPS[group]
+    nout_files = format_out_files(params, label_string_flag=False)
+    summary_names = _summary_column_names(metrics_groups)
+    data_columns = []
+    ngroups = len(metrics_groups)
+    for igroup, group in enumerate(metrics_groups):
+        metric_group = metrics_groups[group]
 
         # retrieve the last column for each metric - the sum of all layers
         # ================================================================
         results = {}
         max_num_pts = 999999999
         for sim_name in sim_dir_names:
+            if params.cancel_requested():
+                print('Charting cancelled - ' + (charts_fname if chart_backend == 'xlsx' else html_fname) +
+                                                                                                    ' not written')
+                return
+
             print()
             dir_name = sim_dir_names[sim_name]
+            loaded_run = run_cache.run(dir_name)
             results[sim_name] = {}
 
             # use SUMMARY.OUT if it exists
             # ============================
             summary_set = None
             summary_metrics = None
-            nout_files = format_out_files(form, label_string_flag=False)
-            if form.w_smmry_only.isChecked() or nout_files < 30:
+            if params.summary_only or nout_files < 30:
                 summary_out = join(dir_name, 'SUMMARY.OUT')
                 if isfile(summary_out):
-                    summary_set = _get_out_file_contents(dir_name)
+                    summary_set = loaded_run.load('SUMMARY.OUT', _get_out_file_contents, dir_name,
+                                                            'SUMMARY.OUT', params.use_sidecars, summary_names)
                     summary_metrics = list(summary_set.keys())
                 else:
                     print(ERROR_STR + summary_out + ' is not a file')
                     continue
 
             if group == 'balance_n':
-                balance_set = _get_out_file_contents(dir_name, group.upper() + '.OUT')
+                balance_fname = group.upper() + '.OUT'
+                balance_set = loaded_run.load(balance_fname, _get_out_file_contents, dir_name, balance_fname,
+                                                                    params.use_sidecars, tuple(metrics_groups[group]))
                 if balance_set is None:
                     metric_group = []
 
@@ -196,8 +295,13 @@ def generate_charts(form):
                 if group == 'balance_n':
                     result = balance_set[metric]
                 else:
-                    if summary_set is None:
-                        result = _read_last_column(dir_name, metric, water_dep)
+                    if summary_set is None and metric == 'SOILW':
+                        cum_layers = loaded_run.load('SOILW.OUT', _read_soilw_layers, dir_name, params.use_sidecars,
+                                                                                                        nlayers)
+                        result = _avail_water(cum_layers, water_deps)
+                    elif summary_set is None:
+                        result = loaded_run.load(metric + '.OUT', _read_last_column, dir_name, metric, water_deps[0],
+                                                                                            params.use_sidecars)
                     else:
                         mtrc_mppd = _search_for_metric_and_map(group, summary_metrics, metric)
                         if mtrc_mppd is None:
@@ -227,72 +331,102 @@ def generate_charts(form):
                 print('Will skip metric ' + metric + ' - not present in results')
                 continue
 
+            chart_series = _chart_series(results, metric, idents, water_deps)
+            titles = [title for title, isim, idep, vals in chart_series]
+            npts = min(max_num_pts, len(results['ref'][metric]))
+            chart_title, y_title = _chart_titles(metric, water_dep_str)
+
+            if chart_backend != 'xlsx':
+                matrix = column_stack([_float_column(vals[:npts]) for title, isim, idep, vals in chart_series])
+                steps, reduced = reduce_series(matrix, params.chart_reduce, params.steps_per_year, params.chart_points)
+                image_fname = join(images_dir, group + '_' + metric + '.' + chart_backend)
+                image_specs.append(_image_spec(image_fname, chart_title, y_title, steps, reduced, chart_series))
+                image_groups.append(group)
+                continue
+
             wrksht = wrkbk.create_sheet()
             wrksht.title = metric
 
-            rows = list([header_rec])
-
-            for ic, ref_val in enumerate(results['ref'][metric]):
-                if ic >= max_num_pts:
-                    break
-
-                try:
-                    row_rec = [float(ref_val)]
-                except ValueError as e:
-                    print(
-                        'ValueError converting ref_val: ' + ref_val + '\tmetric: ' + metric + '\tsim name: ' + sim_name)
-                    break
-
-                targ1_val = results['targ1'][metric][ic]
-                row_rec.append(float(targ1_val))
-
-                if targ2_also_flag:
-                    targ2_val = results['targ2'][metric][ic]
-                    row_rec.append(float(targ2_val))
-
-                rows.append(row_rec)
+            if params.chart_data_sheet or params.chart_reduce != 'none':
+                matrix = column_stack([_float_column(vals[:npts]) for title, isim, idep, vals in chart_series])
+                if params.chart_data_sheet:
+                    data_columns += [tuple([metric + ' ' + title, matrix[:, isrs]]) for isrs, title in enumerate(titles)]
+
+            if params.chart_reduce == 'none':
+                min_col = 1
+                rows = list([titles])
+                for ic in range(npts):
+                    try:
+                        row_rec = [float(vals[ic]) for title, isim, idep, vals in chart_series]
+                    except ValueError as e:
+                        print('ValueError ' + str(e) + '\tmetric: ' + metric + '\ttime step: ' + str(ic + 1))
+                        break
+
+                    rows.append(row_rec)
+            else:
+                # the first column holds the time step at which each period or retained point begins
+                # ==================================================================================
+                min_col = 2
+                steps, reduced = reduce_series(matrix, params.chart_reduce, params.steps_per_year, params.chart_points)
+                rows = list([['Time step'] + titles])
+                for step, row_rec in zip(steps.tolist(), reduced.tolist()):
+                    rows.append([step] + [None if val != val else val for val in row_rec])
 
             for row in rows:
                 wrksht.append(row)
 
-            metric_chart = LineChart()
-            metric_chart.style = 13
-            if metric == 'SOILW':
-                metric_chart.title = metric + '\tdepth to bottom of SOM layer (cms): ' + water_dep_str
-                metric_chart.y_axis.title = 'mm'
+            # points kept by lttb are unevenly spaced so are plotted against their time steps
+            # ================================================================================
+            nrows = len(rows)
+            if params.chart_reduce == 'lttb':
+                metric_chart = ScatterChart()
+                metric_chart.scatterStyle = 'line'
+                xvalues = Reference(wrksht, min_col=1, min_row=2, max_row=nrows)
+                for icol in range(min_col, min_col + len(chart_series)):
+                    values = Reference(wrksht, min_col=icol, min_row=1, max_row=nrows)
+                    series = Series(values, xvalues, title_from_data=True)
+                    series.marker.symbol = 'none'
+                    metric_chart.series.append(series)
             else:
-                metric_chart.title = metric
-                metric_chart.y_axis.title = 'kgC/ha'
+                metric_chart = LineChart()
+                data = Reference(wrksht, min_col=min_col, min_row=1, max_col=min_col + len(chart_series) - 1,
+                                                                                                    max_row=nrows)
+                metric_chart.add_data(data, titles_from_data=True)
+                if min_col > 1:
+                    metric_chart.set_categories(Reference(wrksht, min_col=1, min_row=2, max_row=nrows))
+
+            metric_chart.style = 13
+            metric_chart.title = chart_title
+            metric_chart.y_axis.title = y_title
             metric_chart.x_axis.title = 'Time step'
             metric_chart.height = 10
             metric_chart.width = 20
 
-            nrows = len(rows)
-            data = Reference(wrksht, min_col=1, min_row=1, max_col=max_col_val, max_row=nrows)
-            metric_chart.add_data(data, titles_from_data=True)
-
-            # Style the lines
-            # ===============
-            sref = metric_chart.series[0]
-            sref.graphicalProperties.line.width = PRFRD_LINE_WDTH
-            sref.smooth = True
-
-            targ1 = metric_chart.series[1]
-            targ1.graphicalProperties.line.solidFill = "FF0000"
-            targ1.graphicalProperties.line.width = PRFRD_LINE_WDTH
-            targ1.smooth = True
-
-            if targ2_also_flag:
-                targ2 = metric_chart.series[2]
-                targ2.graphicalProperties.line.solidFill = "00AAAA"
-                targ2.graphicalProperties.line.width = PRFRD_LINE_WDTH
-                targ2.smooth = True  # Make the line smooth
+            # Style the lines - colour identifies the run and, for several soil water depths, dashes the depth
+            # ================================================================================================
+            for series, (title, isim, idep, vals) in zip(metric_chart.series, chart_series):
+                if SERIES_COLOURS[isim] is not None:
+                    series.graphicalProperties.line.solidFill = SERIES_COLOURS[isim]
+                series.graphicalProperties.line.width = PRFRD_LINE_WDTH
+                if idep > 0:
+                    series.graphicalProperties.line.dashStyle = DASH_STYLES[idep % len(DASH_STYLES)]
+                series.smooth = True  # Make the line smooth
 
             # now write to previously created sheet
             # =====================================
             wrkshts_group[group].add_chart(metric_chart, "A" + str(nrow_chart))
             nrow_chart += 20
 
+        params.report_progress(igroup + 1, ngroups, group)
+
+    if chart_backend != 'xlsx':
+        _write_chart_images(image_specs, image_groups, html_fname, params.max_workers)
+    elif params.chart_data_sheet:
+        _write_data_sheet(wrkbk, data_columns)
+
+    nparsed, nreused = run_cache.counts()
+    print('Parsed {} output files, reused {} previously parsed'.format(nparsed, nreused))
+
     if save_sheets_flag:
         try:
             wrkbk.save(charts_fname)
@@ -302,7 +436,93 @@ def generate_charts(form):
 
     return
 
-def _read_last_column(inp_dir, var_name, water_dep):
+def _chart_titles(metric, water_dep_str):
+    """
+    title and y axis title of the chart of a metric
+    """
+    if metric == 'SOILW':
+        return metric + '\tdepth to bottom of SOM layer (cms): ' + water_dep_str, 'mm'
+
+    return metric, 'kgC/ha'
+
+def _image_spec(image_fname, chart_title, y_title, steps, matrix, chart_series):
+    """
+    specification of an image of a chart for chart_image_funcs.render_chart, styled as for the Excel charts
+    """
+    series = []
+    for isrs, (title, isim, idep, vals) in enumerate(chart_series):
+        series.append(tuple([title, SERIES_COLOURS[isim], DASH_STYLES[idep % len(DASH_STYLES)], PRFRD_LINE_WDTH,
+                                                                                                matrix[:, isrs]]))
+
+    return {'fname': image_fname, 'title': chart_title, 'x_label': 'Time step', 'y_label': y_title,
+            'steps': steps, 'series': series}
+
+def _write_chart_images(image_specs, image_groups, html_fname, max_workers):
+    """
+    render the images, in parallel, then write a page showing them grouped as for the sheets of the workbook
+    """
+    image_fnames = render_charts(image_specs, max_workers)
+    nrendered = len([fname for fname in image_fnames if fname is not None])
+    print('Rendered {} of {} charts'.format(nrendered, len(image_specs)))
+
+    sections = {}
+    for group, image_fname in zip(image_groups, image_fnames):
+        sections.setdefault(group, []).append(image_fname)
+
+    dummy, title = split(html_fname)
+    if write_html_index(html_fname, title[:-len('.html')], list(sections.items())) is not None:
+        print('Created: ' + html_fname)
+
+    return
+
+def _write_data_sheet(wrkbk, data_columns):
+    """
+    full resolution values of every series charted, in a single sheet with a column for each series
+    """
+    wrksht = wrkbk.create_sheet()
+    wrksht.title = DATA_SHEET
+    wrksht.append(['Time step'] + [name for name, column in data_columns])
+
+    nsteps = max([len(column) for name, column in data_columns] + [0])
+    columns = [column.tolist() + [None]*(nsteps - len(column)) for name, column in data_columns]
+    for istep, row in enumerate(zip(*columns)):
+        wrksht.append([istep + 1] + [None if val != val else val for val in row])
+
+    print('Wrote {} time steps of {} series to sheet {}'.format(nsteps, len(data_columns), DATA_SHEET))
+
+    return
+
+def _float_column(vals):
+    """
+    values of a series as a float array, NaN where a value cannot be converted
+    """
+    if isinstance(vals, ndarray):
+        return vals.astype(float64)
+
+    values, valid = _float_values([str(val) for val in vals])
+
+    return where(valid, values, nan)
+
+def _chart_series(results, metric, idents, water_deps):
+    """
+    title, index of run, index of depth and values of each series of a chart, in order of run
+    soil water read from SOILW.OUT has a column for each depth and, if there are several depths, a series for each
+    """
+    chart_series = []
+    for isim, sim_name in enumerate(results):
+        result = results[sim_name][metric]
+        if getattr(result, 'ndim', 1) == 1:
+            chart_series.append(tuple([idents[isim], isim, 0, result]))
+        elif len(water_deps) == 1:
+            chart_series.append(tuple([idents[isim], isim, 0, result[:, 0]]))
+        else:
+            for idep, water_dep in enumerate(water_deps):
+                title = '{} {:g}cm'.format(idents[isim], water_dep)
+                chart_series.append(tuple([title, isim, idep, result[:, idep]]))
+
+    return chart_series
+
+def _read_last_column(inp_dir, var_name, water_dep, use_sidecars = False):
     # check file exists and read all lines
     # ====================================
     readings = []
@@ -312,10 +532,12 @@ def _read_last_column(inp_dir, var_name, water_dep):
         print('File ' + inp_fname + ' does not exist')
         return readings
 
-    fobj = open(inp_fname, 'r')
-    contents = fobj.read()
-    content_lines = contents.splitlines()
-    fobj.close()
+    if var_name == 'SOILW':
+        cum_layers = _read_soilw_layers(inp_dir, use_sidecars, _num_layers(water_dep))
+        return _avail_water(cum_layers, list([water_dep]))[:, 0].tolist()
+
+    if use_sidecars:
+        return _read_last_column_cols(open_columnar(inp_fname), var_name)
 
     # step through each line
     # ======================
@@ -324,56 +546,190 @@ def _read_last_column(inp_dir, var_name, water_dep):
     else:
         nhead_lines = 2
 
-    # get soil layer depth - maximum depth is 300cms
-    # ====================
-    if var_name == 'SOILW':
-        ncols = int(water_dep / 5.0)
-        ncols = min(60, max(1, ncols))
-        end_col = ncols + 3
+    # only the leading atoms, which identify embedded headers, and the atoms required are split from each line
+    # ==========================================================================================================
+    if var_name == 'TOTC':
+        projection = last_column(nkeys = 2)
+    else:
+        projection = last_column(nkeys = 1)
 
     # main loop
     # =========
     read_next_rec_flag = True
-    for nline, rec in enumerate(content_lines):
-        if nline < nhead_lines:
-            continue
+    with open(inp_fname, 'r') as fobj:
+        for keys, atoms in iter_projected_rows(fobj, projection, nhead_lines):
 
-        rec_atoms = rec.split()
+            # blank lines are skipped, as for the sidecars
+            if keys[0] == '':
+                continue
 
-        # skip later version additional imbedded header records for TOTC only
-        # this stanza is ignored in output from earlier versions
-        if var_name == 'TOTC':
-            if rec_atoms[0] == 'Inert' and rec_atoms[1] == 'Organic':
-                read_next_rec_flag = False
+            # skip later version additional imbedded header records for TOTC only
+            # this stanza is ignored in output from earlier versions
+            if var_name == 'TOTC':
+                if keys[0] == 'Inert' and keys[1] == 'Organic':
+                    read_next_rec_flag = False
 
-            elif rec_atoms[0] == 'Total' and rec_atoms[1] == 'soil':
-                read_next_rec_flag = True
+                elif keys[0] == 'Total' and keys[1] == 'soil':
+                    read_next_rec_flag = True
 
-            elif read_next_rec_flag:
-                readings.append(rec_atoms[-1])
-                read_next_rec_flag = True
+                elif read_next_rec_flag:
+                    readings.append(atoms[-1])
+                    read_next_rec_flag = True
+
+            else:
+                # neither SOILW or TOTC
+                # =====================
+                readings.append(atoms[-1])
+
+    return readings
+
+
+def _nth_tokens(col_file, indx):
+    """
+    token at position indx on each line, or an empty string where the line is too short
+    """
+    has_token = col_file.row_lens > indx
+    tokens = col_file.columns['tokens'][col_file.row_starts[has_token] + indx].astype(str)
+    nth_tokens = zeros(col_file.num_lines, dtype=tokens.dtype)
+    nth_tokens[has_token] = tokens
+
+    return nth_tokens
+
+def _data_lines_cols(col_file, var_name):
+    """
+    indices of the lines of a columnar sidecar which hold data, excluding header and blank lines
+    the rules are those by which out_index_funcs classifies the lines of a file
+    """
+    kinds = line_kinds(var_name, col_file.row_lens, lambda indx: _nth_tokens(col_file, indx))
+
+    return (kinds == LINE_DATA).nonzero()[0]
+
+def _read_last_column_cols(col_file, var_name):
+    """
+    equivalent of the main loop of _read_last_column using a columnar sidecar
+    values which cannot be converted are returned as the original strings
+    """
+    data_lines = _data_lines_cols(col_file, var_name)
+    starts = col_file.row_starts[data_lines]
+    lens = col_file.row_lens[data_lines]
+    values = col_file.columns['values']
 
-        elif var_name == 'SOILW':
-            if rec_atoms[0] == 'Available' and rec_atoms[2] == 'at':
+    last_indx = starts + lens - 1
+    readings = values[last_indx].tolist()
+    for indx in (~col_file.columns['valid'][last_indx]).nonzero()[0]:
+        token = col_file.columns['tokens'][last_indx[indx]]
+        readings[indx] = token.decode() if isinstance(token, bytes) else str(token)
+
+    return readings
+
+def _read_soilw_layers(inp_dir, use_sidecars = False, nlayers = MAX_LAYERS):
+    """
+    available water of the top nlayers of SOILW.OUT accumulated down the profile as a (time step x layer) array,
+    so that the water to any depth is a single column - missing layers add nothing and values which cannot be
+    converted are NaN
+    """
+    inp_fname = join(inp_dir, 'SOILW.OUT')
+    if not isfile(inp_fname):
+        print('File ' + inp_fname + ' does not exist')
+        return zeros((0, nlayers), dtype=float64)
+
+    if use_sidecars:
+        return _read_soilw_layers_cols(open_columnar(inp_fname), nlayers)
+
+    # only the leading atoms, which identify embedded headers, and the layers are split from each line
+    # ==================================================================================================
+    projection = layer_range(FIRST_LAYER_COL, nlayers, nkeys = 3)
+    rows = []
+    read_next_rec_flag = True
+    with open(inp_fname, 'r') as fobj:
+        for keys, atoms in iter_projected_rows(fobj, projection, nhead_lines = 2):
+            if keys[0] == '':
+                continue
+
+            if keys[0] == 'Available' and keys[2] == 'at':
                 read_next_rec_flag = False
 
-            elif rec_atoms[0] == 'Available' and rec_atoms[2] == '(mm)':
+            elif keys[0] == 'Available' and keys[2] == '(mm)':
                 read_next_rec_flag = True
 
             elif read_next_rec_flag:
-                avail_water = 0.0
-                for val in rec_atoms[3:end_col]:
-                    avail_water += float(val)
-                readings.append(avail_water)
-                read_next_rec_flag = True
+                rows.append(atoms)
 
-        else:
-            # neither SOILW or TOTC
-            # =====================
-            readings.append(rec_atoms[-1])
+    row_lens = fromiter(map(len, rows), dtype=int64, count=len(rows))
+    values, valid = _float_values(list(chain.from_iterable(rows)))
 
-    return readings
+    return _accumulate_layers(row_lens, where(valid, values, nan), nlayers)
+
+def _read_soilw_layers_cols(col_file, nlayers = MAX_LAYERS):
+    """
+    as _read_soilw_layers using a columnar sidecar
+    """
+    data_lines = _data_lines_cols(col_file, 'SOILW')
+    starts = col_file.row_starts[data_lines] + FIRST_LAYER_COL
+    row_lens = (col_file.row_lens[data_lines] - FIRST_LAYER_COL).clip(0, nlayers).astype(int64)
+
+    indx = repeat(starts - (cumsum(row_lens) - row_lens), row_lens) + arange(row_lens.sum())
+    values = where(col_file.columns['valid'][indx], col_file.columns['values'][indx], nan)
+
+    return _accumulate_layers(row_lens, values, nlayers)
+
+def _accumulate_layers(row_lens, values, nlayers):
+    """
+    layers are added in order, as when summed line by line - no line has more than nlayers values
+    """
+    nrows = len(row_lens)
+    if len(values) == nrows*nlayers:
+        return values.reshape(nrows, nlayers).cumsum(axis=1)
+
+    atom_rows = repeat(arange(nrows), row_lens)
+    atom_cols = arange(len(values)) - repeat(cumsum(row_lens) - row_lens, row_lens)
+
+    layers = zeros((nrows, nlayers), dtype=float64)
+    layers[atom_rows, atom_cols] = values
+
+    return layers.cumsum(axis=1)
 
+def _num_layers(water_dep):
+    """
+    number of layers above a depth [cm] - maximum depth is 300cms
+    """
+    return min(MAX_LAYERS, max(1, int(water_dep / LAYER_DEPTH)))
+
+def _avail_water(cum_layers, water_deps):
+    """
+    available water to each depth [cm] as a (time step x depth) array
+    """
+    ilayers = [_num_layers(water_dep) - 1 for water_dep in water_deps]
+
+    return cum_layers[:, ilayers]
+
+def _water_depths(water_dep_str):
+    """
+    depths [cm] from a string such as '50' or '30, 50, 100' - returns None if any depth is not a number
+    """
+    try:
+        water_deps = [float(water_dep) for water_dep in water_dep_str.replace(',', ' ').split()]
+    except ValueError:
+        water_deps = []
+
+    if len(water_deps) == 0:
+        print(ERROR_STR + 'water depth must be a number or a list of numbers, got: ' + water_dep_str)
+        return None
+
+    return water_deps
+
+def _float_values(tokens):
+    """
+    convert a list of tokens - returns the values and a mask which is False where the conversion failed
+    """
+    ntokens = len(tokens)
+    try:
+        values = fromiter(map(float, tokens), dtype=float64, count=ntokens)
+        valid = ones(ntokens, dtype=bool)
+    except ValueError:
+        values, valid = parse_float_tokens(array(tokens, dtype=str))
+
+    return values, valid
 
 def _read_site_file(inp_dir):
     # check file exists and read all lines
@@ -393,21 +749,16 @@ def _read_site_file(inp_dir):
     return soil_depth
 
 
-class EcosseDialect(csv.excel):
-    """Dialect class for reading in ECOSSE output files with the csv module."""
-    delimiter = ' '
-    skipinitialspace = True
-
-
-def _get_out_file_contents(folder, outfile='SUMMARY.OUT'):
+def _get_out_file_contents(folder, outfile='SUMMARY.OUT', use_sidecars=False, names=None):
     """
-    reads ECOSSE summary results file as a dictionary.
+    reads ECOSSE summary results file as a dictionary of float64 arrays keyed by column name
 
     Arguments:
     folder name for this grid cell's simulation outputs
 
-    Returns:
-    Pandas dataframe of the results with date index
+    values which cannot be converted are set to -999.0 - the values are converted as a single array
+    rather than one by one, or are taken from the sidecar of the file if these are enabled
+    if names is supplied only those columns are split from each line and converted
     """
     func_name = __prog__ + ' _get_out_file_contents'
 
@@ -416,40 +767,118 @@ def _get_out_file_contents(folder, outfile='SUMMARY.OUT'):
         print('File {} does not exist - function {}'.format(path, func_name))
         return None
 
-    summary = {}
     nline = 0
-    with open(path, 'r') as f:
-        reader = csv.reader(f, dialect=EcosseDialect)
-        if outfile == 'SUMMARY.OUT':
-            nline += 1
-            next(reader)  # Skip the units description line
+    if outfile == 'SUMMARY.OUT':
+        nline += 1  # Skip the units description line
 
+    if use_sidecars:
+        atoms = _summary_atoms_cols(open_columnar(path), nline, names)
+    else:
+        atoms = _summary_atoms(path, nline, names)
+
+    if atoms is None:
+        print('Error {} on line {} reading {} will skip'.format('', nline + 1, outfile))
+        return None
+
+    columns = atoms['columns']
+    ncols = len(columns)
+
+    # locate the row and column of each value
+    # =======================================
+    row_lens = atoms['row_lens']
+    nrows = len(row_lens)
+    nvals = len(atoms['values'])
+    atom_rows = repeat(arange(nrows), row_lens)
+    atom_cols = arange(nvals) - repeat(cumsum(row_lens) - row_lens, row_lens)
+
+    extra_indx = (atom_cols >= ncols).nonzero()[0]
+    if len(extra_indx) > 0:
+        print(ERROR_STR + '{} values beyond the {} columns of {} will be ignored'
+                                                                    .format(len(extra_indx), ncols, path))
+
+    # report the first few bad values in the order in which they occur
+    # ================================================================
+    max_bad_values = 10
+    bad_indx = (~atoms['valid'] & (atom_cols < ncols)).nonzero()[0]
+    nbad_values = len(bad_indx)
+    for indx in bad_indx[:max_bad_values - 1]:
+        token = atoms['tokens'][indx]
+        if isinstance(token, bytes):
+            token = token.decode()
         try:
-            columns = next(reader)
-        except StopIteration as e:
-            print('Error {} on line {} reading {} will skip'.format(e, nline + 1, outfile))
-            return None
-
-        for column in columns:
-            summary[column] = []
-
-        # step through each row
-        # =====================
-        nbad_values = 0
-        max_bad_values = 10
-        for irow, row in enumerate(reader):
-            for icol, val in enumerate(row):
-                try:
-                    float(val)
-                except ValueError as e:
-                    nbad_values += 1
-                    if nbad_values < max_bad_values:
-                        print('Error {} on line {} will skip'.format(e, irow + 1))
-                    val = -999.0
-
-                summary[columns[icol]].append(float(val))
-
-        print('Finished reading {} with {} bad values\n'.format(path, nbad_values))
-        QApplication.processEvents()
+            float(token)
+        except ValueError as e:
+            print('Error {} on line {} will skip'.format(e, atom_rows[indx] + 1))
+
+    vals = where(atoms['valid'], atoms['values'], -999.0)
+
+    # the values of each column - rows are normally complete so the columns are views of a single matrix
+    # ====================================================================================================
+    summary = {}
+    if nvals == nrows*ncols:
+        matrix = vals.reshape(nrows, ncols)
+        for icol, column in enumerate(columns):
+            summary[column] = matrix[:, icol]
+    else:
+        for icol, column in enumerate(columns):
+            summary[column] = vals[atom_cols == icol]
+
+    print('Finished reading {} with {} bad values\n'.format(path, nbad_values))
+    process_events()
 
     return summary
+
+def _summary_atoms(path, nline, names = None):
+    """
+    column names from line nline of a text file then the atoms of the following lines with the number on each line
+    and their values - returns None if the file has no line nline
+    """
+    with open(path, 'r') as fobj:
+        lines = fobj.readlines()
+
+    if len(lines) <= nline:
+        return None
+
+    columns = lines[nline].split()
+    if names is None:
+        rows = [line.split() for line in lines[nline + 1:]]
+    else:
+        projection = named_columns(columns, names)
+        columns = [columns[icol] for icol in projection.columns]
+        rows = [projection.project(line)[1] for line in lines[nline + 1:]]
+
+    tokens = list(chain.from_iterable(rows))
+    values, valid = _float_values(tokens)
+
+    return {'columns': columns, 'row_lens': fromiter(map(len, rows), dtype=int64, count=len(rows)),
+            'tokens': tokens, 'values': values, 'valid': valid}
+
+def _summary_atoms_cols(col_file, nline, names = None):
+    """
+    as _summary_atoms but taken from an out_sidecar_funcs.ColumnarFile
+    """
+    if col_file.num_lines <= nline:
+        return None
+
+    ilines = arange(nline + 1, col_file.num_lines)
+    row_lens = col_file.row_lens[ilines].astype(int64)
+    columns = col_file.line(nline).split()
+    if names is None:
+        atoms = col_file.select_rows(ilines)
+    else:
+        # gather only the atoms of the named columns
+        # ===========================================
+        keep_cols = named_columns(columns, names).columns
+        columns = [columns[icol] for icol in keep_cols]
+        row_starts = col_file.row_starts[ilines]
+        atom_rows = repeat(arange(len(ilines)), row_lens)
+        atom_cols = arange(row_lens.sum()) - repeat(cumsum(row_lens) - row_lens, row_lens)
+        keep = isin(atom_cols, keep_cols)
+        indx = row_starts[atom_rows[keep]] + atom_cols[keep]
+        atoms = {key: col_file.columns[key][indx] for key in col_file.columns}
+        row_lens = bincount(atom_rows[keep], minlength = len(ilines)).astype(int64)
+
+    atoms['columns'] = columns
+    atoms['row_lens'] = row_lens
+
+    return atoms
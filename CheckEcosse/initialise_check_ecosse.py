@@ -16,6 +16,7 @@ from os.path import normpath, join, exists, lexists, split
 from os import getcwd, makedirs, name as name_os
 
 from analyse_ecosse_output import format_out_files
+from check_params import params_from_form
 import json
 from time import sleep
 
@@ -70,6 +71,41 @@ def _read_setup_file(chk_ecsse_str):
             exit(0)
     settings['chk_ecsse_str'] = chk_ecsse_str
 
+    # optional settings
+    # =================
+    if 'max_workers' not in settings:
+        settings['max_workers'] = 1     # number of processes used when comparing .OUT files
+    if 'cache_max_mb' not in settings:
+        settings['cache_max_mb'] = 0    # size limit of comparison cache in results directory, 0 to disable
+    if 'use_sidecars' not in settings:
+        settings['use_sidecars'] = False    # parse .OUT files once into columnar sidecars beside each file
+    if 'metrics_groups' not in settings:
+        settings['metrics_groups'] = None   # group names each with a list of metrics to chart, None for defaults
+    if 'chart_reduce' not in settings:
+        settings['chart_reduce'] = 'none'   # or monthly_mean, monthly_sum, annual_mean, annual_sum or lttb
+    if 'chart_points' not in settings:
+        settings['chart_points'] = 2000     # number of points to which charts are downsampled by lttb
+    if 'steps_per_year' not in settings:
+        settings['steps_per_year'] = 365    # time steps in each year of the .OUT files
+    if 'chart_data_sheet' not in settings:
+        settings['chart_data_sheet'] = False    # write values at full resolution to a single sheet
+    if 'chart_backend' not in settings:
+        settings['chart_backend'] = 'xlsx'  # or png or svg to render charts as images, requires matplotlib
+    if 'scan_recursive' not in settings:
+        settings['scan_recursive'] = False  # scan all files beneath the reference directory
+    if 'scan_format' not in settings:
+        settings['scan_format'] = 'xlsx'    # or csv for trees with many files
+    if 'scan_max_mb' not in settings:
+        settings['scan_max_mb'] = 256       # files larger than this are sampled by the recursive scan
+    if 'split_mb' not in settings:
+        settings['split_mb'] = 64           # larger files are compared in ranges of rows, 0 disables
+    if 'time_window' not in settings:
+        settings['time_window'] = None      # first and last year or time step compared, e.g. [1, 10]
+    if 'window_units' not in settings:
+        settings['window_units'] = 'years'  # or steps
+    if 'sample_every' not in settings:
+        settings['sample_every'] = 1        # compare every k-th time step only
+
     # make sure directories exist for configuration file
     # ==================================================
     config_dir = settings['config_dir']
@@ -80,6 +116,7 @@ def _read_setup_file(chk_ecsse_str):
     # ===============
     print('Resource locations:')
     print('\tconfiguration file: ' + config_dir)
+    print('\tworker processes: {}'.format(settings['max_workers']))
     print('')
 
     return settings
@@ -92,7 +129,10 @@ def _write_default_setup_file(setup_file):
     _default_setup = {
         'setup': {
             'config_dir': join(root_dir, 'config'),
-            'fname_png': join(root_dir, 'Images', 'Tree_of_life.PNG')
+            'fname_png': join(root_dir, 'Images', 'Tree_of_life.PNG'),
+            'max_workers': 1,
+            'cache_max_mb': 0,
+            'use_sidecars': False
         }
     }
     # create setup file
@@ -181,8 +221,9 @@ def read_config_file(form, check_attribs_only=False):
         print('Results directory ' + rslts_dir + ' does not exist')
 
     form.w_water_dep.setText(str(config[grp]['water_dep']))
-    form.w_lbl05.setText(format_out_files(form))
-    form.w_lbl07.setText(format_out_files(form, target_flag='targ2'))
+    params = params_from_form(form)
+    form.w_lbl05.setText(format_out_files(params))
+    form.w_lbl07.setText(format_out_files(params, target_flag='targ2'))
 
     return
 
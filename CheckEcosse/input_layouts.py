@@ -0,0 +1,146 @@
+#-------------------------------------------------------------------------------
+# Name:        input_layouts.py
+# Purpose:     declarative layouts of the ECOSSE input files checked for compliance
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'input_layouts.py'
+__version__ = '0.0.1'
+
+# Version history
+# ---------------
+# 0.0.1  Wrote.
+#
+# a layout is a list of items, each one of:
+#   block    one fixed width value of type I or F on each line; values may be named for use as counts by later items
+#   weather  names of the met files, one line for each year
+#   skip     lines which are not checked
+#   repeat   items repeated for a count, the number of each repeat, from 1, may be used in the names of blocks
+#   version  one of two lists of items, chosen by whether a marker appears in the next few lines
+# counts are either numbers or names of values read from earlier blocks
+#
+# layouts are compiled once, when this module is imported, and checked by analyse_ltd_data_misc_fns.check_layout
+# in a single pass through the lines of a file
+#
+FIELD_WIDTH = 10        # each value is read from the first 10 characters of its line, as with Fortran format F10.0
+CONVERTERS = {'I': int, 'F': float}
+
+def block(name, types, names = None, times = 1):
+    """
+    types is a string of I and F, repeated times, a number or the name of a count
+    names is a dictionary of names keyed by the position of a value within the block
+    """
+    return tuple(['block', name, types, names or {}, times])
+
+def weather(count):
+    """
+    C
+    """
+    return tuple(['weather', count])
+
+def skip(count, mess):
+    """
+    mess is printed with the number of lines skipped
+    """
+    return tuple(['skip', count, mess])
+
+def repeat(var, count, items):
+    """
+    C
+    """
+    return tuple(['repeat', var, count, items])
+
+def version(marker, nlines, marked_items, unmarked_items):
+    """
+    marked_items are used if marker, in any case, is found in the next nlines lines
+    """
+    return tuple(['version', marker, nlines, marked_items, unmarked_items])
+
+'''
+management.txt, site specific mode - first 16 lines:
+        NSOILJ, IDRAINJ, IROCKJ, LCROP, PREYLD, ATM, IDATEFC, TIMESTEP, MODTYPE,
+ &                   NYEARS, ISTHARV, ISTYR, ILAST_TS, FIXEND,LAT,WTABLE
+30    FORMAT(4(I10/),2(F10.0/),8(I10/),(F10.0/),F10.0)
+'''
+MANAGEMENT_LAYOUT = list([
+    block('first 16 lines', 'IIIIFFIIIIIIIIFF', {9: 'nyears'}),
+    weather('nyears'),
+    block('Number of crops', 'I', {0: 'ncrops'}),
+    repeat('ncrop', 'ncrops', list([
+        block('crop {ncrop}', 'IIFIFIII', {6: 'nfert_apps', 7: 'norgm_apps'}),
+        repeat('nfert', 'nfert_apps', list([block('crop {ncrop}\tfertiliser {nfert}', 'FIFFFII')])),
+        repeat('norgm', 'norgm_apps', list([block('crop {ncrop}\tmanure {norgm}', 'FIII')]))
+    ])),
+    block('Number of cultivations', 'I', {0: 'ncults'}),
+    repeat('ncult', 'ncults', list([block('cultivation {ncult}', 'IIF')]))
+])
+
+# input.txt, limited data mode - V6.3 and later have a max standing line
+# ======================================================================
+LIMITED_DATA_LAYOUT = list([
+    block('first 2 lines: mode of equilibrium run and number of soil layers (max 10)', 'FI', {1: 'nlayers'}),
+    block('depths to bottom of SOM layers', 'F', times = 'nlayers'),
+    # carbon content, bulk density [g/cm3], pH, % clay, % silt and % sand of each layer for each of 6 land uses
+    repeat('lu', 6, list([
+        repeat('ilyr', 'nlayers', list([block('soil definition for layer: {ilyr}\tlanduse: {lu}', 'FFFFFF')]))
+    ])),
+    skip(6, 'skipped {} obsolete lines'),
+    block('Long term average monthly precipitation [mm] and temperature [degC]', 'F', times = 24),
+    version('max standing', 4,
+            list([block('Latitude, water table depth, max standing, Drainage class', 'FFFI')]),
+            list([block('Latitude, water table depth, Drainage class', 'FFI')])),
+    skip(4, 'skipped {} obsolete lines'),
+    block('Number of growing seasons', 'I', {0: 'ngrow_seasons'}),
+    skip('ngrow_seasons', 'skipped {} growing seasons'),
+    weather('ngrow_seasons')
+])
+
+def _is_plain_block(item):
+    """
+    compiled block of fixed length whose values are not needed by later items
+    """
+    return item[0] == 'block' and item[4] == 1 and len(item[5]) == 0 and not item[1].startswith('Number of ')
+
+def compile_layout(items):
+    """
+    layout as a tuple of items ready to be checked: the types of each block become a tuple of the functions which
+    convert each value, expanded when the block has a fixed number of repeats; a repeat of such blocks, none of
+    whose values are needed later, becomes a blocks item whose lines may be converted in one step
+    """
+    compiled = []
+    for item in items:
+        kind = item[0]
+        if kind == 'block':
+            dummy, name, types, names, times = item
+            if len(types.strip(''.join(CONVERTERS))) > 0:
+                raise ValueError('block {} has types other than I and F: {}'.format(name, types))
+
+            converters = tuple(CONVERTERS[val_type] for val_type in types)
+            if isinstance(times, int):
+                converters, times = converters*times, 1
+            compiled.append(tuple([kind, name, '{' in name, converters, times, tuple(names.items())]))
+
+        elif kind == 'repeat':
+            dummy, var, count, sub_items = item
+            sub_items = compile_layout(sub_items)
+            if all(_is_plain_block(sub_item) for sub_item in sub_items):
+                converters = tuple(converter for sub_item in sub_items for converter in sub_item[3])
+                compiled.append(tuple(['blocks', var, count, sub_items, converters]))
+            else:
+                compiled.append(tuple([kind, var, count, sub_items]))
+
+        elif kind == 'version':
+            dummy, marker, nlines, marked_items, unmarked_items = item
+            compiled.append(tuple([kind, marker.lower(), nlines, compile_layout(marked_items),
+                                                                                compile_layout(unmarked_items)]))
+        elif kind in ('weather', 'skip'):
+            compiled.append(item)
+        else:
+            raise ValueError('unknown layout item: {}'.format(kind))
+
+    return tuple(compiled)
+
+LAYOUTS = {'management': compile_layout(MANAGEMENT_LAYOUT), 'limited data': compile_layout(LIMITED_DATA_LAYOUT)}
@@ -0,0 +1,94 @@
+#-------------------------------------------------------------------------------
+# Name:        loaded_run.py
+# Purpose:     hold the parsed output files of simulation runs so that each file is parsed at most once
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'loaded_run.py'
+__version__ = '0.0.2'
+
+# Version history
+# ---------------
+# 0.0.1  Wrote.
+# 0.0.2  Removed columnar, which had no callers - files are loaded by the loader passed to load
+#
+# contents are remembered against the function which parsed them, its arguments and the size and modification
+# time of the file, so that a file which is rewritten during the lifetime of the cache is parsed again
+#
+from os import stat
+from os.path import abspath, join, normcase
+
+def _file_signature(fname):
+    """
+    size and modification time of a file or None if it does not exist
+    """
+    try:
+        fstat = stat(fname)
+    except OSError:
+        return None
+
+    return tuple([fstat.st_size, fstat.st_mtime_ns])
+
+class LoadedRun(object,):
+    """
+    parsed output files of one simulation directory
+    """
+    def __init__(self, dir_name):
+        """
+        C
+        """
+        self.dir_name = dir_name
+        self.nparsed = 0
+        self.nreused = 0
+        self._contents = {}
+
+    def load(self, fname, loader, *args):
+        """
+        return loader(*args), the parsed contents of file fname of this run, parsing only if the
+        file has not been parsed by this loader with these arguments or has since changed
+        """
+        signature = _file_signature(join(self.dir_name, fname))
+        key = tuple([loader]) + args
+        entry = self._contents.get(key)
+        if entry is not None and entry[0] == signature:
+            self.nreused += 1
+            return entry[1]
+
+        contents = loader(*args)
+        self._contents[key] = tuple([signature, contents])
+        self.nparsed += 1
+
+        return contents
+
+class RunCache(object,):
+    """
+    loaded runs keyed by directory - one cache is normally used for each invocation of an analysis
+    but may be passed to several analyses
+    """
+    def __init__(self):
+        """
+        C
+        """
+        self.runs = {}
+
+    def run(self, dir_name):
+        """
+        C
+        """
+        key = normcase(abspath(dir_name))
+        if key not in self.runs:
+            self.runs[key] = LoadedRun(dir_name)
+
+        return self.runs[key]
+
+    def counts(self):
+        """
+        numbers of files parsed and of parses avoided
+        """
+        nparsed = sum(run.nparsed for run in self.runs.values())
+        nreused = sum(run.nreused for run in self.runs.values())
+
+        return nparsed, nreused
@@ -0,0 +1,170 @@
+#-------------------------------------------------------------------------------
+# Name:        out_file_funcs.py
+# Purpose:     read Ecosse output files once, tokenising each row and recording the shape of the file
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'out_file_funcs.py'
+__version__ = '0.0.2'
+
+# Version history
+# ---------------
+# 0.0.1  Wrote.
+# 0.0.2  Added Projection so that callers which need only a few atoms of each line need not split all of it
+#        Added text_lines
+#
+from io import BytesIO, TextIOWrapper
+
+def iter_token_rows(fobj):
+    """
+    stream lines from an open text file, yielding each line with its whitespace delimited atoms
+    """
+    for line in fobj:
+        line = line.rstrip('\n')
+        yield line, line.split()
+
+def read_raw(fname):
+    """
+    contents of a file as bytes - permits a byte comparison before the text is tokenised
+    """
+    with open(fname, 'rb') as fobj:
+        raw = fobj.read()
+
+    return raw
+
+def text_lines(raw):
+    """
+    lines of a file held as bytes, without their newlines, as yielded by iter_token_rows
+    """
+    with TextIOWrapper(BytesIO(raw)) as fobj:
+        lines = fobj.read().split('\n')
+
+    if lines[-1] == '':
+        lines.pop()
+
+    return lines
+
+class TokenisedFile(object,):
+    """
+    lines and atoms of a text file together with its shape, gathered in a single pass
+         num_lines, num_words and max_len_row are as previously reported by get_num_words
+    """
+    def __init__(self, fname, raw = None, keep_rows = True):
+        """
+        if raw is supplied then the file has already been read as bytes and is not read again
+        """
+        self.fname = fname
+        self.lines = []
+        self.rows = []
+        self.num_lines = 0
+        self.num_words = 0
+        self.max_len_row = 0
+
+        if raw is None:
+            with open(fname, 'r') as fobj:
+                self._consume(fobj, keep_rows)
+        else:
+            with TextIOWrapper(BytesIO(raw)) as fobj:
+                self._consume(fobj, keep_rows)
+
+    def _consume(self, fobj, keep_rows):
+        """
+        C
+        """
+        num_lines = 0
+        num_words = 0
+        max_len_row = 0
+        for line, atoms in iter_token_rows(fobj):
+            len_row = len(atoms)
+            num_lines += 1
+            num_words += len_row
+            if len_row > max_len_row:
+                max_len_row = len_row
+
+            if keep_rows:
+                self.lines.append(line)
+                self.rows.append(atoms)
+
+        self.num_lines = num_lines
+        self.num_words = num_words
+        self.max_len_row = max_len_row
+
+    def shape(self):
+        """
+        same order as get_num_words
+        """
+        return list([self.num_lines, self.max_len_row, self.num_words])
+
+class Projection(object,):
+    """
+    the atoms of each line which a caller needs - the remainder of the line is neither split nor converted
+         nkeys:    number of leading atoms required to recognise embedded headers
+         last:     the last atom of the line is required
+         columns:  zero based indices, in ascending order, of the atoms required
+         first_col, end_col: range of atoms required, for example the soil layers of SOILW.OUT
+    """
+    def __init__(self, nkeys = 0, last = False, columns = None, first_col = 0, end_col = 0):
+        """
+        C
+        """
+        self.nkeys = nkeys
+        self.last = last
+        self.columns = columns
+        self.first_col = first_col
+        self.end_col = end_col
+
+        self.nlead = max(nkeys, end_col)
+        if columns is not None and len(columns) > 0:
+            self.nlead = max(self.nlead, columns[-1] + 1)
+
+    def project(self, line):
+        """
+        leading atoms, padded with empty strings to nkeys, and the required atoms of the line
+        """
+        if self.nlead > 0:
+            leading = line.split(None, self.nlead)[:self.nlead]
+        else:
+            leading = []
+
+        keys = leading[:self.nkeys]
+        if len(keys) < self.nkeys:
+            keys += ['']*(self.nkeys - len(keys))
+
+        if self.last:
+            atoms = line.rsplit(None, 1)[-1:]
+        elif self.columns is not None:
+            atoms = [leading[icol] for icol in self.columns if icol < len(leading)]
+        else:
+            atoms = leading[self.first_col:self.end_col]
+
+        return keys, atoms
+
+def last_column(nkeys = 0):
+    """
+    C
+    """
+    return Projection(nkeys = nkeys, last = True)
+
+def named_columns(header_atoms, names):
+    """
+    projection of those columns of a file whose names in the header are in names
+    """
+    return Projection(columns = [icol for icol, name in enumerate(header_atoms) if name in names])
+
+def layer_range(first_col, nlayers, nkeys = 0):
+    """
+    C
+    """
+    return Projection(nkeys = nkeys, first_col = first_col, end_col = first_col + nlayers)
+
+def iter_projected_rows(fobj, projection, nhead_lines = 0):
+    """
+    stream the leading keys and projected atoms of each line of an open text file after the header lines
+    """
+    for nline, line in enumerate(fobj):
+        if nline < nhead_lines:
+            continue
+        yield projection.project(line)
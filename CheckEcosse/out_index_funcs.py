@@ -0,0 +1,275 @@
+#-------------------------------------------------------------------------------
+# Name:        out_index_funcs.py
+# Purpose:     index of the lines of an Ecosse output file, optionally persisted beside the file, for random access to its rows
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'out_index_funcs.py'
+__version__ = '0.0.1'
+
+# Version history
+# ---------------
+# 0.0.1  Wrote.
+#
+# the index of a file such as E:\run\SOILW.OUT is E:\run\.check_ecosse_index\SOILW.OUT.npz which holds the byte
+# offset of the start of each line followed by the length of the file, the number of atoms on each line and the
+# kind of each line: file header, data, blank or embedded header, the latter including the lines which follow an
+# embedded header record, such as Inert Organic in TOTC.OUT, until reading resumes
+#
+# the index is built from the bytes of the file without splitting every line, so is much quicker to build than a
+# columnar sidecar; lines are read as text using universal newlines, as by out_file_funcs
+#
+# as with sidecars, callers only save and reuse an index, using open_line_index, when sidecars are enabled, so that
+# run directories are not written to by default; otherwise the index is built in memory using build_line_index
+#
+from os import getpid, makedirs, replace, stat
+from os.path import abspath, basename, isdir, join, split, splitext
+
+from numpy import append, arange, array, bincount, concatenate, cumsum, frombuffer, full, load, maximum, \
+                                                                searchsorted, savez, where, int32, int64, uint8
+from out_file_funcs import read_raw, text_lines
+
+INDEX_DIR = '.check_ecosse_index'
+INDEX_VERSION = 1       # increment whenever the content of an index changes
+LINE_HEAD = 0
+LINE_DATA = 1
+LINE_BLANK = 2
+LINE_EMBEDDED = 3
+CONTROL_CHARS = bytes(list(range(9)) + list(range(14, 28)))    # below space, but not split on by str.split
+CR = ord('\r')
+LF = ord('\n')
+ERROR_STR = '*** Error *** '
+
+def index_fname(fname):
+    """
+    C
+    """
+    fpath, fname_short = split(abspath(fname))
+
+    return join(fpath, INDEX_DIR, fname_short + '.npz')
+
+def num_head_lines(var_name):
+    """
+    number of header lines at the start of an output file, as when its values are charted
+    """
+    if var_name == 'TOTC' or var_name == 'TOTN':
+        return 5
+
+    return 2
+
+def line_offsets(raw):
+    """
+    byte offset of the start of each line followed by the length of the file, consistent with the
+    universal newlines used when the file is read as text
+    """
+    chars = frombuffer(raw, dtype=uint8)
+    is_cr = chars == CR
+    is_cr[:-1] &= chars[1:] != LF
+    line_ends = ((chars == LF) | is_cr).nonzero()[0] + 1
+
+    offsets = concatenate(([0], line_ends))
+    if offsets[-1] != len(raw):
+        offsets = append(offsets, len(raw))
+
+    return offsets.astype(int64)
+
+def line_kinds(var_name, row_lens, nth_tokens):
+    """
+    kind of each line of an output file - nth_tokens is a function returning the token at a position on each line,
+    or an empty string where the line is too short, and is only called for files with embedded headers
+    embedded header records switch reading off until the record which follows them
+    """
+    num_lines = len(row_lens)
+    is_body = arange(num_lines) >= num_head_lines(var_name)
+    kinds = full(num_lines, LINE_DATA, dtype=uint8)
+    kinds[row_lens == 0] = LINE_BLANK
+
+    if var_name == 'TOTC' or var_name == 'SOILW':
+        tok0 = nth_tokens(0)
+        if var_name == 'TOTC':
+            tok1 = nth_tokens(1)
+            stop_recs = (tok0 == 'Inert') & (tok1 == 'Organic')
+            start_recs = ~stop_recs & (tok0 == 'Total') & (tok1 == 'soil')
+        else:
+            tok2 = nth_tokens(2)
+            stop_recs = (tok0 == 'Available') & (tok2 == 'at')
+            start_recs = ~stop_recs & (tok0 == 'Available') & (tok2 == '(mm)')
+
+        switches = is_body & (stop_recs | start_recs)
+        last_switch = maximum.accumulate(where(switches, arange(num_lines), -1))
+        read_flags = (last_switch < 0) | start_recs[last_switch]
+        kinds[is_body & (switches | ~read_flags) & (row_lens > 0)] = LINE_EMBEDDED
+
+    kinds[~is_body] = LINE_HEAD
+
+    return kinds
+
+def read_lines(fname, start, end):
+    """
+    text of the lines held between two byte offsets of a file, without their newlines
+    """
+    with open(fname, 'rb') as fobj:
+        fobj.seek(start)
+        chunk = fobj.read(end - start)
+
+    return text_lines(chunk)
+
+class LineIndex(object,):
+    """
+    byte offset, number of atoms and kind of each line of a file
+    num_lines, num_words and max_len_row are as reported by out_file_funcs.TokenisedFile
+    """
+    def __init__(self, fname, offsets, row_lens, kinds):
+        """
+        C
+        """
+        self.fname = fname
+        self.offsets = offsets
+        self.row_lens = row_lens
+        self.kinds = kinds
+        self.num_lines = len(row_lens)
+        self.num_words = int(row_lens.sum())
+        self.max_len_row = int(row_lens.max()) if self.num_lines > 0 else 0
+
+    def shape(self):
+        """
+        same order as get_num_words
+        """
+        return list([self.num_lines, self.max_len_row, self.num_words])
+
+    def line(self, iline):
+        """
+        text of a line, without the newline
+        """
+        return read_lines(self.fname, self.offsets[iline], self.offsets[iline + 1])[0]
+
+    def data_lines(self):
+        """
+        zero based index of each line holding data, so that data row n is the line data_lines()[n]
+        """
+        return (self.kinds == LINE_DATA).nonzero()[0]
+
+    def read_data_rows(self, first_row, end_row):
+        """
+        text of data rows first_row to end_row - 1, read with a single seek to the first of them
+        """
+        ilines = self.data_lines()[first_row:end_row]
+        if len(ilines) == 0:
+            return []
+
+        lines = read_lines(self.fname, self.offsets[ilines[0]], self.offsets[ilines[-1] + 1])
+
+        return [lines[iline] for iline in (ilines - ilines[0]).tolist()]
+
+def _count_atoms(chars, offsets):
+    """
+    number of whitespace delimited atoms on each line of an ASCII file without control characters, as found by
+    str.split, together with the position of the start of each atom
+    """
+    is_space = chars <= 32
+    atom_starts = ~is_space
+    atom_starts[1:] &= is_space[:-1]
+    atom_pos = atom_starts.nonzero()[0]
+    atom_lines = searchsorted(offsets, atom_pos, side = 'right') - 1
+
+    return bincount(atom_lines, minlength = len(offsets) - 1).astype(int32), atom_pos
+
+def build_line_index(fname, raw = None):
+    """
+    index the lines of a file - if raw is supplied the file is not read again
+    returns None if the lines found in the bytes cannot be reconciled with those of the text
+    """
+    if raw is None:
+        raw = read_raw(fname)
+
+    chars = frombuffer(raw, dtype=uint8)
+    offsets = line_offsets(raw)
+    num_lines = len(offsets) - 1
+    var_name, dummy = splitext(basename(fname))
+
+    # atoms are counted from the bytes unless the file has other than ASCII or has control characters
+    # ===============================================================================================
+    if raw.isascii() and len(raw.translate(None, CONTROL_CHARS)) == len(raw):
+        row_lens, atom_pos = _count_atoms(chars, offsets)
+        first_atoms = atom_pos[cumsum(row_lens[row_lens > 0]) - row_lens[row_lens > 0]]
+        first_chars = chars[first_atoms] | 0x20     # lower case of letters
+        text_lines_indx = (row_lens > 0).nonzero()[0][(first_chars >= ord('a')) & (first_chars <= ord('z'))]
+        lines = None
+    else:
+        lines = text_lines(raw)
+        if len(lines) != num_lines:
+            return None
+        row_lens = array([len(line.split()) for line in lines], dtype=int32)
+        text_lines_indx = arange(num_lines)
+
+    # tokens which identify embedded headers are only split from lines beginning with a letter
+    # ========================================================================================
+    def nth_tokens(indx):
+        tokens = full(num_lines, '', dtype=object)
+        for iline in text_lines_indx.tolist():
+            if lines is None:
+                atoms = raw[offsets[iline]:offsets[iline + 1]].decode().split()
+            else:
+                atoms = lines[iline].split()
+            if len(atoms) > indx:
+                tokens[iline] = atoms[indx]
+        return tokens
+
+    kinds = line_kinds(var_name, row_lens, nth_tokens)
+
+    return LineIndex(fname, offsets, row_lens, kinds)
+
+def save_line_index(line_index):
+    """
+    returns False if the index could not be written e.g. the directory is read only
+    """
+    fname = line_index.fname
+    npz_fname = index_fname(fname)
+    tmp_fname = npz_fname + '.{}.tmp'.format(getpid())
+    fstat = stat(fname)
+    meta = array([INDEX_VERSION, fstat.st_size, fstat.st_mtime_ns], dtype=int64)
+    try:
+        idx_dir, dummy = split(npz_fname)
+        if not isdir(idx_dir):
+            makedirs(idx_dir, exist_ok = True)
+
+        with open(tmp_fname, 'wb') as fobj:
+            savez(fobj, meta = meta, offsets = line_index.offsets, row_lens = line_index.row_lens,
+                                                                                        kinds = line_index.kinds)
+        replace(tmp_fname, npz_fname)
+    except OSError as err:
+        print(ERROR_STR + 'could not write line index for {}: {}'.format(fname, err))
+        return False
+
+    return True
+
+def load_line_index(fname):
+    """
+    the index of a file, or None if there is no index or it is out of date
+    """
+    try:
+        fstat = stat(fname)
+        with load(index_fname(fname)) as arrays:
+            meta = arrays['meta']
+            if meta[0] != INDEX_VERSION or meta[1] != fstat.st_size or meta[2] != fstat.st_mtime_ns:
+                return None
+
+            return LineIndex(fname, arrays['offsets'], arrays['row_lens'], arrays['kinds'])
+    except (OSError, ValueError, KeyError):
+        return None
+
+def open_line_index(fname, raw = None):
+    """
+    use the index of a file if it is up to date, otherwise index the file and save the index
+    returns None if the file cannot be indexed
+    """
+    line_index = load_line_index(fname)
+    if line_index is None:
+        line_index = build_line_index(fname, raw)
+        if line_index is not None:
+            save_line_index(line_index)
+
+    return line_index
@@ -0,0 +1,373 @@
+#-------------------------------------------------------------------------------
+# Name:        out_sidecar_funcs.py
+# Purpose:     parse Ecosse output files once into columnar binary sidecars which are memory mapped thereafter
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'out_sidecar_funcs.py'
+__version__ = '0.0.1'
+
+# Version history
+# ---------------
+# 0.0.1  Wrote.
+#        Lines held in memory are dropped when a ColumnarFile is pickled
+#        Sidecars hold a hash of each line so that identical lines of two files are found without reading them
+#        A file may be parsed like another so that lines identical to those of the other are not parsed again
+#        Line offsets found by out_index_funcs
+#
+# the sidecar for a file such as E:\run\SOILW.OUT is the directory E:\run\.check_ecosse_cols\SOILW.OUT which holds
+# one .npy file per column, each with one element per atom, the number of atoms, byte offset and hash of each line
+# and meta.json with the shape, content hash and header lines of the file together with the size and
+# modification time of the file from which the sidecar was made
+#
+from glob import glob
+from hashlib import blake2b, sha256
+from io import BytesIO, TextIOWrapper
+from os import getpid, makedirs, remove, replace, stat
+from os.path import abspath, basename, isdir, isfile, join, split
+import json
+
+from numpy import array, arange, repeat, cumsum, frombuffer, load, save, zeros, empty, \
+                                                                    result_type, int32, int64, uint8, uint32, uint64
+from diff_engine_funcs import classify_tokens
+from out_file_funcs import read_raw, text_lines, TokenisedFile
+from out_index_funcs import line_offsets
+
+SIDECAR_DIR = '.check_ecosse_cols'
+META_FNAME = 'meta.json'
+SIDECAR_VERSION = 2     # increment whenever the layout or content of a sidecar changes
+NUM_HEAD_LINES = 5      # sufficient for the headers of TOTC.OUT
+COLUMN_KEYS = list(['tokens', 'values', 'valid', 'nans', 'asterisks', 'ints'])
+filter_files = list(['fort.6','fort.21','fort.57','INPUTS.OUT','ERROR.MSG','NOERROR.MSG','PARLIS.DAT'])
+ERROR_STR = '*** Error *** '
+
+def sidecar_dir(fname):
+    """
+    C
+    """
+    fpath, fname_short = split(abspath(fname))
+
+    return join(fpath, SIDECAR_DIR, fname_short)
+
+def _line_offsets(raw, num_lines):
+    """
+    byte offset of the start of each line followed by the length of the file, consistent with the
+    universal newlines used when the file is read as text, or None if the lines cannot be reconciled
+    """
+    offsets = line_offsets(raw)
+    if len(offsets) != num_lines + 1:
+        return None
+
+    return offsets
+
+def _line_hashes(lines):
+    """
+    64 bit hash of the text of each line - lines of two files with equal hashes are taken to be identical
+    """
+    digests = b''.join(blake2b(line.encode(), digest_size = 8).digest() for line in lines)
+
+    return frombuffer(digests, dtype=uint64)
+
+def _atom_indices(starts, lens):
+    """
+    index of each atom of the rows beginning at starts with lens atoms
+    """
+    lens = lens.astype(int64)
+
+    return repeat(starts - (cumsum(lens) - lens), lens) + arange(lens.sum())
+
+def _ascii_bytes(tokens):
+    """
+    tokens as a bytes array, a quarter of the size, or None if any token is not ASCII
+    each character of a str array occupies four bytes so it suffices to keep the low byte
+    """
+    codes = tokens.view(uint32)
+    if len(codes) > 0 and codes.max() > 127:
+        return None
+
+    return codes.astype(uint8).view('S{}'.format(tokens.itemsize//4))
+
+class ColumnarFile(object,):
+    """
+    flattened and classified atoms of an Ecosse output file together with its shape
+         columns:  arrays keyed as for diff_engine_funcs.classify_tokens, one element per atom
+         row_lens: number of atoms on each line
+    num_lines, num_words and max_len_row are as reported by out_file_funcs.TokenisedFile
+    """
+    def __init__(self, fname):
+        """
+        C
+        """
+        self.fname = fname
+        self.digest = None
+        self.num_lines = 0
+        self.num_words = 0
+        self.max_len_row = 0
+        self.head_lines = []
+        self.row_lens = array([], dtype=int32)
+        self.row_starts = array([], dtype=int64)
+        self.line_offsets = None
+        self.line_hashes = None
+        self.columns = {}
+        self._lines = None
+
+    def shape(self):
+        """
+        same order as get_num_words
+        """
+        return list([self.num_lines, self.max_len_row, self.num_words])
+
+    def line(self, iline):
+        """
+        text of a line, without the newline - lines beyond the header are read from the text file on demand
+        """
+        if iline < len(self.head_lines):
+            return self.head_lines[iline]
+
+        if self._lines is not None:
+            return self._lines[iline]
+
+        if self.line_offsets is None:
+            self._lines = TokenisedFile(self.fname).lines
+            return self._lines[iline]
+
+        start, end = self.line_offsets[iline], self.line_offsets[iline + 1]
+        with open(self.fname, 'rb') as fobj:
+            fobj.seek(start)
+            chunk = fobj.read(end - start)
+
+        with TextIOWrapper(BytesIO(chunk)) as fobj:
+            line = fobj.read()
+
+        return line.rstrip('\n')
+
+    def __getstate__(self):
+        """
+        lines held in memory are not sent to other processes when they can be read from the file on demand
+        """
+        state = dict(self.__dict__)
+        if self.line_offsets is not None:
+            state['_lines'] = None
+
+        return state
+
+    def select_rows(self, ilines):
+        """
+        columns restricted to the atoms of the given lines, in the order given
+        """
+        ilines = array(ilines, dtype=int64)
+        indx = _atom_indices(self.row_starts[ilines], self.row_lens[ilines])
+
+        return {key: self.columns[key][indx] for key in self.columns}
+
+    def _set_row_lens(self, row_lens):
+        """
+        C
+        """
+        self.row_lens = row_lens
+        self.row_starts = cumsum(row_lens, dtype=int64) - row_lens
+
+def build_columnar(fname, raw = None, like = None):
+    """
+    parse and classify a text file held in memory - if raw is supplied the file is not read again
+    like is a ColumnarFile of a similar file, normally the reference with which this file is to be compared,
+    whose atoms are reused for lines identical to the line of the same index in this file
+    """
+    if raw is None:
+        raw = read_raw(fname)
+
+    if like is not None and like.line_hashes is not None:
+        return _build_columnar_like(fname, raw, like)
+
+    tok_file = TokenisedFile(fname, raw)
+    col_file = ColumnarFile(fname)
+    col_file.digest = sha256(raw).hexdigest()
+    col_file.num_lines, col_file.max_len_row, col_file.num_words = tok_file.shape()
+    col_file.head_lines = tok_file.lines[:NUM_HEAD_LINES]
+    col_file.line_offsets = _line_offsets(raw, tok_file.num_lines)
+    col_file.line_hashes = _line_hashes(tok_file.lines)
+    col_file._lines = tok_file.lines
+    col_file._set_row_lens(array([len(atoms) for atoms in tok_file.rows], dtype=int32))
+
+    tokens = array([atom for atoms in tok_file.rows for atom in atoms], dtype=str)
+    col_file.columns = classify_tokens(tokens)
+
+    # tokens are normally ASCII and are then stored as bytes
+    # ======================================================
+    tokens_ascii = _ascii_bytes(tokens)
+    if tokens_ascii is not None:
+        col_file.columns['tokens'] = tokens_ascii
+
+    return col_file
+
+def _build_columnar_like(fname, raw, like):
+    """
+    only those lines whose hash differs from that of the same line of like are split and classified
+    """
+    lines = text_lines(raw)
+    num_lines = len(lines)
+    line_hashes = _line_hashes(lines)
+
+    nshared = min(num_lines, like.num_lines)
+    same = zeros(num_lines, dtype=bool)
+    same[:nshared] = line_hashes[:nshared] == like.line_hashes[:nshared]
+    same_lines = same.nonzero()[0]
+    new_lines = (~same).nonzero()[0]
+    new_rows = [lines[iline].split() for iline in new_lines.tolist()]
+
+    row_lens = zeros(num_lines, dtype=int32)
+    row_lens[same_lines] = like.row_lens[same_lines]
+    row_lens[new_lines] = [len(atoms) for atoms in new_rows]
+
+    col_file = ColumnarFile(fname)
+    col_file.digest = sha256(raw).hexdigest()
+    col_file.num_lines = num_lines
+    col_file.num_words = int(row_lens.sum())
+    col_file.max_len_row = int(row_lens.max()) if num_lines > 0 else 0
+    col_file.head_lines = lines[:NUM_HEAD_LINES]
+    col_file.line_offsets = _line_offsets(raw, num_lines)
+    col_file.line_hashes = line_hashes
+    col_file._lines = lines
+    col_file._set_row_lens(row_lens)
+
+    # atoms of identical lines are copied from like, those of the remaining lines classified
+    # ======================================================================================
+    like_cols = like.select_rows(same_lines)
+    new_cols = classify_tokens(array([atom for atoms in new_rows for atom in atoms], dtype=str))
+    tokens_ascii = _ascii_bytes(new_cols['tokens'])
+    if like_cols['tokens'].dtype.kind == 'S' and tokens_ascii is not None:
+        new_cols['tokens'] = tokens_ascii
+    else:
+        like_cols['tokens'] = like_cols['tokens'].astype(str)
+
+    same_indx = _atom_indices(col_file.row_starts[same_lines], row_lens[same_lines])
+    new_indx = _atom_indices(col_file.row_starts[new_lines], row_lens[new_lines])
+    for key in like_cols:
+        column = empty(col_file.num_words, dtype = result_type(like_cols[key], new_cols[key]))
+        column[same_indx] = like_cols[key]
+        column[new_indx] = new_cols[key]
+        col_file.columns[key] = column
+
+    return col_file
+
+def save_sidecar(col_file):
+    """
+    write the arrays then the metadata, which marks the sidecar as complete
+    returns False if the sidecar could not be written e.g. the directory is read only
+    """
+    fname = col_file.fname
+    sc_dir = sidecar_dir(fname)
+    meta_fname = join(sc_dir, META_FNAME)
+    tmp_ext = '.{}.tmp'.format(getpid())
+
+    fstat = stat(fname)
+    meta = {'version': SIDECAR_VERSION, 'size': fstat.st_size, 'mtime_ns': fstat.st_mtime_ns,
+            'digest': col_file.digest, 'num_lines': col_file.num_lines, 'num_words': col_file.num_words,
+            'max_len_row': col_file.max_len_row, 'head_lines': col_file.head_lines,
+            'has_offsets': col_file.line_offsets is not None}
+
+    arrays = dict(col_file.columns)
+    arrays['row_lens'] = col_file.row_lens
+    arrays['line_hashes'] = col_file.line_hashes
+    if col_file.line_offsets is not None:
+        arrays['line_offsets'] = col_file.line_offsets
+    try:
+        if not isdir(sc_dir):
+            makedirs(sc_dir, exist_ok = True)
+        if isfile(meta_fname):
+            remove(meta_fname)
+
+        for key in arrays:
+            npy_fname = join(sc_dir, key + '.npy')
+            with open(npy_fname + tmp_ext, 'wb') as fobj:
+                save(fobj, arrays[key])
+            replace(npy_fname + tmp_ext, npy_fname)
+
+        with open(meta_fname + tmp_ext, 'w') as fobj:
+            json.dump(meta, fobj)
+        replace(meta_fname + tmp_ext, meta_fname)
+
+    except OSError as err:
+        print(ERROR_STR + 'could not write sidecar for {}: {}'.format(fname, err))
+        return False
+
+    return True
+
+def load_sidecar(fname):
+    """
+    memory map the sidecar of a file, or return None if there is no sidecar or it is out of date
+    """
+    sc_dir = sidecar_dir(fname)
+    meta_fname = join(sc_dir, META_FNAME)
+    if not isfile(meta_fname):
+        return None
+
+    try:
+        with open(meta_fname, 'r') as fobj:
+            meta = json.load(fobj)
+        fstat = stat(fname)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get('version') != SIDECAR_VERSION or meta['size'] != fstat.st_size or \
+                                                                    meta['mtime_ns'] != fstat.st_mtime_ns:
+        return None
+
+    col_file = ColumnarFile(fname)
+    col_file.digest = meta['digest']
+    col_file.num_lines = meta['num_lines']
+    col_file.num_words = meta['num_words']
+    col_file.max_len_row = meta['max_len_row']
+    col_file.head_lines = meta['head_lines']
+    try:
+        for key in COLUMN_KEYS:
+            col_file.columns[key] = load(join(sc_dir, key + '.npy'), mmap_mode = 'r')
+        col_file._set_row_lens(load(join(sc_dir, 'row_lens.npy'), mmap_mode = 'r'))
+        col_file.line_hashes = load(join(sc_dir, 'line_hashes.npy'), mmap_mode = 'r')
+        if meta['has_offsets']:
+            col_file.line_offsets = load(join(sc_dir, 'line_offsets.npy'), mmap_mode = 'r')
+    except (OSError, ValueError):
+        return None
+
+    return col_file
+
+def open_columnar(fname):
+    """
+    use the sidecar of a file if it is up to date, otherwise parse the file and write its sidecar
+    """
+    col_file = load_sidecar(fname)
+    if col_file is None:
+        col_file = build_columnar(fname)
+        save_sidecar(col_file)
+
+    return col_file
+
+def convert_out_files(dir_names):
+    """
+    conversion stage - ensure each .OUT file in the directories has an up to date sidecar
+    """
+    nfresh = 0
+    nconverted = 0
+    for dir_name in dir_names:
+        if not isdir(dir_name):
+            print(dir_name + ' does not exist')
+            continue
+
+        for fname in sorted(glob(join(dir_name, '*.OUT'))):
+            if basename(fname) in filter_files:
+                continue
+
+            if load_sidecar(fname) is None:
+                if save_sidecar(build_columnar(fname)):
+                    nconverted += 1
+            else:
+                nfresh += 1
+
+        print('Converted .OUT files in ' + dir_name)
+
+    print('Sidecars: {} written, {} already up to date'.format(nconverted, nfresh))
+
+    return nconverted
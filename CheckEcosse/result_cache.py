@@ -0,0 +1,217 @@
+#-------------------------------------------------------------------------------
+# Name:        result_cache.py
+# Purpose:     persistent cache, held in the results directory, of comparisons between pairs of files
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'result_cache.py'
+__version__ = '0.0.1'
+
+# Version history
+# ---------------
+# 0.0.1  Wrote.
+#        Size of each record counted towards the limit, hashes of files no longer compared pruned, output kept
+#        Version 3 as quick look comparisons report rows as a full comparison does and may compare no rows
+#
+# entries are keyed on the content hashes of the reference and target files together with the comparison
+# settings; the hash of each file is itself remembered against its size and modification time so that
+# unchanged files are not read at all; output printed by a comparison is kept so that it is replayed on a hit
+#
+from os import makedirs, remove, stat
+from os.path import join, isdir, isfile, abspath
+from hashlib import sha256
+from shutil import rmtree
+from time import time
+import json
+
+from numpy import load, savez
+
+CACHE_DIR = '.check_ecosse_cache'
+INDEX_FNAME = 'index.json'
+CACHE_VERSION = 3       # increment whenever the content of a cached comparison changes
+CHUNK_SIZE = 1024*1024
+BYTES_PER_MB = 1024*1024
+ERROR_STR = '*** Error *** '
+
+def file_digest(fname):
+    """
+    strong content hash of a file, read in chunks
+    """
+    hasher = sha256()
+    with open(fname, 'rb') as fobj:
+        for chunk in iter(lambda: fobj.read(CHUNK_SIZE), b''):
+            hasher.update(chunk)
+
+    return hasher.hexdigest()
+
+def clear_cache(rslts_dir):
+    """
+    invalidate the cache by removing it entirely
+    """
+    cache_dir = join(rslts_dir, CACHE_DIR)
+    if isdir(cache_dir):
+        rmtree(cache_dir, ignore_errors = True)
+        print('Removed comparison cache ' + cache_dir)
+
+    return
+
+class ResultCache(object,):
+    """
+    methods:
+          file_hash, pair_key, fetch, store and save
+    """
+    def __init__(self, rslts_dir, max_mb = 256):
+        """
+        C
+        """
+        self.cache_dir = join(rslts_dir, CACHE_DIR)
+        self.max_bytes = int(max_mb*BYTES_PER_MB)
+        self.index_fname = join(self.cache_dir, INDEX_FNAME)
+        self.nhits = 0
+        self.nmisses = 0
+        self.key_files = {}     # files of each key made during this run
+
+        index = None
+        if isfile(self.index_fname):
+            try:
+                with open(self.index_fname, 'r') as fobj:
+                    index = json.load(fobj)
+            except (OSError, ValueError) as err:
+                print(ERROR_STR + 'could not read cache index {} - will start afresh: {}'
+                                                                            .format(self.index_fname, err))
+        if index is None or index.get('version') != CACHE_VERSION:
+            index = {'version': CACHE_VERSION, 'files': {}, 'entries': {}}
+
+        self.index = index
+
+    def file_hash(self, fname):
+        """
+        content hash of a file - only recalculated when the size or modification time has changed
+        """
+        fname = abspath(fname)
+        fstat = stat(fname)
+        signature = list([fstat.st_size, fstat.st_mtime_ns])
+
+        file_rec = self.index['files'].get(fname)
+        if file_rec is not None and file_rec[:2] == signature:
+            return file_rec[2]
+
+        digest = file_digest(fname)
+        self.index['files'][fname] = signature + list([digest])
+
+        return digest
+
+    def pair_key(self, ref_file, targ_file, settings = ''):
+        """
+        key for a comparison of two files under the given comparison settings
+        """
+        key_str = '{}|{}|{}|{}'.format(self.file_hash(ref_file), self.file_hash(targ_file), settings, CACHE_VERSION)
+        key = sha256(key_str.encode()).hexdigest()
+        self.key_files[key] = list([abspath(ref_file), abspath(targ_file)])
+
+        return key
+
+    def fetch(self, key):
+        """
+        return the cached comparison or None
+        """
+        entry = self.index['entries'].get(key)
+        if entry is None:
+            self.nmisses += 1
+            return None
+
+        comparison = dict(entry['comparison'])
+        comparison['diff'] = None
+        if entry['diff_bytes'] > 0:
+            npz_fname = join(self.cache_dir, key + '.npz')
+            try:
+                with load(npz_fname) as npz:
+                    comparison['diff'] = npz['diff']
+            except (OSError, KeyError, ValueError):
+                del self.index['entries'][key]
+                self.nmisses += 1
+                return None
+
+        entry['last_used'] = time()
+        if key in self.key_files:
+            entry['files'] = self.key_files[key]
+        self.nhits += 1
+
+        return comparison
+
+    def store(self, key, comparison):
+        """
+        add a comparison, which may include a matrix of differences and the output it printed, to the cache
+        the size of an entry is that of its matrix together with that of its record in the index
+        """
+        if not isdir(self.cache_dir):
+            makedirs(self.cache_dir)
+
+        diff_bytes = 0
+        diff = comparison.get('diff')
+        if diff is not None:
+            npz_fname = join(self.cache_dir, key + '.npz')
+            savez(npz_fname, diff = diff)
+            diff_bytes = stat(npz_fname).st_size
+
+        record = {fld: comparison[fld] for fld in comparison if fld != 'diff'}
+        nbytes = diff_bytes + len(json.dumps(record))
+        self.index['entries'][key] = {'comparison': record, 'nbytes': nbytes, 'diff_bytes': diff_bytes,
+                                      'files': self.key_files.get(key, []), 'last_used': time()}
+
+        return
+
+    def _evict(self):
+        """
+        remove least recently used entries until the cache is within its size limit
+        """
+        entries = self.index['entries']
+        total_bytes = sum(entry['nbytes'] for entry in entries.values())
+        if total_bytes <= self.max_bytes:
+            return
+
+        nevicted = 0
+        for key in sorted(entries, key = lambda key: entries[key]['last_used']):
+            if total_bytes <= self.max_bytes:
+                break
+            entry = entries.pop(key)
+            if entry['diff_bytes'] > 0:
+                try:
+                    remove(join(self.cache_dir, key + '.npz'))
+                except OSError:
+                    pass
+            total_bytes -= entry['nbytes']
+            nevicted += 1
+
+        print('Evicted {} entries from comparison cache'.format(nevicted))
+
+        return
+
+    def _prune_files(self):
+        """
+        forget the hashes of files which are not compared by any remaining entry
+        """
+        used = set(fname for entry in self.index['entries'].values() for fname in entry['files'])
+        files = self.index['files']
+        for fname in list(files):
+            if fname not in used:
+                del files[fname]
+
+        return
+
+    def save(self):
+        """
+        apply size limit and write the index
+        """
+        if not isdir(self.cache_dir):
+            makedirs(self.cache_dir)
+
+        self._evict()
+        self._prune_files()
+        with open(self.index_fname, 'w') as fobj:
+            json.dump(self.index, fobj)
+
+        return
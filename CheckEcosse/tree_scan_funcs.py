@@ -0,0 +1,236 @@
+#-------------------------------------------------------------------------------
+# Name:        tree_scan_funcs.py
+# Purpose:     recursive scan of a directory tree, such as a spatial run, recording the shape of every file
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'tree_scan_funcs.py'
+__version__ = '0.0.1'
+
+# Version history
+# ---------------
+# 0.0.1  Wrote.
+#
+# lines, words and maximum row length are counted from bytes, as would be reported by out_file_funcs.TokenisedFile
+# for text files; files with a null byte near the start are taken to be binary and are not counted while files
+# larger than the size limit are counted from a sample at the start of the file and the counts scaled
+#
+from concurrent.futures import ProcessPoolExecutor
+import csv
+from os import scandir
+from os.path import basename, join, relpath, splitext
+
+import common_funcs
+from common_funcs import XlsxSheetWriter
+from out_sidecar_funcs import load_sidecar, filter_files
+
+SCAN_FORMATS = list(['xlsx', 'csv'])
+SCAN_MAX_MB = 256       # files larger than this are sampled
+SAMPLE_BYTES = 4*1024*1024
+PROBE_BYTES = 8192      # bytes examined for a null byte
+CHUNK_SIZE = 64         # files sent to each worker process at a time
+BYTES_PER_MB = 1024*1024
+MAX_XLSX_ROWS = 1048576 # maximum number of rows in an Excel worksheet
+FILE_TITLES = list(['Directory', 'File name', 'Size', 'Status', 'NumLines', 'NumWords', 'MaxRowLen'])
+DIR_TITLES = list(['Directory', 'Files', 'Size', 'NumLines', 'NumWords', 'MaxRowLen', 'Binary', 'Sampled',
+                   'Unreadable'])
+
+def iter_tree_files(root_dir):
+    """
+    path of each file beneath a directory, in sorted order of directory then file name
+    hidden directories, such as those of sidecars and caches, are not entered
+    """
+    try:
+        with scandir(root_dir) as entries:
+            entries = sorted(entries, key = lambda entry: entry.name)
+    except OSError as err:
+        print('Could not scan {}: {}'.format(root_dir, err))
+        return
+
+    sub_dirs = []
+    for entry in entries:
+        if entry.name.startswith('.'):
+            continue
+
+        if entry.is_dir(follow_symlinks = False):
+            sub_dirs.append(entry.path)
+        elif entry.is_file() and entry.name not in filter_files:
+            yield entry.path
+
+    for sub_dir in sub_dirs:
+        yield from iter_tree_files(sub_dir)
+
+def _count_bytes(raw):
+    """
+    number of lines and words and the maximum number of words on a line
+    """
+    row_lens = [len(line.split()) for line in raw.splitlines()]
+    if len(row_lens) == 0:
+        return 0, 0, 0
+
+    return len(row_lens), sum(row_lens), max(row_lens)
+
+def scan_file(fname, max_bytes = SCAN_MAX_MB*BYTES_PER_MB, use_sidecars = False):
+    """
+    size, status and shape of a file - status is one of text, sidecar, binary, sampled or unreadable
+    """
+    rec = {'fname': fname, 'size': 0, 'status': 'text', 'num_lines': 0, 'num_words': 0, 'max_len_row': 0}
+
+    # shape is recorded in an up to date sidecar
+    # ==========================================
+    dummy, extn = splitext(fname)
+    if use_sidecars and extn.upper() == '.OUT':
+        col_file = load_sidecar(fname)
+        if col_file is not None:
+            rec['num_lines'], rec['max_len_row'], rec['num_words'] = col_file.shape()
+            rec['status'] = 'sidecar'
+
+    try:
+        with open(fname, 'rb') as fobj:
+            rec['size'] = fobj.seek(0, 2)
+            if rec['status'] == 'sidecar':
+                return rec
+
+            fobj.seek(0)
+            raw = fobj.read(PROBE_BYTES)
+            if b'\0' in raw:
+                rec['status'] = 'binary'
+                return rec
+
+            if rec['size'] > max_bytes:
+                raw += fobj.read(SAMPLE_BYTES - len(raw))
+                raw = raw[:raw.rfind(b'\n') + 1] or raw
+                rec['status'] = 'sampled'
+            else:
+                raw += fobj.read()
+    except OSError as err:
+        print('Could not read {}: {}'.format(fname, err))
+        rec['status'] = 'unreadable'
+        return rec
+
+    rec['num_lines'], rec['num_words'], rec['max_len_row'] = _count_bytes(raw)
+    if rec['status'] == 'sampled' and len(raw) > 0:
+        scale = rec['size']/len(raw)
+        rec['num_lines'] = int(round(rec['num_lines']*scale))
+        rec['num_words'] = int(round(rec['num_words']*scale))
+
+    return rec
+
+def aggregate_dirs(root_dir, recs):
+    """
+    totals for the files held directly in each directory, in order of first appearance
+    """
+    dir_recs = {}
+    for rec in recs:
+        dir_name = relpath(rec['fname'], root_dir).replace('\\', '/').rpartition('/')[0] or '.'
+        if dir_name not in dir_recs:
+            dir_recs[dir_name] = {'nfiles': 0, 'size': 0, 'num_lines': 0, 'num_words': 0, 'max_len_row': 0,
+                                  'binary': 0, 'sampled': 0, 'unreadable': 0}
+        dir_rec = dir_recs[dir_name]
+        dir_rec['nfiles'] += 1
+        for key in ('size', 'num_lines', 'num_words'):
+            dir_rec[key] += rec[key]
+        dir_rec['max_len_row'] = max(dir_rec['max_len_row'], rec['max_len_row'])
+        if rec['status'] in ('binary', 'sampled', 'unreadable'):
+            dir_rec[rec['status']] += 1
+
+    return dir_recs
+
+def _file_row(root_dir, rec):
+    """
+    C
+    """
+    dir_name = relpath(rec['fname'], root_dir).replace('\\', '/').rpartition('/')[0] or '.'
+
+    return list([dir_name, basename(rec['fname']), rec['size'], rec['status'], rec['num_lines'], rec['num_words'],
+                 rec['max_len_row']])
+
+def _dir_row(dir_name, dir_rec):
+    """
+    C
+    """
+    return list([dir_name, dir_rec['nfiles'], dir_rec['size'], dir_rec['num_lines'], dir_rec['num_words'],
+                 dir_rec['max_len_row'], dir_rec['binary'], dir_rec['sampled'], dir_rec['unreadable']])
+
+def write_tables(out_fname, tables):
+    """
+    each table, a sheet name with column titles and rows, is written as a sheet of a workbook or, if out_fname
+    is a csv file, as a csv file named after the sheet - returns the name of the workbook or of the last csv file
+    """
+    root_name, extn = splitext(out_fname)
+    if extn == '.csv':
+        for sheet_name, titles, rows in tables:
+            out_fname = root_name + '_' + sheet_name.lower().replace(' ', '_') + '.csv'
+            with open(out_fname, 'w', newline = '') as fobj:
+                writer = csv.writer(fobj)
+                writer.writerow(titles)
+                writer.writerows(rows)
+
+        return out_fname
+
+    outdir_sum = common_funcs.Common_funcs('')
+    wrkbk = outdir_sum.open_xls_outf(out_fname, write_only = True)
+    if wrkbk == -1:
+        print('Error - could not open file {}'.format(out_fname))
+        return None
+
+    for sheet_name, titles, rows in tables:
+        wrksht = XlsxSheetWriter(wrkbk, sheet_name)
+        wrksht.write_row(1, titles, convert = False)
+        for irow, row in enumerate(rows):
+            wrksht.write_row(irow + 2, row, convert = False)
+
+    wrkbk.save(outdir_sum.outfname)
+
+    return outdir_sum.outfname
+
+def scan_tree(params):
+    """
+    scan every file beneath params.ref_dir, in a pool of worker processes if params.max_workers exceeds 1,
+    and write the shape of each file together with totals for each directory
+    """
+    root_dir = params.ref_dir
+    fnames = list(iter_tree_files(root_dir))
+    nfiles = len(fnames)
+    if nfiles == 0:
+        print('No files found beneath ' + root_dir)
+        return
+
+    max_bytes = params.scan_max_mb*BYTES_PER_MB
+    if params.max_workers > 1 and nfiles > 1:
+        print('Scanning {} files using {} worker processes'.format(nfiles, params.max_workers))
+        executor = ProcessPoolExecutor(max_workers = params.max_workers)
+        scans = executor.map(scan_file, fnames, [max_bytes]*nfiles, [params.use_sidecars]*nfiles,
+                                                                                        chunksize = CHUNK_SIZE)
+    else:
+        print('Scanning {} files'.format(nfiles))
+        executor = None
+        scans = (scan_file(fname, max_bytes, params.use_sidecars) for fname in fnames)
+
+    recs = []
+    for rec in scans:
+        if params.cancel_requested():
+            print('Directory scan cancelled after {} of {} files'.format(len(recs), nfiles))
+            break
+        recs.append(rec)
+        params.report_progress(len(recs), nfiles, basename(rec['fname']))
+
+    if executor is not None:
+        executor.shutdown(cancel_futures = True)
+
+    dir_recs = aggregate_dirs(root_dir, recs)
+    out_fname = join(params.rslts_dir, basename(root_dir) + '_tree.' + params.scan_format)
+    if params.scan_format == 'xlsx' and len(recs) >= MAX_XLSX_ROWS:
+        print('{} files exceed the rows of a worksheet - will write csv files'.format(len(recs)))
+        out_fname = join(params.rslts_dir, basename(root_dir) + '_tree.csv')
+    dir_rows = [_dir_row(dir_name, dir_recs[dir_name]) for dir_name in dir_recs]
+    file_rows = [_file_row(root_dir, rec) for rec in recs]
+    out_fname = write_tables(out_fname, list([tuple(['Directories', DIR_TITLES, dir_rows]),
+                                              tuple(['Files', FILE_TITLES, file_rows])]))
+
+    print('Scanned {} files in {} directories, {:.1f} MB\nResults written to: {}\n'
+            .format(len(recs), len(dir_recs), sum(rec['size'] for rec in recs)/BYTES_PER_MB, out_fname))
+    return 'dummy'
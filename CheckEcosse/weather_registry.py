@@ -0,0 +1,159 @@
+#-------------------------------------------------------------------------------
+# Name:        weather_registry.py
+# Purpose:     registry of met files shared by the compliance checks of every cell of a run
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'weather_registry.py'
+__version__ = '0.0.2'
+
+# Version history
+# ---------------
+# 0.0.1  Wrote.
+# 0.0.2  Size and modification time taken from the met file itself, since editing a file in place does not change
+#        the modification time of its directory
+#
+# cells of a spatial run typically refer to a handful of met files; each met directory is listed once, and listed
+# again only when its modification time changes, to find which met files exist; each distinct met file of a cell is
+# then stat'd once each time the cell is checked, and its content validated once for a given size and modification
+# time - the registry lasts for the life of the process so is shared by every cell checked
+#
+# a met file is taken to hold 12 monthly or 365 or 366 daily lines each of precipitation [mm], potential
+# evapotranspiration [mm] and air temperature [degC], optionally preceded by the time step
+#
+from os import scandir, stat
+from os.path import normcase, normpath, split
+
+from numpy import array, float64
+
+MET_NLINES = list([12, 365, 366])
+MAX_PRECIP = 2000.0     # mm in one time step
+MAX_PET = 1000.0
+MIN_TEMP = -60.0        # degC
+MAX_TEMP = 60.0
+
+_listings = {}      # directory: modification time and the normalised names of its files
+_validations = {}   # path, size and modification time: problems found with the content of the file
+
+def _list_dir(dir_name):
+    """
+    normalised names of the files of a directory, which only change when the modification time of the directory does
+    returns an empty set if the directory does not exist
+    """
+    try:
+        dir_mtime = stat(dir_name).st_mtime_ns
+    except OSError:
+        return set()
+
+    listing = _listings.get(dir_name)
+    if listing is None or listing[0] != dir_mtime:
+        files = set()
+        try:
+            with scandir(dir_name) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        files.add(normcase(entry.name))
+        except OSError:
+            pass
+        listing = tuple([dir_mtime, files])
+        _listings[dir_name] = listing
+
+    return listing[1]
+
+def validate_met_content(raw):
+    """
+    problems with the text of a met file: number of lines, non numeric or missing values and values out of range
+    the values are converted and checked as one array rather than line by line
+    """
+    rows = [line.split() for line in raw.splitlines() if line.strip() != '']
+    nlines = len(rows)
+    if nlines == 0:
+        return list(['file is empty'])
+
+    problems = []
+    if nlines not in MET_NLINES:
+        problems.append('{} lines, expected one of {}'.format(nlines, ', '.join(str(nval) for nval in MET_NLINES)))
+
+    ncols = len(rows[0])
+    irow_bad = [irow for irow, row in enumerate(rows) if len(row) != ncols]
+    if len(irow_bad) > 0:
+        problems.append('{} lines with other than {} values, first at line {}'
+                                                                    .format(len(irow_bad), ncols, irow_bad[0] + 1))
+        return problems
+
+    if ncols < 3:
+        problems.append('{} values on each line, expected at least 3'.format(ncols))
+        return problems
+
+    try:
+        vals = array(rows, dtype = float64)
+    except ValueError as err:
+        problems.append('non numeric value: {}'.format(err))
+        return problems
+
+    precip, pet, temp = vals[:, -3], vals[:, -2], vals[:, -1]
+    for metric, series, min_val, max_val in list([tuple(['precipitation', precip, 0.0, MAX_PRECIP]),
+                                                  tuple(['PET', pet, 0.0, MAX_PET]),
+                                                  tuple(['temperature', temp, MIN_TEMP, MAX_TEMP])]):
+        bad = ~((series >= min_val) & (series <= max_val))
+        nbad = int(bad.sum())
+        if nbad > 0:
+            problems.append('{} {} values outside {} to {}, first at line {}'
+                                                    .format(nbad, metric, min_val, max_val, int(bad.argmax()) + 1))
+
+    return problems
+
+def check_met_files(met_files):
+    """
+    for each met file None if it does not exist, otherwise a list of problems with its content, empty if none
+    the modification time of each directory is checked, and each met file stat'd, once for the whole list
+    """
+    listings = {}
+    signatures = {}
+    results = []
+    for met_file in met_files:
+        met_file = normpath(met_file)
+        if met_file not in signatures:
+            dir_name, fname = split(met_file)
+            if dir_name not in listings:
+                listings[dir_name] = _list_dir(dir_name)
+            signatures[met_file] = _met_file_signature(met_file, normcase(fname) in listings[dir_name])
+        results.append(_validate_met_file(met_file, signatures[met_file]))
+
+    return results
+
+def _met_file_signature(met_file, listed):
+    """
+    size and modification time of a met file, or None if it is not in the listing of its directory or has gone
+    """
+    if not listed:
+        return None
+
+    try:
+        fstat = stat(met_file)
+    except OSError:
+        return None
+
+    return tuple([fstat.st_size, fstat.st_mtime_ns])
+
+def _validate_met_file(met_file, signature):
+    """
+    C
+    """
+    if signature is None:
+        return None
+
+    key = tuple([met_file]) + signature
+    if key not in _validations:
+        try:
+            with open(met_file, 'r') as fobj:
+                raw = fobj.read()
+        except (OSError, UnicodeDecodeError) as err:
+            _validations[key] = list(['could not be read: {}'.format(err)])
+        else:
+            _validations[key] = validate_met_content(raw)
+
+    return _validations[key]